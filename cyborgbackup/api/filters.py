@@ -8,7 +8,7 @@ from django.contrib.contenttypes.models import ContentType
 # Django
 from django.core.exceptions import FieldError, ValidationError, FieldDoesNotExist
 from django.db import models
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Q
 from django.db.models.fields.related import ForeignObjectRel, ManyToManyField, ForeignKey
 from django.utils.encoding import force_str
 from django.utils.translation import gettext_lazy as _
@@ -75,7 +75,7 @@ class FieldLookupBackend(BaseFilterBackend):
     """
 
     RESERVED_NAMES = ('page', 'page_size', 'format', 'order', 'order_by',
-                      'search', 'type', 'host_filter', 'fields')
+                      'search', 'type', 'host_filter', 'fields', 'exclude', 'cursor')
 
     SUPPORTED_LOOKUPS = ('exact', 'iexact', 'contains', 'icontains',
                          'startswith', 'istartswith', 'endswith', 'iendswith',
@@ -127,6 +127,34 @@ class FieldLookupBackend(BaseFilterBackend):
         new_lookup = '__'.join(new_parts)
         return field, new_lookup
 
+    def is_multivalued_lookup(self, model, lookup):
+        """
+        Return True when the lookup crosses a one-to-many or many-to-many
+        relation, which can return an object more than once.
+        """
+        for name in lookup.split('__'):
+            if name == 'pk':
+                return False
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                return False
+            if not field.is_relation:
+                return False
+            if field.one_to_many or field.many_to_many:
+                return True
+            model = field.related_model
+        return False
+
+    def distinct_multivalued(self, queryset, filters):
+        """
+        Only lookups across multi-valued relations can return an object more
+        than once and need a DISTINCT.
+        """
+        if any(self.is_multivalued_lookup(queryset.model, k) for n, k, v in filters):
+            return queryset.distinct()
+        return queryset
+
     def to_python_related(self, value):
         value = force_str(value)
         if value.lower() in ('none', 'null'):
@@ -255,6 +283,7 @@ class FieldLookupBackend(BaseFilterBackend):
 
             # Now build Q objects for database query filter.
             if and_filters or or_filters or chain_filters or search_filters:
+                model = queryset.model
                 args = []
                 for n, k, v in and_filters:
                     if n:
@@ -270,17 +299,19 @@ class FieldLookupBackend(BaseFilterBackend):
                             q |= Q(**{k: v})
                     args.append(q)
                 if search_filters:
+                    # Search the related objects in an EXISTS subquery
+                    # instead of joining them to the listed objects.
                     q = Q()
                     for k, v in search_filters:
                         q |= Q(**{k: v})
-                    args.append(q)
+                    args.append(Exists(model._default_manager.filter(q, pk=OuterRef('pk'))))
                 for n, k, v in chain_filters:
                     if n:
                         q = ~Q(**{k: v})
                     else:
                         q = Q(**{k: v})
                     queryset = queryset.filter(q)
-                queryset = queryset.filter(*args).distinct()
+                queryset = self.distinct_multivalued(queryset.filter(*args), and_filters + or_filters + chain_filters)
             return queryset
         except (FieldError, FieldDoesNotExist, ValueError, TypeError) as e:
             raise ParseError(e.args[0])
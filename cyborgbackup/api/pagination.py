@@ -3,9 +3,41 @@ from rest_framework import pagination
 from rest_framework.utils.urls import replace_query_param
 
 
+class CursorPagination(pagination.CursorPagination):
+    """
+    Keyset pagination ordered by an indexed, unique and unchanging field of
+    the model, without count query, used when the `cursor` query parameter
+    is given.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100000
+    ordering = 'pk'
+
+
 class Pagination(pagination.PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 100000
+    cursor_pagination_class = CursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.cursor_pagination_class.cursor_query_param in request.query_params:
+            # Views can order the cursor on another field than the pk by
+            # setting cursor_ordering, e.g. the counter of the job events.
+            self.cursor_paginator = self.cursor_pagination_class()
+            self.cursor_paginator.ordering = getattr(view, 'cursor_ordering', self.cursor_paginator.ordering)
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        return super(Pagination, self).paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super(Pagination, self).get_paginated_response(data)
+
+    def to_html(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.to_html()
+        return super(Pagination, self).to_html()
 
     def get_next_link(self):
         if not self.page.has_next():
@@ -4,7 +4,7 @@ import logging
 from collections import OrderedDict
 
 # Django
-from django.core.exceptions import ObjectDoesNotExist, ValidationError as DjangoValidationError
+from django.core.exceptions import FieldDoesNotExist, ObjectDoesNotExist, ValidationError as DjangoValidationError
 from django.db import models
 from django.utils.encoding import force_str
 from django.utils.text import capfirst
@@ -78,21 +78,27 @@ def reverse_gfk(content_object, request):
 
 class DynamicFieldsSerializerMixin(object):
     """
-    A serializer mixin that takes an additional `fields` argument that controls
-    which fields should be displayed.
+    A serializer mixin that takes additional `fields` and `exclude` arguments
+    that control which fields should be displayed.
     """
 
     def __init__(self, *args, **kwargs):
-        # Don't pass the 'fields' arg up to the superclass
+        # Don't pass the 'fields' and 'exclude' args up to the superclass
         fields: list | None = kwargs.pop('fields', None)
+        exclude: list | None = kwargs.pop('exclude', None)
 
         # Instantiate the superclass normally
         super(DynamicFieldsSerializerMixin, self).__init__(*args, **kwargs)
 
-        if fields:
-            allowed = set(fields)
+        self.sparse_fields = bool(fields or exclude)
+        if self.sparse_fields:
             existing = set(self.fields.keys())
-            for field_name in existing - allowed:
+            removed = set()
+            if fields:
+                removed |= existing - set(fields)
+            if exclude:
+                removed |= existing & set(exclude)
+            for field_name in removed:
                 self.fields.pop(field_name)
 
 
@@ -197,7 +203,7 @@ class BaseSerializerMetaclass(serializers.SerializerMetaclass):
         return super(BaseSerializerMetaclass, cls).__new__(cls, name, bases, attrs)
 
 
-class BaseSerializer(serializers.ModelSerializer, metaclass=BaseSerializerMetaclass):
+class BaseSerializer(DynamicFieldsSerializerMixin, serializers.ModelSerializer, metaclass=BaseSerializerMetaclass):
     class Meta:
         ordering = ('id',)
         fields = ('id', 'type', 'url', 'related', 'summary_fields', 'created',
@@ -215,6 +221,21 @@ class BaseSerializer(serializers.ModelSerializer, metaclass=BaseSerializerMetacl
     created = serializers.SerializerMethodField()
     modified = serializers.SerializerMethodField()
 
+    # Relations used by get_related and get_summary_fields which are not
+    # summarized foreign keys, loaded with the objects of a list.
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    # Model fields read by a serializer field, when it is not only its own
+    # source. A requested method field which is not listed here makes a list
+    # load the whole objects.
+    field_sources = {
+        'type': (),
+        'url': (),
+        'created': ('created',),
+        'modified': ('modified',),
+    }
+
     @property
     def version(self):
         """
@@ -316,6 +337,73 @@ class BaseSerializer(serializers.ModelSerializer, metaclass=BaseSerializerMetacl
 
         return summary_fields
 
+    def get_summary_foreign_keys(self):
+        """
+        Return the foreign keys of the model summarized in summary_fields,
+        with created_by and modified_by.
+        """
+        model = self.Meta.model
+        names = []
+        for name in list(SUMMARIZABLE_FK_FIELDS) + ['created_by', 'modified_by']:
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            if field.many_to_one or field.one_to_one:
+                names.append(name)
+        return names
+
+    def get_queryset_relations(self):
+        """
+        Return the relations to select and to prefetch when serializing a
+        list of objects: the summarized foreign keys, created_by and
+        modified_by, the many-to-many fields and the relations declared by
+        the serializer.
+        """
+        model = self.Meta.model
+        select_related = set()
+        prefetch_related = set()
+        if 'summary_fields' in self.fields or 'related' in self.fields:
+            select_related.update(self.select_related_fields)
+            select_related.update(self.get_summary_foreign_keys())
+            prefetch_related.update(self.prefetch_related_fields)
+        for field in self.fields.values():
+            if isinstance(field, serializers.ManyRelatedField) and field.source != '*':
+                try:
+                    model_field = model._meta.get_field(field.source)
+                except FieldDoesNotExist:
+                    continue
+                if model_field.many_to_many or model_field.one_to_many:
+                    prefetch_related.add(field.source)
+        return sorted(select_related), sorted(prefetch_related)
+
+    def get_queryset_only_fields(self):
+        """
+        Return the model fields read by the fields of the serializer, to load
+        only them with the objects of a list, or None when the whole objects
+        are needed.
+        """
+        model = self.Meta.model
+        only = set([model._meta.pk.name])
+        for field_name, field in self.fields.items():
+            if field_name in self.field_sources:
+                sources = self.field_sources[field_name]
+            elif isinstance(field, serializers.SerializerMethodField) or field.source == '*':
+                return None
+            else:
+                sources = field.source_attrs[:1]
+            for source in sources:
+                try:
+                    model_field = model._meta.get_field(source)
+                except FieldDoesNotExist:
+                    return None
+                if model_field.many_to_many or model_field.one_to_many:
+                    continue
+                if not model_field.concrete:
+                    return None
+                only.add(model_field.name)
+        return sorted(only)
+
     def _obj_capability_dict(self, obj):
         """
         Returns the user_capabilities dictionary for a single item
@@ -711,7 +799,7 @@ class JobRelaunchSerializer(BaseSerializer):
         return attrs
 
 
-class JobListSerializer(DynamicFieldsSerializerMixin, JobSerializer):
+class JobListSerializer(JobSerializer):
     class Meta:
         fields = ('*', '-job_args', '-job_cwd', '-job_env', '-result_traceback', '-event_processing_finished')
 
@@ -1064,7 +1152,7 @@ class CatalogSerializer(BaseSerializer):
         return ret
 
 
-class CatalogListSerializer(DynamicFieldsSerializerMixin, CatalogSerializer):
+class CatalogListSerializer(CatalogSerializer):
     class Meta:
         model = Catalog
         fields = ('id', 'url', 'archive_name', 'path', 'job', 'mode', 'mtime', 'owner', 'group', 'size', 'healthy')
@@ -8,7 +8,7 @@ from cyborgbackup.main.models.catalogs import Catalog
 from cyborgbackup.main.models.jobs import Job
 from cyborgbackup.main.validators import vars_validate_or_raise
 # CyBorgBackup
-from .base import BaseSerializer, DynamicFieldsSerializerMixin
+from .base import BaseSerializer
 
 logger = logging.getLogger('cyborgbackup.api.serializers.catalogs')
 
@@ -51,12 +51,12 @@ class CatalogSerializer(BaseSerializer):
 
     def to_representation(self, obj):
         ret = super(CatalogSerializer, self).to_representation(obj)
-        if obj is not None and 'job' in ret and not obj.job:
+        if obj is not None and 'job' in ret and not obj.job_id:
             ret['job'] = None
         return ret
 
 
-class CatalogListSerializer(DynamicFieldsSerializerMixin, CatalogSerializer):
+class CatalogListSerializer(CatalogSerializer):
     class Meta:
         model = Catalog
         fields = ('id', 'url', 'archive_name', 'path', 'job', 'mode', 'mtime', 'owner', 'group', 'size', 'healthy')
@@ -5,7 +5,6 @@ import logging
 from rest_framework import serializers
 
 from cyborgbackup.main.models.clients import Client
-from cyborgbackup.main.models.policies import Policy
 # CyBorgBackup
 from .base import BaseSerializer
 
@@ -15,6 +14,7 @@ logger = logging.getLogger('cyborgbackup.api.serializers.clients')
 class ClientSerializer(BaseSerializer):
     can_be_updated = serializers.SerializerMethodField()
     show_capabilities = ['edit', 'delete']
+    prefetch_related_fields = ('policy_set',)
 
     class Meta:
         model = Client
@@ -24,8 +24,8 @@ class ClientSerializer(BaseSerializer):
 
     def get_summary_fields(self, obj):
         summary_dict = super(ClientSerializer, self).get_summary_fields(obj)
-        relPolicies = Policy.objects.filter(clients__id=obj.pk)
-        if relPolicies.exists():
+        relPolicies = obj.policy_set.all()
+        if relPolicies:
             summary_dict['policies'] = []
             for pol in relPolicies:
                 summary_dict['policies'].append({'id': pol.id, 'name': pol.name})
@@ -11,7 +11,7 @@ from rest_framework import serializers
 from cyborgbackup.main.constants import ACTIVE_STATES, ANSI_SGR_PATTERN
 from cyborgbackup.main.models.jobs import Job, JobEvent
 # CyBorgBackup
-from .base import BaseSerializer, DynamicFieldsSerializerMixin
+from .base import BaseSerializer, EmptySerializer
 
 logger = logging.getLogger('cyborgbackup.api.serializers.jobs')
 
@@ -30,11 +30,15 @@ class JobSerializer(BaseSerializer):
                   'failed', 'started', 'finished', 'elapsed', 'job_args',
                   'original_size', 'compressed_size', 'deduplicated_size', 'archive_name',
                   'job_cwd', 'job_env', 'job_explanation', 'client', 'repository', 'master_job',
-                  'dependent_jobs', 'result_traceback', 'event_processing_finished', 'job_type')
+                  'dependent_jobs', 'result_traceback', 'event_processing_finished', 'job_type',
+                  'priority', 'deadline', 'start_after', 'execution_node')
 
     def get_types(self):
         return ['job']
 
+    select_related_fields = ('policy__repository', 'policy__schedule')
+    field_sources = dict(BaseSerializer.field_sources, elapsed=('elapsed', 'started', 'finished'))
+
     def get_summary_fields(self, obj):
         summary_dict = super(JobSerializer, self).get_summary_fields(obj)
         if obj.policy and obj.policy.repository_id:
@@ -96,6 +100,13 @@ class JobStdoutSerializer(JobSerializer):
         return ['job']
 
 
+class JobStdoutTailSerializer(EmptySerializer):
+    events = serializers.ListField()
+    last_counter = serializers.IntegerField()
+    version = serializers.IntegerField()
+    finished = serializers.BooleanField()
+
+
 class JobCancelSerializer(JobSerializer):
     can_cancel = serializers.BooleanField(read_only=True)
 
@@ -125,7 +136,7 @@ class JobRelaunchSerializer(BaseSerializer):
         return attrs
 
 
-class JobListSerializer(DynamicFieldsSerializerMixin, JobSerializer):
+class JobListSerializer(JobSerializer):
     class Meta:
         fields = ('*', '-job_args', '-job_cwd', '-job_env', '-result_traceback', '-event_processing_finished')
 
@@ -143,7 +154,7 @@ class JobListSerializer(DynamicFieldsSerializerMixin, JobSerializer):
 
     def to_representation(self, obj):
         serializer_class = None
-        if type(self) is JobListSerializer:
+        if type(self) is JobListSerializer and not self.sparse_fields:
             if isinstance(obj, Job):
                 serializer_class = JobSerializer
         if serializer_class:
@@ -167,6 +178,8 @@ class JobEventSerializer(BaseSerializer):
                   'changed', 'uuid', 'task', 'stdout', 'start_line', 'end_line',
                   'verbosity', '-created_by', '-modified_by')
 
+    field_sources = dict(BaseSerializer.field_sources, stdout=('stdout', 'event'))
+
     def get_related(self, obj):
         res = super(JobEventSerializer, self).get_related(obj)
         res.update(dict(
@@ -184,10 +197,10 @@ class JobEventSerializer(BaseSerializer):
         if hasattr(self.context.get('view', None), 'retrieve'):
             return ret
         # Show full stdout for playbook_on_* events.
-        if obj and obj.event.startswith('playbook_on'):
+        if 'stdout' not in ret or (obj and obj.event.startswith('playbook_on')):
             return ret
         max_bytes = 1024
-        if 0 < max_bytes <= len(ret['stdout']) and 'stdout' in ret:
+        if 0 < max_bytes <= len(ret['stdout']):
             ret['stdout'] = ret['stdout'][:(max_bytes - 1)] + u'\u2026'
             set_count = 0
             reset_count = 0
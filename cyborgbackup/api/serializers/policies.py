@@ -19,7 +19,7 @@ class PolicySerializer(BaseSerializer):
                   'clients', 'repository', 'schedule', 'policy_type', 'keep_hourly',
                   'keep_yearly', 'keep_daily', 'keep_weekly', 'keep_monthly',
                   'vmprovider', 'next_run', 'mode_pull', 'enabled', 'created', 'modified',
-                  'prehook', 'posthook')
+                  'prehook', 'posthook', 'priority', 'backup_window_end', 'start_window')
 
     def get_related(self, obj):
         res = super(PolicySerializer, self).get_related(obj)
@@ -33,9 +33,9 @@ class PolicySerializer(BaseSerializer):
 
     def to_representation(self, obj):
         ret = super(PolicySerializer, self).to_representation(obj)
-        if obj is not None and 'schedule' in ret and not obj.schedule:
+        if obj is not None and 'schedule' in ret and not obj.schedule_id:
             ret['schedule'] = None
-        if obj is not None and 'repository' in ret and not obj.repository:
+        if obj is not None and 'repository' in ret and not obj.repository_id:
             ret['repository'] = None
         return ret
 
@@ -1,9 +1,12 @@
 # Python
 import logging
 
+# Django REST Framework
+from rest_framework import serializers
+
 from cyborgbackup.main.models.repositories import Repository
 # CyBorgBackup
-from .base import BaseSerializer
+from .base import BaseSerializer, EmptySerializer
 
 logger = logging.getLogger('cyborgbackup.api.serializers.repositories')
 
@@ -14,7 +17,8 @@ class RepositorySerializer(BaseSerializer):
     class Meta:
         model = Repository
         fields = ('id', 'uuid', 'url', 'name', 'path', 'repository_key',
-                  'original_size', 'compressed_size', 'deduplicated_size', 'ready', 'enabled', 'created', 'modified')
+                  'original_size', 'compressed_size', 'deduplicated_size', 'capacity', 'ready', 'enabled',
+                  'created', 'modified')
 
     def update(self, obj, validated_data):
         obj = super(RepositorySerializer, self).update(obj, validated_data)
@@ -36,3 +40,8 @@ class RepositoryListSerializer(RepositorySerializer):
 
     def get_types(self):
         return ['repository']
+
+
+class RepositoryForecastSerializer(EmptySerializer):
+    forecast = serializers.DictField()
+    history = serializers.ListField()
@@ -1,7 +1,10 @@
 import logging
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.reverse import reverse
 from rest_framework.test import APITestCase
@@ -16,6 +19,42 @@ class CyborgbackupApiTest(APITestCase):
     user_login = 'admin@cyborg.local'
     user_pass = 'adminadmin'
 
+    def setUp(self):
+        # The database is rolled back between tests, drop the cached responses.
+        cache.clear()
+
+    def assertListQueriesConstant(self, url, **params):
+        """
+        Assert listing url takes the same number of queries with a page of
+        one object and with a page of all of them.
+        """
+        self.client.login(username=self.user_login, password=self.user_pass)
+        queries = []
+        for page_size in (1, 100):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url, dict(params, page_size=page_size), format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            queries.append(len(context))
+        self.assertEqual(queries[0], queries[1])
+
+    def create_job(self, name='Backup', created=None, **kwargs):
+        """
+        Create a backup job, pending unless another status is given.
+        """
+        from cyborgbackup.main.models import Job
+        kwargs.setdefault('job_type', 'job')
+        kwargs.setdefault('status', 'pending')
+        job = Job.objects.create(name=name, **kwargs)
+        if created is not None:
+            # The creation date is set on save, change it afterwards.
+            Job.objects.filter(pk=job.pk).update(created=created)
+            job.created = created
+        return job
+
+    def create_repository(self, name='Other'):
+        from cyborgbackup.main.models import Repository
+        return Repository.objects.create(name=name, path='/tmp/{}'.format(name.lower()), repository_key='key')
+
     def test_page_not_found(self, mocked):
         response = self.client.get('/notFound', format='json')
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -136,6 +175,639 @@ class CyborgbackupApiTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data, [])
 
+    def test_api_v1_access_stats_rollup(self, mocked):
+        from cyborgbackup.main.models import Job, Policy
+        policy = Policy.objects.get(pk=1)
+        for job_status in ('successful', 'failed'):
+            job = Job.objects.create(name='Backup', policy=policy, client=policy.clients.first(), job_type='job',
+                                     status='running', original_size=1000)
+            job.status = job_status
+            job.save()
+        url = reverse('api:stats')
+        self.client.login(username=self.user_login, password=self.user_pass)
+        response = self.client.get(url, {'group_by': 'month,policy'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['policy'], 1)
+        self.assertEqual(response.data[0]['size'], 2000)
+        self.assertEqual(response.data[0]['success'], 1)
+        self.assertEqual(response.data[0]['failed'], 1)
+        response = self.client.get(url, {'group_by': 'year'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_stats_rollup_concurrent_jobs(self, mocked):
+        from django.db.models import QuerySet
+        from django.utils.timezone import now
+        from cyborgbackup.main.models import JobDailyStat
+        jobs = [self.create_job(status='running', started=now(), original_size=1000) for _ in range(2)]
+        for job in jobs:
+            job.status = 'successful'
+        jobs[0].save()
+        # The second job looks its group up before the first one is committed.
+        get = QuerySet.get
+        lookups = []
+
+        def late_get(queryset, *args, **kwargs):
+            lookups.append(kwargs)
+            if len(lookups) == 1:
+                raise JobDailyStat.DoesNotExist()
+            return get(queryset, *args, **kwargs)
+
+        with patch.object(QuerySet, 'get', late_get):
+            jobs[1].save()
+        stat = JobDailyStat.objects.get()
+        self.assertIsNone(stat.policy_id)
+        self.assertEqual(stat.jobs, 2)
+        self.assertEqual(stat.original_size, 2000)
+
+    def test_api_v1_access_lists_queries(self, mocked):
+        from cyborgbackup.main.models import Client, Job, Policy
+        policy = Policy.objects.get(pk=1)
+        for i in range(3):
+            client = Client.objects.create(hostname='client{}.cyborg.local'.format(i))
+            policy.clients.add(client)
+            Job.objects.create(name='Backup {}'.format(i), policy=policy, client=client, job_type='job')
+        for url in ('job_list', 'client_list', 'policy_list'):
+            self.assertListQueriesConstant(reverse('api:{}'.format(url)))
+
+    def test_api_v1_access_lists_query_plan(self, mocked):
+        from cyborgbackup.main.models import Job, JobEvent, Policy
+        policy = Policy.objects.get(pk=1)
+        job = Job.objects.create(name='Backup', policy=policy, job_type='job', status='successful')
+        JobEvent.objects.create(job=job, event='verbose', counter=1, stdout='line')
+        self.client.login(username=self.user_login, password=self.user_pass)
+        for url, table, params in (('job_list', 'main_job', {'status': 'successful'}),
+                                   ('job_list', 'main_job', {'policy__search': policy.name}),
+                                   ('job_event_list', 'main_jobevent', {'event': 'verbose', 'job': job.pk})):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(reverse('api:{}'.format(url)), params, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['count'], 1)
+            sql = [query['sql'] for query in context.captured_queries
+                   if 'FROM "{}"'.format(table) in query['sql'] and 'LIMIT' in query['sql']][0]
+            with connection.cursor() as cursor:
+                cursor.execute('{} {}'.format(connection.ops.explain_query_prefix(), sql))
+                plan = ' '.join(str(row) for row in cursor.fetchall())
+            self.assertNotIn('DISTINCT', sql)
+            self.assertNotIn('DISTINCT', plan.upper())
+
+    def test_api_v1_access_lists_sparse_fields(self, mocked):
+        from cyborgbackup.main.models import Job, Policy
+        policy = Policy.objects.get(pk=1)
+        for i in range(3):
+            Job.objects.create(name='Backup {}'.format(i), policy=policy, job_type='job', status='successful')
+        self.client.login(username=self.user_login, password=self.user_pass)
+        url = reverse('api:job_list')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, {'fields': 'id,status'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+        for job in response.data['results']:
+            self.assertEqual(set(job.keys()), {'id', 'status'})
+        sql = [query['sql'] for query in context.captured_queries
+               if 'FROM "main_job"' in query['sql'] and 'LIMIT' in query['sql']][0]
+        self.assertNotIn('"main_job"."job_args"', sql)
+        self.assertNotIn('JOIN', sql)
+        self.assertListQueriesConstant(url, fields='id,status,elapsed,policy')
+
+        for name in ('client_list', 'policy_list', 'repository_list', 'schedule_list'):
+            url = reverse('api:{}'.format(name))
+            response = self.client.get(url, {'exclude': 'related,summary_fields'}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            for item in response.data['results']:
+                self.assertIn('id', item)
+                self.assertNotIn('related', item)
+                self.assertNotIn('summary_fields', item)
+            self.assertListQueriesConstant(url, exclude='related,summary_fields')
+
+    def test_api_v1_access_lists_etag(self, mocked):
+        from cyborgbackup.main.models.schedules import Schedule
+        self.client.login(username=self.user_login, password=self.user_pass)
+        for name, table in (('client_list', 'main_client'), ('policy_list', 'main_policy'),
+                            ('repository_list', 'main_repository'), ('schedule_list', 'main_schedule'),
+                            ('stats', 'main_jobdailystat')):
+            url = reverse('api:{}'.format(name))
+            response = self.client.get(url, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            with CaptureQueriesContext(connection) as context:
+                cached = self.client.get(url, format='json')
+                not_modified = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(cached.data, response.data)
+            self.assertEqual(cached['ETag'], response['ETag'])
+            self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertFalse([query for query in context.captured_queries if table in query['sql']])
+
+        url = reverse('api:schedule_list')
+        response = self.client.get(url, format='json')
+        schedule = Schedule.objects.get(pk=response.data['results'][0]['id'])
+        schedule.name = 'Renamed'
+        schedule.save()
+        modified = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(modified.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(modified['ETag'], response['ETag'])
+        self.assertIn('Renamed', [schedule['name'] for schedule in modified.data['results']])
+
+    def test_api_v1_access_clients_new_borg_version(self, mocked):
+        from cyborgbackup.main.tasks.shared import check_borg_new_version
+        url = reverse('api:client_list')
+        self.client.login(username=self.user_login, password=self.user_pass)
+        response = self.client.get(url, format='json')
+        self.assertFalse(response.data['results'][0]['can_be_updated'])
+        mocked.return_value = True
+        with patch('cyborgbackup.main.tasks.shared.requests.get') as get, \
+                patch('cyborgbackup.main.tasks.shared.pymongo.MongoClient'):
+            get.return_value.json.return_value = {'tag_name': '1.4.0'}
+            check_borg_new_version()
+        response = self.client.get(url, format='json')
+        self.assertTrue(response.data['results'][0]['can_be_updated'])
+
+    def test_model_versions_keep_fast_deletes(self, mocked):
+        from django.db.models.deletion import Collector
+        from cyborgbackup.main.models import JobEvent, JobStdoutBlock
+        collector = Collector(using='default')
+        self.assertTrue(collector.can_fast_delete(JobEvent.objects.all()))
+        self.assertTrue(collector.can_fast_delete(JobStdoutBlock.objects.all()))
+
+    def test_heartbeat_job_workers_only(self, mocked):
+        from cyborgbackup.main.utils.heartbeat import Heartbeat
+        worker = Mock()
+        worker.app.amqp.queues.consume_from = {'main_tasks': Mock()}
+        self.assertFalse(Heartbeat(worker).include_if(worker))
+        worker.app.amqp.queues.consume_from = {'backup_job': Mock()}
+        self.assertTrue(Heartbeat(worker).include_if(worker))
+
+    def test_heartbeat_recreated_instance_keeps_locality(self, mocked):
+        from cyborgbackup.main.models import Instance
+        from cyborgbackup.main.utils.heartbeat import Heartbeat
+        worker = Mock(hostname='worker-job@node', concurrency=2)
+        worker.app.amqp.queues.consume_from = {'backup_job': Mock()}
+        heartbeat = Heartbeat(worker)
+        with self.settings(CYBORGBACKUP_NODE_NETWORKS=['10.0.0.0/8'], CYBORGBACKUP_NODE_REPOSITORIES=['Other']), \
+                patch('cyborgbackup.main.utils.tasks.schedule_task_manager'):
+            repository = self.create_repository()
+            heartbeat.start(worker)
+            Instance.objects.filter(hostname=worker.hostname).delete()
+            heartbeat.publish(worker)
+        instance = Instance.objects.get(hostname=worker.hostname)
+        self.assertEqual(instance.networks, ['10.0.0.0/8'])
+        self.assertEqual(list(instance.repositories.all()), [repository])
+
+    def test_task_manager_job_workers_only(self, mocked):
+        from django.utils.timezone import now
+        from cyborgbackup.main.models import Instance, Job
+        from cyborgbackup.main.utils.task_manager import TaskManager
+        Instance.objects.create(hostname='worker-main@node', capacity=1, queues=['main_tasks'], last_heartbeat=now())
+        job = Job.objects.create(name='Backup', job_type='job', status='pending')
+        manager = TaskManager()
+        manager.update_capacity()
+        self.assertFalse(manager.has_capacity())
+        self.assertIsNone(manager.select_execution_node(job))
+        Instance.objects.create(hostname='worker-job@node', capacity=2, queues=['backup_job'], last_heartbeat=now())
+        manager.update_capacity()
+        self.assertEqual(manager.graph['cyborgbackup']['capacity_total'], 2)
+        self.assertEqual(manager.select_execution_node(job).hostname, 'worker-job@node')
+
+    def test_task_manager_wakeup(self, mocked):
+        from django.db import transaction
+        from cyborgbackup.main.utils.tasks import TASK_MANAGER_WAKEUP_KEY, run_task_manager, schedule_task_manager
+        with patch.object(run_task_manager, 'apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    schedule_task_manager()
+                    transaction.set_rollback(True)
+            self.assertIsNone(cache.get(TASK_MANAGER_WAKEUP_KEY))
+            apply_async.assert_not_called()
+            with self.captureOnCommitCallbacks(execute=True):
+                schedule_task_manager()
+                schedule_task_manager()
+            self.assertTrue(cache.get(TASK_MANAGER_WAKEUP_KEY))
+            apply_async.assert_called_once()
+
+    def test_task_manager_job_snapshot(self, mocked):
+        from cyborgbackup.main.utils.task_manager import JobSnapshot, TaskManager
+        running = self.create_job(status='running', policy_id=1, client_id=1, repository_id=1)
+        pending = self.create_job(policy_id=1, client_id=1, repository_id=1)
+        check = self.create_job('Check', job_type='check', repository_id=1, dependent_jobs=pending)
+        self.create_job(status='successful', policy_id=1, client_id=1, repository_id=1)
+        with self.assertNumQueries(1):
+            snapshot = JobSnapshot().load()
+        self.assertEqual(set(snapshot.jobs), {running.pk, pending.pk, check.pk})
+        self.assertTrue(snapshot.repository_is_busy(1))
+        self.assertTrue(snapshot.client_is_busy(1))
+        self.assertFalse(snapshot.dependent_jobs_finished(pending))
+        self.assertEqual(snapshot.latest_repository_check(1).pk, check.pk)
+        running.status = 'successful'
+        snapshot.add(running)
+        self.assertFalse(snapshot.repository_is_busy(1))
+        self.assertFalse(snapshot.client_is_busy(1))
+        manager = TaskManager()
+        manager.get_tasks()
+        with self.assertNumQueries(0):
+            self.assertTrue(manager.is_job_blocked(manager.snapshot.jobs[pending.pk]))
+
+    def test_task_manager_scoped_pass(self, mocked):
+        from django.core.cache import cache
+        from django.utils.timezone import now
+        from cyborgbackup.main.models import Client
+        from cyborgbackup.main.utils.task_manager import TaskManager
+        other = self.create_job('Other', client=Client.objects.create(hostname='other'),
+                                repository=self.create_repository())
+        since = now()
+        cache.set('task_manager_last_run', since)
+        job = self.create_job(policy_id=1, client_id=1)
+        manager = TaskManager()
+        self.assertEqual(manager.get_affected_scope(since), ({1}, {1}))
+        self.assertTrue(manager.is_in_scope(job, ({1}, set())))
+        self.assertFalse(manager.is_in_scope(other, ({1}, {1})))
+        with patch.object(TaskManager, 'process_pending_tasks') as process_pending_tasks:
+            TaskManager()._schedule(scoped=True)
+            self.assertEqual([task.pk for task in process_pending_tasks.call_args[0][0]], [job.pk])
+            # A finished job frees capacity for every pending job.
+            self.create_job('Done', status='successful', policy_id=1, client_id=1)
+            self.assertIsNone(manager.get_affected_scope(since))
+            cache.set('task_manager_last_run', since)
+            TaskManager()._schedule(scoped=True)
+            self.assertEqual(sorted(task.pk for task in process_pending_tasks.call_args[0][0]),
+                             sorted([job.pk, other.pk]))
+
+    def test_task_manager_prioritize(self, mocked):
+        import datetime
+        from django.utils.timezone import now
+        from cyborgbackup.main.utils.task_manager import TaskManager
+        other = self.create_repository()
+        created = now() - datetime.timedelta(hours=1)
+        self.create_job('running', status='running', repository_id=1)
+        for minutes, name, repository_id, priority, deadline in (
+                (0, 'first', 1, 0, None), (1, 'second', 1, 0, None), (2, 'other', other.pk, 0, None),
+                (3, 'urgent', other.pk, 0, now() + datetime.timedelta(hours=1)), (4, 'important', 1, 5, None)):
+            self.create_job(name, repository_id=repository_id, priority=priority, deadline=deadline,
+                            created=created + datetime.timedelta(minutes=minutes))
+        manager = TaskManager()
+        pending = manager.get_tasks(('pending',))
+        # The running job counts in the share of its repository.
+        self.assertEqual([task.name for task in manager.prioritize(pending)],
+                         ['important', 'other', 'urgent', 'first', 'second'])
+
+    def test_periodic_scheduler_due_policies(self, mocked):
+        import datetime
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from django.utils.timezone import now
+        from cyborgbackup.main.models import Policy, Repository, Schedule
+        from cyborgbackup.main.models.schedules import CyborgBackupScheduleState
+        from cyborgbackup.main.tasks.shared import cyborgbackup_periodic_scheduler
+        Schedule.objects.filter(pk=1).update(enabled=True)
+        Repository.objects.filter(pk=1).update(enabled=True)
+        policy = Policy.objects.get(pk=1)
+        for name, enabled in (('Missed', True), ('Future', True), ('Disabled', False)):
+            policy.pk = None
+            policy.name = name
+            policy.enabled = enabled
+            policy.save()
+        policy = Policy.objects.get(pk=1)
+        policy.enabled = True
+        policy.save()
+        run_at = now()
+        CyborgBackupScheduleState.objects.create(pk=1)
+        CyborgBackupScheduleState.objects.filter(pk=1).update(
+            schedule_last_run=run_at - datetime.timedelta(minutes=10))
+        for name, delta in (('Demo Policy', -5), ('Missed', -60 * 24), ('Future', 60 * 24), ('Disabled', -5)):
+            Policy.objects.filter(name=name).update(next_run=run_at + datetime.timedelta(minutes=delta))
+        with patch('cyborgbackup.main.tasks.shared.emit_channel_notification') as emit, \
+                patch.object(Policy, 'create_job') as create_job, \
+                CaptureQueriesContext(connection) as context:
+            cyborgbackup_periodic_scheduler()
+        create_job.assert_called_once()
+        ids = dict(Policy.objects.values_list('name', 'id'))
+        self.assertEqual([call.args for call in emit.call_args_list], [
+            ('schedules-changed', dict(id=ids['Missed'], group_name='schedules')),
+            ('schedules-changed', dict(id=ids['Demo Policy'], group_name='schedules')),
+            ('schedules-changed', dict(id=ids['Demo Policy'], group_name='jobs')),
+        ])
+        self.assertEqual(len([query for query in context.captured_queries
+                              if query['sql'].startswith('UPDATE "main_policy"')]), 1)
+        next_runs = dict(Policy.objects.values_list('name', 'next_run'))
+        self.assertGreater(next_runs['Demo Policy'], run_at)
+        self.assertGreater(next_runs['Missed'], run_at)
+        self.assertEqual(next_runs['Future'], run_at + datetime.timedelta(days=1))
+        self.assertLess(next_runs['Disabled'], run_at)
+
+    def test_policy_start_window(self, mocked):
+        import datetime
+        from django.utils.timezone import now
+        from cyborgbackup.main.models import Client, Job, Policy
+        from cyborgbackup.main.utils.task_manager import TaskManager
+        policy = Policy.objects.get(pk=1)
+        client = Client.objects.get(pk=1)
+        self.assertEqual(policy.get_start_offset(client), datetime.timedelta(0))
+        policy.start_window = 10
+        offset = policy.get_start_offset(client)
+        self.assertEqual(policy.get_start_offset(client), offset)
+        self.assertTrue(datetime.timedelta(0) <= offset < datetime.timedelta(minutes=10))
+        manager = TaskManager()
+        job = Job(name='Backup', job_type='job', status='pending', start_after=now() + offset)
+        self.assertFalse(manager.is_released(job, now() - datetime.timedelta(seconds=1)))
+        self.assertTrue(manager.is_released(job, now() + offset))
+        self.assertTrue(manager.is_released(Job(name='Backup', job_type='job', status='pending'), now()))
+
+    def test_task_manager_bandwidth_budget(self, mocked):
+        from cyborgbackup.main.models import Client
+        from cyborgbackup.main.utils.task_manager import TaskManager
+        Client.objects.filter(pk=1).update(bandwidth_limit=60)
+        other = Client.objects.create(hostname='other', bandwidth_limit=60)
+        pending = self.create_job(client_id=1)
+        manager = TaskManager()
+        manager.get_tasks()
+        task = manager.snapshot.jobs[pending.pk]
+        with self.settings(CYBORGBACKUP_BANDWIDTH_BUDGET=100):
+            # A job always starts alone, even above the budget.
+            self.assertFalse(manager.is_over_bandwidth_budget(task))
+            self.create_job(status='running', client=other)
+            manager.get_tasks()
+            self.assertEqual(manager.snapshot.bandwidth_in_use(), 60)
+            self.assertTrue(manager.is_over_bandwidth_budget(task))
+        with self.settings(CYBORGBACKUP_BANDWIDTH_BUDGET=0):
+            self.assertFalse(manager.is_over_bandwidth_budget(task))
+
+    def test_borg_output_filter(self, mocked):
+        from cyborgbackup.main.utils.borg import BorgOutputFilter
+        events = []
+        stdout_handle = BorgOutputFilter(events.append)
+        stdout_handle.write('{"type": "log_message", "levelname": "WARNING", "message": "file changed"}\r\n'
+                            '{"type": "archive_progress", "original_size": 1000, ')
+        stdout_handle.write('"nfiles": 2, "time": 1}\r\n{\r\n    "archive": {\r\n        "name": "a1",\r\n')
+        stdout_handle.write('        "stats": {"original_size": 1000, "compressed_size": 500, '
+                            '"deduplicated_size": 100, "nfiles": 3}\r\n    }\r\n}\r\n')
+        stdout_handle.write('{\r\n  not json\r\n}\r\nafter\r\n')
+        stdout_handle.close()
+        self.assertEqual(events[0]['event'], 'warning')
+        self.assertEqual(events[0]['stdout'], 'file changed')
+        self.assertEqual(events[1]['event'], 'progress')
+        self.assertEqual(events[1]['event_data']['nfiles'], 2)
+        self.assertEqual(stdout_handle.stats['archive_name'], 'a1')
+        self.assertEqual(stdout_handle.stats['archive_files'], 3)
+        self.assertEqual(stdout_handle.stats['archive']['deduplicated_size'], 100)
+        self.assertEqual([event['stdout'] for event in events[-5:-1]], ['{', '  not json', '}', 'after'])
+        self.assertEqual(events[-1]['event'], 'EOF')
+        self.assertEqual([event['start_line'] for event in events[:-1]], list(range(len(events) - 1)))
+
+    def test_borg_output_filter_without_documents(self, mocked):
+        from cyborgbackup.main.utils.borg import BorgOutputFilter
+        events = []
+        stdout_handle = BorgOutputFilter(events.append, parse_documents=False)
+        stdout_handle.write('{\r\n    "archive": {"name": "a1"}\r\n}\r\n')
+        stdout_handle.close()
+        self.assertEqual([event['stdout'] for event in events[:-1]], ['{', '    "archive": {"name": "a1"}', '}'])
+        self.assertEqual(stdout_handle.stats, {})
+
+    def test_backup_archive_name(self, mocked):
+        from cyborgbackup.main.models import Client, Job, Policy
+        from cyborgbackup.main.tasks.builders.backup import _build_args_for_backup, get_archive_name
+        Policy.objects.filter(pk=1).update(extra_vars='{}')
+        policy = Policy.objects.get(pk=1)
+        client = Client.objects.get(pk=1)
+        job = Job.objects.create(name='Backup', job_type='job', policy=policy, client=client)
+        archive_name = '{}-{}-{}'.format(policy.policy_type, client.hostname, job.created.strftime('%Y-%m-%d_%H-%M'))
+        self.assertEqual(get_archive_name(job), archive_name)
+        with patch('cyborgbackup.main.tasks.builders.backup.build_env',
+                   return_value={'PRIVATE_DATA_DIR': '/tmp/cyborgbackup'}):
+            args = _build_args_for_backup(job, display=True)
+            self.assertIn(archive_name, ' '.join(args))
+            job.refresh_from_db()
+            self.assertFalse(job.archive_name)
+            _build_args_for_backup(job)
+        job.refresh_from_db()
+        self.assertEqual(job.archive_name, archive_name)
+
+    def test_notification_report(self, mocked):
+        from django.utils.timezone import now
+        from cyborgbackup.main.models import Client, Job, Policy
+        from cyborgbackup.main.tasks.reports import build_report, render_email
+        for files in (1234, 5678):
+            Job.objects.create(name='Backup', job_type='job', status='successful', started=now(),
+                               policy=Policy.objects.get(pk=1), client=Client.objects.get(pk=1),
+                               archive_files=files, original_size=files * 1000)
+        with self.assertNumQueries(2):
+            report = build_report('daily')
+            report['columns'] = [{'title': 'Hostname', 'key': 'client', 'minsize': 10},
+                                 {'title': 'Number of Files', 'key': 'numberFiles', 'minsize': 17}]
+            text_version, _ = render_email(report, 'daily')
+        self.assertEqual(report['backups'], 2)
+        self.assertEqual([line['numberFiles'] for line in report['lines']], ['1234', '5678'])
+        self.assertIn('| 5678', text_version)
+
+    def test_notification_after_backup(self, mocked):
+        from cyborgbackup.main.models import Job, JobEvent
+        from cyborgbackup.main.tasks.helpers import get_job_output_excerpt
+        from cyborgbackup.main.tasks.reports import send_email
+        job = Job.objects.create(name='Backup', job_type='job', status='failed')
+        for line in range(10):
+            JobEvent.objects.create(job=job, event='error' if line == 5 else 'verbose', counter=line + 1,
+                                    stdout='line {}'.format(line), start_line=line, end_line=line + 1)
+        with self.settings(CYBORGBACKUP_NOTIFICATION_HEAD_LINES=2, CYBORGBACKUP_NOTIFICATION_TAIL_LINES=2):
+            lines = get_job_output_excerpt(job.pk)
+        self.assertEqual(lines, ['line 0', 'line 1', '...', 'line 5', '...', 'line 8', 'line 9'])
+        report = {'state': job.status, 'title': job.name, 'lines': lines, 'job': job}
+        with patch('cyborgbackup.main.tasks.reports.smtplib.SMTP') as smtp:
+            send_email(report, 'after', ['admin@cyborg.local', 'backup@cyborg.local'])
+        smtp.assert_called_once()
+        session = smtp.return_value.__enter__.return_value
+        self.assertEqual([call.args[0]['To'] for call in session.send_message.call_args_list],
+                         ['admin@cyborg.local', 'backup@cyborg.local'])
+
+    def test_notification_error_lines_budget(self, mocked):
+        from cyborgbackup.main.models import JobEvent
+        from cyborgbackup.main.tasks.helpers import get_job_output_excerpt
+        job = self.create_job(status='failed')
+        for counter, (event, stdout, start_line, end_line) in enumerate((
+                ('verbose', 'line 0\nline 1', 0, 2),
+                ('error', 'line 2\nline 3\nline 4\nline 5', 2, 6),
+                ('error', 'line 6 ', 6, 6),
+                ('verbose', 'continued', 6, 7),
+                ('verbose', '\n'.join('line {}'.format(line) for line in range(7, 20)), 7, 20))):
+            JobEvent.objects.create(job=job, event=event, counter=counter + 1, stdout=stdout,
+                                    start_line=start_line, end_line=end_line)
+        with self.settings(CYBORGBACKUP_NOTIFICATION_HEAD_LINES=1, CYBORGBACKUP_NOTIFICATION_TAIL_LINES=1,
+                           CYBORGBACKUP_NOTIFICATION_ERROR_LINES=2):
+            lines = get_job_output_excerpt(job.pk)
+        self.assertEqual(lines, ['line 0', '...', 'line 2', 'line 3', '...', 'line 19'])
+        with self.settings(CYBORGBACKUP_NOTIFICATION_HEAD_LINES=1, CYBORGBACKUP_NOTIFICATION_TAIL_LINES=1,
+                           CYBORGBACKUP_NOTIFICATION_ERROR_LINES=10):
+            lines = get_job_output_excerpt(job.pk)
+        self.assertEqual(lines, ['line 0', '...', 'line 2', 'line 3', 'line 4', 'line 5', 'line 6 continued',
+                                 '...', 'line 19'])
+
+    def test_api_v1_access_jobs_cursor(self, mocked):
+        from cyborgbackup.main.models import Job
+        jobs = [Job.objects.create(name='Backup {}'.format(i), job_type='job').pk for i in range(3)]
+        url = reverse('api:job_list')
+        self.client.login(username=self.user_login, password=self.user_pass)
+        response = self.client.get(url, {'cursor': '', 'page_size': 2}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        seen = [job['id'] for job in response.data['results']]
+        response = self.client.get(response.data['next'], format='json')
+        seen += [job['id'] for job in response.data['results']]
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(seen, sorted(jobs))
+
+    def test_api_v1_get_job_stdout_range(self, mocked):
+        from cyborgbackup.main.models import Job, JobEvent
+        job = Job.objects.create(name='Backup', job_type='job', status='successful')
+        JobEvent.objects.create(job=job, event='verbose', counter=1, stdout='line 0', start_line=0, end_line=1)
+        JobEvent.objects.create(job=job, event='verbose', counter=2, stdout='line 1\r\nline 2\r\nline 3',
+                                start_line=1, end_line=4)
+        JobEvent.objects.create(job=job, event='verbose', counter=3, stdout='line 4', start_line=4, end_line=5)
+        url = reverse('api:job_stdout', kwargs={'pk': job.pk})
+        self.client.login(username=self.user_login, password=self.user_pass)
+        response = self.client.get(url, {'start_line': 2, 'end_line': 4, 'format': 'json'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['range'], {'start': 2, 'end': 4, 'absolute_end': 5})
+        self.assertEqual(response.data['content'], 'line 2\nline 3\n')
+        response = self.client.get(url, {'start_line': -2, 'format': 'json'})
+        self.assertEqual(response.data['range'], {'start': 3, 'end': 5, 'absolute_end': 5})
+        self.assertEqual(response.data['content'], 'line 3\nline 4\n')
+        response = self.client.get(url, {'format': 'txt_download'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), b'line 0\nline 1\nline 2\nline 3\nline 4\n')
+
+    def test_job_stdout_split_lines(self, mocked):
+        from cyborgbackup.main.models import Job, JobEvent
+        job = Job.objects.create(name='Backup', job_type='job', status='successful')
+        for counter, (stdout, start_line, end_line) in enumerate((('line 0', 0, 1), ('li', 1, 1), ('ne', 1, 1),
+                                                                  (' 1\r\nline 2', 1, 3), ('tail', 3, 3)), 1):
+            JobEvent.objects.create(job=job, event='verbose', counter=counter, stdout=stdout,
+                                    start_line=start_line, end_line=end_line)
+        self.assertEqual(job.get_stdout_line_count(), 4)
+        self.assertEqual(''.join(job.iter_stdout_lines(0, 4)), 'line 0\nline 1\nline 2\ntail\n')
+        self.assertEqual(list(job.iter_stdout_lines(1, 2)), ['line 1\n'])
+        self.assertEqual(list(job.iter_stdout_lines(2, 3)), ['line 2\n'])
+        self.assertEqual(list(job.iter_stdout_lines(3, 4)), ['tail\n'])
+
+    def test_api_v1_get_job_stdout_compacted(self, mocked):
+        from cyborgbackup.main.models import Job, JobEvent
+        job = Job.objects.create(name='Backup', job_type='job', status='failed', emitted_events=3)
+        JobEvent.objects.create(job=job, event='verbose', counter=1, stdout='line 0\r\nline 1', start_line=0,
+                                end_line=2)
+        JobEvent.objects.create(job=job, event='error', counter=2, stdout='line 2', start_line=2, end_line=3)
+        JobEvent.objects.create(job=job, event='verbose', counter=3, stdout='line 3', start_line=3, end_line=4)
+        with self.settings(CYBORGBACKUP_STDOUT_BLOCK_LINES=3):
+            self.assertTrue(job.compact_stdout())
+        self.assertEqual(job.stdout_blocks.count(), 2)
+        self.assertEqual(list(job.job_events.values_list('event', flat=True)), ['error'])
+        self.assertTrue(job.event_processing_finished)
+        url = reverse('api:job_stdout', kwargs={'pk': job.pk})
+        self.client.login(username=self.user_login, password=self.user_pass)
+        response = self.client.get(url, {'start_line': 1, 'end_line': 4, 'format': 'json'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['range'], {'start': 1, 'end': 4, 'absolute_end': 4})
+        self.assertEqual(response.data['content'], 'line 1\nline 2\nline 3\n')
+
+    def test_job_stdout_compacted_control_characters(self, mocked):
+        from cyborgbackup.main.models import Job, JobEvent
+        job = Job.objects.create(name='Backup', job_type='job', status='successful', emitted_events=2)
+        JobEvent.objects.create(job=job, event='verbose', counter=1, stdout='files 1\rfiles 2', start_line=0,
+                                end_line=1)
+        JobEvent.objects.create(job=job, event='verbose', counter=2, stdout='page\x0cbreak', start_line=1,
+                                end_line=2)
+        self.assertTrue(job.compact_stdout())
+        self.assertEqual(list(job.iter_stdout_lines(0, 2)), ['files 1\rfiles 2\n', 'page\x0cbreak\n'])
+        self.assertEqual(list(job.iter_stdout_lines(1, 2)), ['page\x0cbreak\n'])
+
+    def test_compact_jobs_stdout_missing_events(self, mocked):
+        import datetime
+        from django.utils.timezone import now
+        from cyborgbackup.main.models import Job, JobEvent
+        from cyborgbackup.main.tasks.shared import compact_jobs_stdout
+        jobs = []
+        for hours in (2, 48):
+            job = Job.objects.create(name='Backup', job_type='job', status='successful', emitted_events=2)
+            JobEvent.objects.create(job=job, event='verbose', counter=1, stdout='line', start_line=0, end_line=1)
+            Job.objects.filter(pk=job.pk).update(finished=now() - datetime.timedelta(hours=hours))
+            jobs.append(job)
+        compact_jobs_stdout()
+        self.assertEqual([Job.objects.get(pk=job.pk).stdout_compacted for job in jobs], [False, True])
+        self.assertEqual(list(Job.objects.get(pk=jobs[1].pk).iter_stdout_lines(0, 1)), ['line\n'])
+
+    def test_api_v1_get_job_stdout_cache(self, mocked):
+        from cyborgbackup.main.models import Job, JobEvent
+        from cyborgbackup.main.utils.stdout import get_stdout_cache_version
+        job = Job.objects.create(name='Backup', job_type='job', status='successful', emitted_events=3)
+        for line in range(3):
+            JobEvent.objects.create(job=job, event='verbose', counter=line + 1, stdout='\x1b[31mline\x1b[0m',
+                                    start_line=line, end_line=line + 1)
+        version = get_stdout_cache_version(job.pk)
+        prefix = 'cyborgbackup_job_stdout_{}_{}_html'.format(job.pk, version)
+        url = reverse('api:job_stdout', kwargs={'pk': job.pk})
+        self.client.login(username=self.user_login, password=self.user_pass)
+        with self.settings(CYBORGBACKUP_STDOUT_RENDER_BLOCK_LINES=2):
+            response = self.client.get(url, {'format': 'json'})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['content'].count('line'), 3)
+            self.assertIsNotNone(cache.get(prefix + '_0_2'))
+            self.assertIsNotNone(cache.get(prefix + '_2_3'))
+            JobEvent.objects.filter(job=job).update(stdout='changed')
+            response = self.client.get(url, {'format': 'json', 'start_line': 0, 'end_line': 2})
+            self.assertEqual(response.data['content'].count('line'), 2)
+        job_id = job.pk
+        job.delete()
+        self.assertNotEqual(get_stdout_cache_version(job_id), version)
+
+    def test_job_stdout_cache_missing_events(self, mocked):
+        from cyborgbackup.main.models import Job, JobEvent
+        from cyborgbackup.main.utils.stdout import render_stdout
+        job = Job.objects.create(name='Backup', job_type='job', status='successful', emitted_events=2)
+        JobEvent.objects.create(job=job, event='verbose', counter=1, stdout='line', start_line=0, end_line=1)
+        self.assertEqual(render_stdout(job, 0, 1), 'line\n')
+        JobEvent.objects.create(job=job, event='verbose', counter=2, stdout='late', start_line=1, end_line=2)
+        self.assertEqual(render_stdout(job, 0, 2), 'line\nlate\n')
+
+    def test_api_v1_get_job_stdout_tail(self, mocked):
+        from cyborgbackup.main.models import Job, JobEvent
+        job = Job.objects.create(name='Backup', job_type='job', status='running')
+        for counter in (1, 2):
+            JobEvent.create_from_data(job_id=job.pk, event='verbose', counter=counter, stdout='line',
+                                      start_line=counter - 1, end_line=counter)
+        url = reverse('api:job_stdout_tail', kwargs={'pk': job.pk})
+        self.client.login(username=self.user_login, password=self.user_pass)
+        response = self.client.get(url, {'since_counter': 1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([event['counter'] for event in response.data['events']], [2])
+        self.assertEqual(response.data['last_counter'], 2)
+        self.assertEqual(response.data['version'], 0)
+        self.assertFalse(response.data['finished'])
+        JobEvent.create_from_data(job_id=job.pk, event='verbose', counter=3, stdout='line', start_line=2,
+                                  end_line=3)
+        # Session, user and job, the events are not queried.
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {'since_counter': 2, 'version': 0}, format='json')
+        self.assertEqual(response.data['events'], [])
+        self.assertEqual(response.data['last_counter'], 2)
+        JobEvent.notify_stdout(job.pk)
+        response = self.client.get(url, {'since_counter': 2, 'version': 0}, format='json')
+        self.assertEqual([event['counter'] for event in response.data['events']], [3])
+        self.assertEqual(response.data['version'], 1)
+        job.status = 'successful'
+        job.emitted_events = 3
+        job.save()
+        response = self.client.get(url, {'since_counter': 3, 'version': 2}, format='json')
+        self.assertEqual(response.data['events'], [])
+        self.assertTrue(response.data['finished'])
+
+    def test_callback_receiver_stdout_notifier(self, mocked):
+        from cyborgbackup.main.management.commands.run_callback_receiver import StdoutNotifier
+        from cyborgbackup.main.models import JobEvent
+        notifier = StdoutNotifier()
+        with self.settings(CYBORGBACKUP_STDOUT_NOTIFY_INTERVAL=60):
+            for job_id in (1, 1, 2, None):
+                notifier.add(job_id)
+        self.assertEqual(JobEvent.get_stdout_version(1), 0)
+        notifier.flush()
+        self.assertEqual([JobEvent.get_stdout_version(job_id) for job_id in (1, 2)], [1, 1])
+        with self.settings(CYBORGBACKUP_STDOUT_NOTIFY_INTERVAL=0):
+            notifier.add(1)
+        self.assertEqual(JobEvent.get_stdout_version(1), 2)
+
     def test_api_v1_get_schedule_1(self, mocked):
         url = reverse('api:schedule_detail', kwargs={'pk': 1})
         self.client.login(username=self.user_login, password=self.user_pass)
@@ -187,6 +859,18 @@ class CyborgbackupApiTest(APITestCase):
         self.assertIn(url, response.data['url'])
         self.assertFalse(response.data['enabled'])
 
+    def test_api_v1_access_schedules_update_schedule_policies(self, mocked):
+        url = reverse('api:schedule_detail', kwargs={'pk': 1})
+        self.client.login(username=self.user_login, password=self.user_pass)
+        data = {"crontab": "0 3 * * * *"}
+        response = self.client.patch(url, data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        url = reverse('api:policy_detail', kwargs={'pk': 1})
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('T03:00:00', response.data['next_run'])
+
     def test_api_v1_access_schedules_delete_schedule(self, mocked):
         url = reverse('api:schedule_list')
         self.client.login(username=self.user_login, password=self.user_pass)
@@ -224,6 +908,70 @@ class CyborgbackupApiTest(APITestCase):
         self.assertEqual(response.data['path'], "/tmp/repository")
         self.assertEqual(response.data['repository_key'], "0123456789abcdef")
 
+    def test_api_v1_get_repository_1_forecast(self, mocked):
+        import datetime
+        from django.utils.timezone import now
+        from cyborgbackup.main.models import Repository, RepositorySize
+        today = now().date()
+        Repository.objects.filter(pk=1).update(capacity=10000, deduplicated_size=5000)
+        for days in range(10):
+            RepositorySize.objects.record(1, None, {'deduplicated_size': 5000 - days * 100},
+                                          day=today - datetime.timedelta(days=days))
+        url = reverse('api:repository_forecast', kwargs={'pk': 1})
+        self.client.login(username=self.user_login, password=self.user_pass)
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['history']), 10)
+        self.assertAlmostEqual(response.data['forecast']['growth_per_day'], 100)
+        self.assertEqual(response.data['forecast']['full_date'], today + datetime.timedelta(days=50))
+
+    def test_repository_retention_days_auto_prune(self, mocked):
+        from cyborgbackup.main.models import Policy, Repository
+        from cyborgbackup.main.models.settings import Setting
+        Policy.objects.filter(pk=1).update(enabled=True, keep_daily=7)
+        repository = Repository.objects.get(pk=1)
+        self.assertEqual(repository.get_retention_days(), 7)
+        Setting.objects.filter(key='cyborgbackup_auto_prune').update(value='False')
+        self.assertIsNone(repository.get_retention_days())
+        # Prune jobs are created when the setting is missing.
+        Setting.objects.filter(key='cyborgbackup_auto_prune').delete()
+        self.assertEqual(repository.get_retention_days(), 7)
+
+    def test_repository_forecast_after_saturation(self, mocked):
+        import datetime
+        from django.utils.timezone import now
+        from cyborgbackup.main.models import Client, Repository, RepositorySize
+        today = now().date()
+        Repository.objects.filter(pk=1).update(capacity=10000, deduplicated_size=5000)
+        for days in range(10):
+            RepositorySize.objects.record(1, None, {'deduplicated_size': 5000 - days * 100},
+                                          day=today - datetime.timedelta(days=days))
+        repository = Repository.objects.get(pk=1)
+        with patch.object(Repository, 'get_retention_days', return_value=2):
+            forecast = repository.get_forecast()
+        self.assertIsNone(forecast['data_growth_per_day'])
+        self.assertEqual(forecast['full_date'], today + datetime.timedelta(days=50))
+        # Clients backed up on different days keep their last archive size.
+        other = Client.objects.create(hostname='other.cyborg.local', ip='', version='')
+        since = today - datetime.timedelta(days=30)
+        for client, size in ((1, 1000), (other.pk, 2000)):
+            RepositorySize.objects.record(1, client, {'original_size': size}, day=since - datetime.timedelta(days=5))
+        for days in range(10):
+            client, size = (1, 1000) if days % 2 else (other.pk, 2000)
+            RepositorySize.objects.record(1, client, {'original_size': size}, day=today - datetime.timedelta(days=days))
+        self.assertAlmostEqual(repository.get_data_growth(since), 0)
+
+    def test_repository_size_history_downsample(self, mocked):
+        import datetime
+        from cyborgbackup.main.models import RepositorySize
+        # 2020-12-28 to 2021-01-03 is the ISO week 53 of 2020.
+        for days in range(7):
+            RepositorySize.objects.record(1, None, {'deduplicated_size': days},
+                                          day=datetime.date(2020, 12, 28) + datetime.timedelta(days=days))
+        RepositorySize.objects.record(1, None, {'deduplicated_size': 7}, day=datetime.date(2021, 12, 31))
+        self.assertEqual(list(RepositorySize.objects.filter(repository=1).values_list('day', flat=True)),
+                         [datetime.date(2021, 1, 3), datetime.date(2021, 12, 31)])
+
     def test_api_v1_access_repositories_create_repository(self, mocked):
         url = reverse('api:repository_list')
         self.client.login(username=self.user_login, password=self.user_pass)
@@ -6,10 +6,10 @@ from .views.api import ApiRootView, ApiV1RootView, ApiV1PingView, ApiV1ConfigVie
 from .views.catalogs import CatalogList, CatalogDetail, MongoCatalog, RestoreLaunch
 from .views.clients import ClientList, ClientDetail
 from .views.generics import LoggedLoginView, LoggedLogoutView
-from .views.jobs import JobStart, JobCancel, JobRelaunch, JobJobEventsList, JobStdout, JobList, JobEventDetail, \
-    JobEventList, JobDetail
+from .views.jobs import JobStart, JobCancel, JobRelaunch, JobJobEventsList, JobStdout, JobStdoutTail, JobList, \
+    JobEventDetail, JobEventList, JobDetail
 from .views.policies import PolicyList, PolicyModule, PolicyDetail, PolicyLaunch, PolicyCalendar, PolicyVMModule
-from .views.repositories import RepositoryList, RepositoryDetail
+from .views.repositories import RepositoryList, RepositoryDetail, RepositoryForecast
 from .views.schedules import ScheduleList, ScheduleDetail
 from .views.settings import SettingList, SettingGetPublicSsh, SettingDetail, SettingGenerateSsh
 from .views.stats import Stats
@@ -33,6 +33,7 @@ schedule_urls = [
 repository_urls = [
     re_path(r'^$', RepositoryList.as_view(), name='repository_list'),
     re_path(r'^(?P<pk>[0-9]+)/$', RepositoryDetail.as_view(), name='repository_detail'),
+    re_path(r'^(?P<pk>[0-9]+)/forecast/$', RepositoryForecast.as_view(), name='repository_forecast'),
 ]
 
 catalog_urls = [
@@ -66,6 +67,7 @@ job_urls = [
     re_path(r'^(?P<pk>[0-9]+)/relaunch/$', JobRelaunch.as_view(), name='job_relaunch'),
     re_path(r'^(?P<pk>[0-9]+)/job_events/$', JobJobEventsList.as_view(), name='job_job_events_list'),
     re_path(r'^(?P<pk>[0-9]+)/stdout/$', JobStdout.as_view(), name='job_stdout'),
+    re_path(r'^(?P<pk>[0-9]+)/stdout/tail/$', JobStdoutTail.as_view(), name='job_stdout_tail'),
 ]
 
 setting_urls = [
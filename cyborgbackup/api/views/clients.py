@@ -7,17 +7,19 @@ from rest_framework.response import Response
 
 from cyborgbackup.main.models.clients import Client
 from cyborgbackup.main.models.policies import Policy
+from cyborgbackup.main.models.users import User
 # CyBorgBackup
-from .generics import RetrieveUpdateDestroyAPIView, ListCreateAPIView
+from .generics import RetrieveUpdateDestroyAPIView, ListCreateAPIView, ResponseCacheMixin
 from ..serializers.clients import ClientSerializer, ClientListSerializer
 
 logger = logging.getLogger('cyborgbackups.api.views.clients')
 
 
-class ClientList(ListCreateAPIView):
+class ClientList(ResponseCacheMixin, ListCreateAPIView):
     model = Client
     serializer_class = ClientListSerializer
     tags = ['Client']
+    response_cache_models = (Policy, User)
 
     @property
     def allowed_methods(self):
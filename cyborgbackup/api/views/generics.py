@@ -1,4 +1,5 @@
 # Python
+import hashlib
 import inspect
 import logging
 import time
@@ -6,13 +7,16 @@ import time
 # Django
 from django.conf import settings
 from django.contrib.auth import views as auth_views
+from django.core.cache import cache
 from django.core.exceptions import FieldDoesNotExist
 from django.db import connection
 from django.db.models.fields.related import OneToOneRel
+from django.db.models.query import ModelIterable
 from django.http import QueryDict
 from django.shortcuts import get_object_or_404
 from django.template.loader import render_to_string
 from django.utils.encoding import smart_str
+from django.utils.http import parse_etags, urlencode
 from django.utils.translation import gettext_lazy as _
 from rest_framework import generics
 from rest_framework import status
@@ -27,8 +31,10 @@ from cyborgbackup.api.filters import FieldLookupBackend
 from cyborgbackup.api.helpers import get_default_schema
 from cyborgbackup.api.metadata import SublistAttachDetatchMetadata
 from cyborgbackup.api.mixins import LoggingViewSetMixin
+from cyborgbackup.api.serializers.base import DynamicFieldsSerializerMixin
 from cyborgbackup.main.utils.common import (get_object_or_400, camelcase_to_underscore,
                                             getattrd, get_all_field_names, get_search_fields)
+from cyborgbackup.main.utils.cache import get_model_versions
 
 logger = logging.getLogger('cyborgbackup.api.views.generics')
 
@@ -191,16 +197,13 @@ class GenericAPIView(LoggingViewSetMixin, generics.GenericAPIView, APIView):
 
         serializer_class = self.get_serializer_class()
 
-        fields = None
-        if self.request and self.request.method == 'GET':
-            query_fields = self.request.query_params.get("fields", None)
-
-            if query_fields:
-                fields = tuple(query_fields.split(','))
-
         kwargs['context'] = self.get_serializer_context()
-        if fields:
-            kwargs['fields'] = fields
+        if self.request and self.request.method == 'GET' and \
+                issubclass(serializer_class, DynamicFieldsSerializerMixin):
+            for param in ('fields', 'exclude'):
+                query_fields = self.request.query_params.get(param, None)
+                if query_fields:
+                    kwargs[param] = tuple(query_fields.split(','))
 
         serializer = serializer_class(*args, **kwargs)
         # Override when called from browsable API to generate raw data form;
@@ -271,12 +274,33 @@ class ListAPIView(generics.ListAPIView, GenericAPIView):
     def search_fields(self):
         return get_search_fields(self.model)
 
+    def filter_queryset(self, queryset):
+        queryset = super(ListAPIView, self).filter_queryset(queryset)
+        return self.plan_related_queryset(queryset)
+
+    def plan_related_queryset(self, queryset):
+        """
+        Load the relations used by the serializer along with the objects of
+        the list, so serializing a page takes the same number of queries
+        whatever its size, and only the fields it reads.
+        """
+        serializer = self.get_serializer()
+        if not hasattr(serializer, 'get_queryset_relations') or not issubclass(queryset._iterable_class, ModelIterable):
+            return queryset
+        if getattr(serializer.Meta, 'model', None) is not queryset.model:
+            return queryset
+        select_related, prefetch_related = serializer.get_queryset_relations()
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        only = serializer.get_queryset_only_fields()
+        if only is not None:
+            queryset = queryset.only(*only)
+        return queryset
+
     def get_queryset(self):
         queryset = self.model.objects.all()
-        fields = self.request.query_params.get('fields', None)
-        if fields:
-            list_field = fields.split(',')
-            queryset = queryset.values(*list_field).distinct()
         order = self.request.query_params.get('order', '-id')
         if order and order in ('-id', 'foo', 'bar'):
             queryset = queryset.order_by(order)
@@ -327,6 +351,59 @@ class ListAPIView(generics.ListAPIView, GenericAPIView):
         return allowed_fields
 
 
+class ResponseCacheMixin(object):
+    """
+    Cache the data of the GET responses of a view until one of the models it
+    depends on is saved or deleted, keyed by the permission scope of the user
+    and the query string. Conditional requests matching the ETag of the
+    current response get a 304 without any query.
+
+    Subclasses may define:
+      response_cache_models = (ModelClass, ...)  # besides the view model
+    """
+    response_cache_models = ()
+
+    def get_response_cache_models(self):
+        return (self.model,) + tuple(self.response_cache_models)
+
+    def get_response_cache_scope(self):
+        user = self.request.user
+        if user.is_superuser:
+            return 'superuser'
+        return 'user-{}'.format(user.pk)
+
+    def get_response_cache_vary(self):
+        # Values, other than the models, the content of the response depends on.
+        return []
+
+    def get_response_cache_key(self):
+        query = sorted((key, value) for key, values in self.request.query_params.lists() for value in values)
+        parts = [self.get_response_cache_scope(), self.request.path, urlencode(query)]
+        parts += self.get_response_cache_vary()
+        parts += get_model_versions(self.get_response_cache_models())
+        return hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+    def get(self, request, *args, **kwargs):
+        key = self.get_response_cache_key()
+        etag = '"{}-{}"'.format(key, request.accepted_renderer.format)
+        etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if etag in etags or '*' in etags:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            cache_key = 'cyborgbackup_api_response_{}'.format(key)
+            data = cache.get(cache_key)
+            if data is None:
+                response = super(ResponseCacheMixin, self).get(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(cache_key, response.data,
+                          getattr(settings, 'CYBORGBACKUP_API_RESPONSE_CACHE_TIMEOUT', 300))
+            else:
+                response = Response(data)
+        response['ETag'] = etag
+        return response
+
+
 class ListCreateAPIView(ListAPIView, generics.ListCreateAPIView):
     # Base class for a list view that allows creating new objects.
     pass
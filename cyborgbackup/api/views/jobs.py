@@ -1,28 +1,26 @@
 # Python
-import cgi
 import logging
 import re
 from base64 import b64encode
-from wsgiref.util import FileWrapper
 
-import ansiconv
 import dateutil
 # Django
 from django.db import transaction
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from django.template.loader import render_to_string
 from django.utils.safestring import mark_safe
 from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
 # Django REST Framework
 from rest_framework import status, renderers
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import ParseError, PermissionDenied
 from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
 from cyborgbackup.main.constants import ACTIVE_STATES
-from cyborgbackup.main.models.jobs import Job, JobEvent
+from cyborgbackup.main.models.jobs import Job, JobEvent, StdoutMaxBytesExceeded
 from cyborgbackup.main.utils.common import camelcase_to_underscore
+from cyborgbackup.main.utils.stdout import render_stdout
 # CyBorgBackup
 from .generics import RetrieveUpdateDestroyAPIView, ListCreateAPIView, RetrieveAPIView, GenericAPIView, ListAPIView, \
     SubListAPIView
@@ -31,10 +29,13 @@ from ..renderers import BrowsableAPIRenderer, PlainTextRenderer, AnsiTextRendere
     AnsiDownloadRenderer
 from ..serializers.base import EmptySerializer
 from ..serializers.jobs import JobSerializer, JobEventSerializer, JobListSerializer, JobCancelSerializer, \
-    JobStdoutSerializer, JobRelaunchSerializer
+    JobStdoutSerializer, JobStdoutTailSerializer, JobRelaunchSerializer
 
 logger = logging.getLogger('cyborgbackups.api.views.jobs')
 
+# Maximum number of events returned by a request following the output of a job.
+STDOUT_TAIL_EVENTS = 1000
+
 
 class JobDeletionMixin(object):
     """
@@ -65,33 +66,6 @@ class JobDeletionMixin(object):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class StdoutANSIFilter(object):
-
-    def __init__(self, fileobj):
-        self.fileobj = fileobj
-        self.extra_data = ''
-        if hasattr(fileobj, 'close'):
-            self.close = fileobj.close
-
-    def read(self, size=-1):
-        data = self.extra_data
-        while size > 0 and len(data) < size:
-            line = self.fileobj.readline(size)
-            if not line:
-                break
-            # Remove ANSI escape sequences used to embed event data.
-            line = re.sub(r'\x1b\[K(?:[A-Za-z0-9+/=]+\x1b\[\d+D)+\x1b\[K', '', line)
-            # Remove ANSI color escape sequences.
-            line = re.sub(r'\x1b[^m]*m', '', line)
-            data += line
-        if 0 < size < len(data):
-            self.extra_data = data[size:]
-            data = data[:size]
-        else:
-            self.extra_data = ''
-        return data
-
-
 class JobList(ListCreateAPIView):
     model = Job
     serializer_class = JobListSerializer
@@ -120,13 +94,6 @@ class JobDetail(JobDeletionMixin, RetrieveUpdateDestroyAPIView):
         return super(JobDetail, self).update(request, *args, **kwargs)
 
 
-class StdoutMaxBytesExceeded(Exception):
-
-    def __init__(self, total, supported):
-        self.total = total
-        self.supported = supported
-
-
 class JobStdout(RetrieveAPIView):
     model = Job
     authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
@@ -150,12 +117,18 @@ class JobStdout(RetrieveAPIView):
                 dark = bool(dark_val and dark_val[0].lower() in ('1', 't', 'y'))
                 content_only = bool(target_format in ('api', 'json'))
                 dark_bg = (content_only and dark) or (not content_only and (dark or not dark_val))
-                content, start, end, absolute_end = job.result_stdout_raw_limited(start_line, end_line)
+                start, end, absolute_end = job.get_stdout_range(start_line, end_line)
+                stdout_range = {'start': start, 'end': end, 'absolute_end': absolute_end}
 
-                # Remove any ANSI escape sequences containing job event data.
-                content = re.sub(r'\x1b\[K(?:[A-Za-z0-9+/=]+\x1b\[\d+D)+\x1b\[K', '', content)
+                if target_format == 'json' and content_encoding == 'base64' and content_format == 'ansi':
+                    content = job.result_stdout_raw_limited(start, end)[0]
+                    # Remove any ANSI escape sequences containing job event data.
+                    content = re.sub(r'\x1b\[K(?:[A-Za-z0-9+/=]+\x1b\[\d+D)+\x1b\[K', '', content)
+                    return Response({'range': stdout_range, 'content': b64encode(content.encode('utf-8'))})
 
-                body = ansiconv.to_html(cgi.escape(content))
+                body = render_stdout(job, start, end)
+                if target_format == 'json' and content_format == 'html':
+                    return Response({'range': stdout_range, 'content': body})
 
                 context = {
                     'title': get_view_name(self.__class__),
@@ -167,16 +140,10 @@ class JobStdout(RetrieveAPIView):
 
                 if target_format == 'api':
                     return Response(mark_safe(data))
-                if target_format == 'json':
-                    if content_encoding == 'base64' and content_format == 'ansi':
-                        return Response({'range': {'start': start, 'end': end, 'absolute_end': absolute_end},
-                                         'content': b64encode(content.encode('utf-8'))})
-                    elif content_format == 'html':
-                        return Response({'range': {'start': start, 'end': end, 'absolute_end': absolute_end},
-                                         'content': body})
                 return Response(data)
             elif target_format == 'txt':
-                return Response(job.result_stdout)
+                start, end, _ = job.get_stdout_range()
+                return Response(render_stdout(job, start, end, content_format='txt'))
             elif target_format == 'ansi':
                 return Response(job.result_stdout_raw)
             elif target_format in {'txt_download', 'ansi_download'}:
@@ -185,10 +152,8 @@ class JobStdout(RetrieveAPIView):
                     pk=job.id,
                     suffix='.ansi' if target_format == 'ansi_download' else ''
                 )
-                content_fd = job.result_stdout_raw_handle(enforce_max_bytes=False)
-                if target_format == 'txt_download':
-                    content_fd = StdoutANSIFilter(content_fd)
-                response = HttpResponse(FileWrapper(content_fd), content_type='text/plain')
+                content = job.iter_stdout(escape_ascii=target_format == 'txt_download')
+                response = StreamingHttpResponse(content, content_type='text/plain')
                 response["Content-Disposition"] = 'attachment; filename="{}"'.format(filename)
                 return response
             else:
@@ -205,6 +170,45 @@ class JobStdout(RetrieveAPIView):
                 return Response(response_message)
 
 
+class JobStdoutTail(RetrieveAPIView):
+    """
+    Follow the output of a job.
+
+    Return the events with a counter greater than `since_counter` and the
+    stdout version of the job. The request is answered at once; the client
+    polls again with the returned `version`, and while the job has no new
+    output the events are not queried.
+    """
+    model = Job
+    serializer_class = JobStdoutTailSerializer
+    filter_backends = ()
+    tags = ['Job']
+
+    def get_int_param(self, name, default):
+        value = self.request.query_params.get(name, None)
+        if value is None or value == '':
+            return default
+        if not value.isdigit():
+            raise ParseError('Invalid {}: {}'.format(name, value))
+        return int(value)
+
+    def retrieve(self, request, *args, **kwargs):
+        job = self.get_object()
+        since_counter = self.get_int_param('since_counter', 0)
+        version = JobEvent.get_stdout_version(job.pk)
+        rows = []
+        finished = job.status not in ACTIVE_STATES and job.event_processing_finished
+        if finished or self.get_int_param('version', None) != version:
+            rows = list(job.get_event_queryset().filter(counter__gt=since_counter).order_by('counter').values(
+                'counter', 'event', 'start_line', 'end_line', 'stdout')[:STDOUT_TAIL_EVENTS])
+        return Response({
+            'events': rows,
+            'last_counter': rows[-1]['counter'] if rows else since_counter,
+            'version': version,
+            'finished': finished and len(rows) < STDOUT_TAIL_EVENTS,
+        })
+
+
 class JobStart(GenericAPIView):
     model = Job
     obj_permission_type = 'start'
@@ -327,6 +331,7 @@ class BaseJobEventsList(SubListAPIView):
 
 class JobJobEventsList(BaseJobEventsList):
     parent_model = Job
+    cursor_ordering = 'counter'
 
     def get_queryset(self):
         job = self.get_parent_object()
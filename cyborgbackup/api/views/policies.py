@@ -13,9 +13,13 @@ from rest_framework.response import Response
 from cyborgbackup.main.models.clients import Client
 from cyborgbackup.main.models.jobs import Job
 from cyborgbackup.main.models.policies import Policy
+from cyborgbackup.main.models.repositories import Repository
+from cyborgbackup.main.models.schedules import Schedule
+from cyborgbackup.main.models.users import User
 from cyborgbackup.main.utils.common import get_module_provider
 # CyBorgBackup
-from .generics import ListAPIView, RetrieveAPIView, RetrieveUpdateDestroyAPIView, ListCreateAPIView
+from .generics import ListAPIView, RetrieveAPIView, RetrieveUpdateDestroyAPIView, ListCreateAPIView, \
+    ResponseCacheMixin
 from ..serializers.jobs import JobSerializer
 from ..serializers.policies import PolicySerializer, PolicyLaunchSerializer, PolicyModuleSerializer, \
     PolicyCalendarSerializer, PolicyVMModuleSerializer
@@ -24,10 +28,11 @@ from ...main.modules import Querier
 logger = logging.getLogger('cyborgbackups.api.views.policies')
 
 
-class PolicyList(ListCreateAPIView):
+class PolicyList(ResponseCacheMixin, ListCreateAPIView):
     model = Policy
     serializer_class = PolicySerializer
     tags = ['Policy']
+    response_cache_models = (Client, Repository, Schedule, User)
 
 
 class PolicyDetail(RetrieveUpdateDestroyAPIView):
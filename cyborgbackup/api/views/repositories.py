@@ -1,18 +1,23 @@
 # Python
 import logging
 
+# Django REST Framework
+from rest_framework.response import Response
+
 from cyborgbackup.main.models.repositories import Repository
+from cyborgbackup.main.models.users import User
 # CyBorgBackup
-from .generics import RetrieveUpdateDestroyAPIView, ListCreateAPIView
-from ..serializers.repositories import RepositorySerializer, RepositoryListSerializer
+from .generics import RetrieveUpdateDestroyAPIView, ListCreateAPIView, RetrieveAPIView, ResponseCacheMixin
+from ..serializers.repositories import RepositorySerializer, RepositoryListSerializer, RepositoryForecastSerializer
 
 logger = logging.getLogger('cyborgbackups.api.views.repositories')
 
 
-class RepositoryList(ListCreateAPIView):
+class RepositoryList(ResponseCacheMixin, ListCreateAPIView):
     model = Repository
     serializer_class = RepositoryListSerializer
     tags = ['Repository']
+    response_cache_models = (User,)
 
     @property
     def allowed_methods(self):
@@ -24,3 +29,19 @@ class RepositoryDetail(RetrieveUpdateDestroyAPIView):
     model = Repository
     serializer_class = RepositorySerializer
     tags = ['Repository']
+
+
+class RepositoryForecast(RetrieveAPIView):
+    """
+    Size history of the repository and forecast of the date it will be full.
+    """
+    model = Repository
+    serializer_class = RepositoryForecastSerializer
+    tags = ['Repository']
+
+    def retrieve(self, request, *args, **kwargs):
+        obj = self.get_object()
+        history = obj.size_history.filter(client__isnull=True).values(
+            'day', 'original_size', 'compressed_size', 'deduplicated_size')
+        serializer = self.get_serializer({'forecast': obj.get_forecast(), 'history': list(history)})
+        return Response(serializer.data)
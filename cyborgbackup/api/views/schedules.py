@@ -2,17 +2,19 @@
 import logging
 
 from cyborgbackup.main.models.schedules import Schedule
+from cyborgbackup.main.models.users import User
 # CyBorgBackup
-from .generics import RetrieveUpdateDestroyAPIView, ListCreateAPIView
+from .generics import RetrieveUpdateDestroyAPIView, ListCreateAPIView, ResponseCacheMixin
 from ..serializers.schedules import ScheduleSerializer, ScheduleListSerializer
 
 logger = logging.getLogger('cyborgbackups.api.views.schedules')
 
 
-class ScheduleList(ListCreateAPIView):
+class ScheduleList(ResponseCacheMixin, ListCreateAPIView):
     model = Schedule
     serializer_class = ScheduleListSerializer
     tags = ['Schedule']
+    response_cache_models = (User,)
 
     @property
     def allowed_methods(self):
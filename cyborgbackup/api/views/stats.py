@@ -3,38 +3,94 @@ import datetime
 import logging
 
 import pytz
+# Django
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils.dateparse import parse_date
 # Django REST Framework
+from rest_framework.exceptions import ParseError
 from rest_framework.response import Response
 
-from cyborgbackup.main.models.jobs import Job
+from cyborgbackup.main.models.stats import JobDailyStat
 # CyBorgBackup
-from .generics import ListAPIView
+from .generics import ListAPIView, ResponseCacheMixin
 from ..serializers.stats import StatsSerializer
 
 logger = logging.getLogger('cyborgbackups.api.views.stats')
 
 
-class Stats(ListAPIView):
-    model = Job
+class Stats(ResponseCacheMixin, ListAPIView):
+    """
+    Backup statistics read from the daily rollup of the finished jobs.
+
+    * `start`, `end`: date range (YYYY-MM-DD), the last 30 days by default.
+    * `group_by`: comma separated list of `day`, `week`, `month`, `policy`,
+      `client` and `repository`, `day` by default.
+    * `policy`, `client`, `repository`: restrict to the given identifier.
+    """
+    model = JobDailyStat
     serializer_class = StatsSerializer
     tags = ['Stats']
 
+    periods = {
+        'day': F('day'),
+        'week': TruncWeek('day'),
+        'month': TruncMonth('day'),
+    }
+    dimensions = ('policy', 'client', 'repository')
+
+    def get_response_cache_vary(self):
+        # The default date range ends today.
+        return [datetime.datetime.now(pytz.utc).date()]
+
+    def get_date_param(self, name, default):
+        value = self.request.query_params.get(name, None)
+        if not value:
+            return default
+        try:
+            date = parse_date(value)
+        except ValueError:
+            date = None
+        if date is None:
+            raise ParseError('Invalid date for {}: {}'.format(name, value))
+        return date
+
     def list(self, request, *args, **kwargs):
+        today = datetime.datetime.now(pytz.utc).date()
+        end = self.get_date_param('end', today)
+        start = self.get_date_param('start', end - datetime.timedelta(days=30))
+        group_by = [key.strip() for key in request.query_params.get('group_by', '').split(',') if key.strip()]
+        group_by = group_by or ['day']
+        unknown = set(group_by) - set(self.periods) - set(self.dimensions)
+        if unknown:
+            raise ParseError('Invalid group_by: {}'.format(', '.join(sorted(unknown))))
+        periods = [key for key in group_by if key in self.periods]
+        if len(periods) > 1:
+            raise ParseError('Only one of day, week and month can be used in group_by.')
+
+        stats = JobDailyStat.objects.filter(day__gte=start, day__lte=end)
+        for dimension in self.dimensions:
+            value = request.query_params.get(dimension, None)
+            if value:
+                if not value.isdigit():
+                    raise ParseError('Invalid {}: {}'.format(dimension, value))
+                stats = stats.filter(**{'{}_id'.format(dimension): value})
+        keys = [key for key in group_by if key in self.dimensions]
+        if periods:
+            stats = stats.annotate(date=self.periods[periods[0]])
+            keys.insert(0, 'date')
+        stats = stats.values(*keys).annotate(
+            size=Sum('original_size'),
+            compressed=Sum('compressed_size'),
+            dedup=Sum('deduplicated_size'),
+            jobs=Sum('jobs'),
+            success=Sum('successful'),
+            failed=Sum('failed'),
+            duration=Sum('elapsed'),
+        ).order_by(*keys)
         data = []
-        now = datetime.datetime.now(pytz.utc)
-        last_30_days = now - datetime.timedelta(days=30)
-        jobs = Job.objects.filter(job_type='job', started__gte=last_30_days).order_by('started')
-        if jobs.exists():
-            for job in jobs:
-                stats_dates = [stat['date'] for stat in data]
-                if job.started.date() not in stats_dates:
-                    data.append({'date': job.started.date(), 'size': 0, 'dedup': 0, 'success': 0, 'failed': 0})
-                for stat in data:
-                    if stat['date'] == job.started.date():
-                        stat['size'] += job.original_size
-                        stat['dedup'] += job.deduplicated_size
-                        if job.status == 'successful':
-                            stat['success'] += 1
-                        if job.status == 'failed':
-                            stat['failed'] += 1
+        for stat in stats:
+            if isinstance(stat.get('date'), datetime.datetime):
+                stat['date'] = stat['date'].date()
+            data.append(stat)
         return Response(data)
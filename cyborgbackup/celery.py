@@ -12,6 +12,8 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 
 app.autodiscover_tasks()
 
+app.steps['worker'].add('cyborgbackup.main.utils.heartbeat:Heartbeat')
+
 
 @app.task(bind=True)
 def debug_task(self):
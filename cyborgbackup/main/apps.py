@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class MainConfig(AppConfig):
     name = 'cyborgbackup.main'
     verbose_name = 'Main'
+
+    def ready(self):
+        from cyborgbackup.main.utils.cache import connect_model_versions
+        from cyborgbackup.main.utils.stdout import connect_stdout_cache
+        connect_model_versions()
+        connect_stdout_cache()
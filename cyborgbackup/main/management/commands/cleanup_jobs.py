@@ -206,7 +206,8 @@ class Command(BaseCommand):
             deletedJobs = []
             if entries.exists():
                 for entry in entries:
-                    if entry.archive_name != '' and entry.archive_name and entry.archive_name not in repoArchives:
+                    if entry.status == 'successful' and entry.archive_name \
+                            and entry.archive_name not in repoArchives:
                         action_text = 'would delete' if self.dry_run else 'deleting'
                         print('{} {}'.format(action_text, entry.archive_name))
                         if not self.dry_run:
@@ -214,7 +215,7 @@ class Command(BaseCommand):
                             deletedJobs.append(entry)
                             entry.delete()
                     else:
-                        if entry.archive_name is None and entry.created < (
+                        if (entry.archive_name is None or entry.status != 'successful') and entry.created < (
                                 timezone.now() - datetime.timedelta(days=settings.JOB_RETENTION)):
                             action_text = 'would delete' if self.dry_run else 'deleting'
                             print('{} orphan JobID={} => {}'.format(action_text, entry.pk, entry.name))
@@ -40,6 +40,30 @@ class WorkerSignalHandler:
         self.kill_now = True
 
 
+class StdoutNotifier:
+    """
+    Bump the stdout version of the jobs whose events were saved, at most once
+    per job every CYBORGBACKUP_STDOUT_NOTIFY_INTERVAL seconds, instead of
+    after each event.
+    """
+
+    def __init__(self):
+        self.job_ids = set()
+        self.last_flush = time.monotonic()
+
+    def add(self, job_id):
+        if job_id is not None:
+            self.job_ids.add(job_id)
+        if time.monotonic() - self.last_flush >= getattr(settings, 'CYBORGBACKUP_STDOUT_NOTIFY_INTERVAL', 1):
+            self.flush()
+
+    def flush(self):
+        for job_id in self.job_ids:
+            JobEvent.notify_stdout(job_id)
+        self.job_ids.clear()
+        self.last_flush = time.monotonic()
+
+
 class CallbackBrokerWorker(ConsumerMixin):
     MAX_RETRIES = 2
 
@@ -119,10 +143,12 @@ class CallbackBrokerWorker(ConsumerMixin):
 
     def callback_worker(self, queue_actual, idx):
         signal_handler = WorkerSignalHandler()
+        stdout_notifier = StdoutNotifier()
         while not signal_handler.kill_now:
             try:
                 body = queue_actual.get(block=True, timeout=1)
             except QueueEmpty:
+                stdout_notifier.flush()
                 continue
             except Exception as e:
                 logger.error("Exception on worker thread, restarting: " + str(e))
@@ -149,6 +175,7 @@ class CallbackBrokerWorker(ConsumerMixin):
                     for key, cls in event_map.items():
                         if key in body:
                             cls.create_from_data(**body)
+                    stdout_notifier.add(body.get('job_id'))
 
                 job_identifier = 'unknown job'
                 for key in event_map.keys():
@@ -157,6 +184,7 @@ class CallbackBrokerWorker(ConsumerMixin):
                         break
 
                 if body.get('event') == 'EOF':
+                    stdout_notifier.flush()
                     try:
                         msg = 'Event processing is finished for Job {}, sending notifications'
                         logger.info(msg.format(job_identifier))
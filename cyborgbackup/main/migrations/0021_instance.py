@@ -0,0 +1,27 @@
+# Generated by Django 5.0.6 on 2026-10-19 05:56
+
+import cyborgbackup.main.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0020_user_is_staff_alter_job_job_env_alter_job_status_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Instance',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hostname', models.CharField(max_length=250, unique=True)),
+                ('capacity', models.PositiveIntegerField(default=0)),
+                ('running_jobs', cyborgbackup.main.fields.JSONField(blank=True, default=list)),
+                ('last_heartbeat', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'ordering': ('hostname',),
+            },
+        ),
+    ]
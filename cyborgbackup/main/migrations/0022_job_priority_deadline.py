@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:00
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0021_instance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='deadline',
+            field=models.DateTimeField(default=None, editable=False, help_text='Date by which the job should be finished.', null=True),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='priority',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='policy',
+            name='backup_window_end',
+            field=models.TimeField(blank=True, default=None, help_text='Time of day (UTC) by which the backup jobs of this policy should be finished.', null=True),
+        ),
+        migrations.AddField(
+            model_name='policy',
+            name='priority',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Jobs of policies with a higher priority are started first.', validators=[django.core.validators.MaxValueValidator(99)]),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:02
+
+import cyborgbackup.main.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0022_job_priority_deadline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='instance',
+            name='networks',
+            field=cyborgbackup.main.fields.JSONField(blank=True, default=list, help_text='Client networks (CIDR) this node can reach. Empty to accept every client.'),
+        ),
+        migrations.AddField(
+            model_name='instance',
+            name='repositories',
+            field=models.ManyToManyField(blank=True, help_text='Repositories this node is dedicated to. Empty to accept every repository.', related_name='instances', to='main.repository'),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='execution_node',
+            field=models.CharField(blank=True, default='', editable=False, help_text='The node the job executed on.', max_length=250),
+        ),
+    ]
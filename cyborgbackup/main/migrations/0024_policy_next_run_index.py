@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0023_instance_locality'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='policy',
+            name='next_run',
+            field=models.DateTimeField(db_index=True, default=None, editable=False, help_text='The next time that the scheduled action will run.', null=True),
+        ),
+    ]
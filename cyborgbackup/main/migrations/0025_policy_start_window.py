@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0024_policy_next_run_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='start_after',
+            field=models.DateTimeField(default=None, editable=False, help_text='Date before which the job is not started.', null=True),
+        ),
+        migrations.AddField(
+            model_name='policy',
+            name='start_window',
+            field=models.PositiveIntegerField(default=0, help_text='Duration in minutes over which the start of the backup jobs is spread.'),
+        ),
+    ]
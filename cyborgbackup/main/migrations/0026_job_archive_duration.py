@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0025_policy_start_window'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='archive_duration',
+            field=models.FloatField(default=0, editable=False, help_text='Duration in seconds of the archive creation, as reported by borg.'),
+        ),
+        migrations.AlterField(
+            model_name='jobevent',
+            name='event',
+            field=models.CharField(choices=[('debug', 'Debug'), ('verbose', 'Verbose'), ('progress', 'Progress'), ('deprecated', 'Deprecated'), ('warning', 'Warning'), ('system_warning', 'System Warning'), ('error', 'Error')], max_length=100),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def backfill_daily_stats(apps, schema_editor):
+    Job = apps.get_model('main', 'Job')
+    JobDailyStat = apps.get_model('main', 'JobDailyStat')
+    rows = Job.objects.filter(
+        job_type='job', finished__isnull=False
+    ).annotate(
+        stat_day=TruncDate(Coalesce('started', 'finished')),
+        stat_repository=Coalesce('policy__repository_id', 'repository_id'),
+    ).values('stat_day', 'policy_id', 'client_id', 'stat_repository').annotate(
+        stat_jobs=Count('id'),
+        stat_successful=Count('id', filter=Q(status='successful')),
+        stat_failed=Count('id', filter=Q(status__in=('failed', 'error'))),
+        stat_original_size=Sum('original_size'),
+        stat_compressed_size=Sum('compressed_size'),
+        stat_deduplicated_size=Sum('deduplicated_size'),
+        stat_elapsed=Sum('elapsed'),
+    ).order_by()
+    JobDailyStat.objects.bulk_create([
+        JobDailyStat(day=row['stat_day'], policy_id=row['policy_id'], client_id=row['client_id'],
+                     repository_id=row['stat_repository'], jobs=row['stat_jobs'],
+                     successful=row['stat_successful'], failed=row['stat_failed'],
+                     original_size=row['stat_original_size'] or 0,
+                     compressed_size=row['stat_compressed_size'] or 0,
+                     deduplicated_size=row['stat_deduplicated_size'] or 0,
+                     elapsed=float(row['stat_elapsed'] or 0))
+        for row in rows.iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0026_job_archive_duration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobDailyStat',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_index=True)),
+                ('jobs', models.PositiveIntegerField(default=0)),
+                ('successful', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('original_size', models.BigIntegerField(default=0)),
+                ('compressed_size', models.BigIntegerField(default=0)),
+                ('deduplicated_size', models.BigIntegerField(default=0)),
+                ('elapsed', models.FloatField(default=0)),
+                ('client', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='main.client')),
+                ('policy', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='main.policy')),
+                ('repository', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='main.repository')),
+            ],
+            options={
+                'ordering': ('day',),
+                'unique_together': {('day', 'policy', 'client', 'repository')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0027_jobdailystat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='archive_files',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of files in the archive, as reported by borg.'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:15
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0028_job_archive_files'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='jobevent',
+            index_together={('job', 'counter'), ('job', 'end_line'), ('job', 'event'), ('job', 'parent_uuid'), ('job', 'start_line'), ('job', 'uuid')},
+        ),
+    ]
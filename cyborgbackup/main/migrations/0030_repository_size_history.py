@@ -0,0 +1,35 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0029_jobevent_counter_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repository',
+            name='capacity',
+            field=models.BigIntegerField(default=0, help_text='Capacity in bytes of the repository storage, 0 if unknown.'),
+        ),
+        migrations.CreateModel(
+            name='RepositorySize',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_index=True)),
+                ('original_size', models.BigIntegerField(default=0)),
+                ('compressed_size', models.BigIntegerField(default=0)),
+                ('deduplicated_size', models.BigIntegerField(default=0)),
+                ('client', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='size_history', to='main.client')),
+                ('repository', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='size_history', to='main.repository')),
+            ],
+            options={
+                'ordering': ('day',),
+                'unique_together': {('repository', 'client', 'day')},
+            },
+        ),
+    ]
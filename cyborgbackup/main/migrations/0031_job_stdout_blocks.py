@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0030_repository_size_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='stdout_compacted',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.CreateModel(
+            name='JobStdoutBlock',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_line', models.PositiveIntegerField(default=0, editable=False)),
+                ('end_line', models.PositiveIntegerField(default=0, editable=False)),
+                ('size', models.PositiveIntegerField(default=0, editable=False)),
+                ('data', models.BinaryField()),
+                ('job', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='stdout_blocks', to='main.job')),
+            ],
+            options={
+                'ordering': ('start_line',),
+                'index_together': {('job', 'end_line'), ('job', 'start_line')},
+            },
+        ),
+    ]
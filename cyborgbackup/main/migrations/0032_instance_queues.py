@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-19 07:11
+
+import cyborgbackup.main.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0031_job_stdout_blocks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='instance',
+            name='queues',
+            field=cyborgbackup.main.fields.JSONField(blank=True, default=list, help_text='Queues consumed by the worker.'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.6 on 2026-10-19 07:40
+
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_archive_files(apps, schema_editor):
+    # Backups run before borg reported the number of files are reported with
+    # the number of entries in their catalog, as before.
+    Job = apps.get_model('main', 'Job')
+    Catalog = apps.get_model('main', 'Catalog')
+    files = Catalog.objects.filter(job=OuterRef('pk')).order_by().values('job').annotate(
+        files=Count('id')).values('files')
+    Job.objects.filter(job_type='job', archive_files=0).update(archive_files=Coalesce(Subquery(files), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0032_instance_queues'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_archive_files, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.6 on 2026-10-19 09:10
+
+from django.db import migrations
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_daily_stats(apps, schema_editor):
+    # The unique_together of the rollup did not prevent duplicate rows for
+    # the groups without policy, client or repository.
+    JobDailyStat = apps.get_model('main', 'JobDailyStat')
+    groups = JobDailyStat.objects.values('day', 'policy_id', 'client_id', 'repository_id').annotate(
+        rows=Count('id'), kept=Min('id'), total_jobs=Sum('jobs'), total_successful=Sum('successful'),
+        total_failed=Sum('failed'), total_original_size=Sum('original_size'),
+        total_compressed_size=Sum('compressed_size'), total_deduplicated_size=Sum('deduplicated_size'),
+        total_elapsed=Sum('elapsed'),
+    ).filter(rows__gt=1).order_by()
+    for group in groups:
+        rows = JobDailyStat.objects.filter(day=group['day'], policy_id=group['policy_id'],
+                                           client_id=group['client_id'], repository_id=group['repository_id'])
+        rows.filter(pk=group['kept']).update(
+            jobs=group['total_jobs'], successful=group['total_successful'], failed=group['total_failed'],
+            original_size=group['total_original_size'], compressed_size=group['total_compressed_size'],
+            deduplicated_size=group['total_deduplicated_size'], elapsed=group['total_elapsed'])
+        rows.exclude(pk=group['kept']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0033_backfill_job_archive_files'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_daily_stats, migrations.RunPython.noop),
+    ]
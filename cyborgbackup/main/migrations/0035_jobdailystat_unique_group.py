@@ -0,0 +1,22 @@
+# Generated by Django 5.0.6 on 2026-10-19 09:11
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0034_merge_duplicate_daily_stats'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='jobdailystat',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='jobdailystat',
+            constraint=models.UniqueConstraint(models.F('day'), django.db.models.functions.comparison.Coalesce('policy', 0, output_field=models.IntegerField()), django.db.models.functions.comparison.Coalesce('client', 0, output_field=models.IntegerField()), django.db.models.functions.comparison.Coalesce('repository', 0, output_field=models.IntegerField()), name='main_jobdailystat_unique_group'),
+        ),
+    ]
@@ -18,14 +18,18 @@ from cyborgbackup.main.models.clients import Client
 from cyborgbackup.main.models.clients import Client
 from cyborgbackup.main.models.events import JobEvent
 from cyborgbackup.main.models.events import JobEvent
+from cyborgbackup.main.models.events import JobStdoutBlock
+from cyborgbackup.main.models.instances import Instance
 from cyborgbackup.main.models.jobs import Job
 from cyborgbackup.main.models.jobs import Job
 from cyborgbackup.main.models.policies import Policy
 from cyborgbackup.main.models.policies import Policy
 from cyborgbackup.main.models.repositories import Repository
 from cyborgbackup.main.models.repositories import Repository
+from cyborgbackup.main.models.repositories import RepositorySize
 from cyborgbackup.main.models.schedules import Schedule
 from cyborgbackup.main.models.schedules import Schedule
+from cyborgbackup.main.models.stats import JobDailyStat
 from cyborgbackup.main.models.users import User
 from cyborgbackup.main.models.users import User
 
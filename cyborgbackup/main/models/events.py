@@ -1,7 +1,9 @@
 import datetime
 import logging
+import zlib
 
 import pytz
+from django.core.cache import cache
 from django.db import models
 from django.utils.dateparse import parse_datetime
 from django.utils.translation import gettext_lazy as _
@@ -12,7 +14,10 @@ from cyborgbackup.main.models.base import CreatedModifiedModel
 
 logger = logging.getLogger('cyborgbackup.analytics.job_events')
 
-__all__ = ['JobEvent']
+__all__ = ['JobEvent', 'JobStdoutBlock']
+
+# Lifetime in seconds of the stdout version of a job in the cache.
+STDOUT_VERSION_TIMEOUT = 86400
 
 
 class JobEvent(CreatedModifiedModel):
@@ -23,6 +28,7 @@ class JobEvent(CreatedModifiedModel):
     EVENT_TYPES = [
         (0, 'debug', _('Debug'), False),
         (0, 'verbose', _('Verbose'), False),
+        (0, 'progress', _('Progress'), False),
         (0, 'deprecated', _('Deprecated'), False),
         (0, 'warning', _('Warning'), False),
         (0, 'system_warning', _('System Warning'), False),
@@ -44,6 +50,7 @@ class JobEvent(CreatedModifiedModel):
         index_together = [
             ('job', 'event'),
             ('job', 'uuid'),
+            ('job', 'counter'),
             ('job', 'start_line'),
             ('job', 'end_line'),
             ('job', 'parent_uuid'),
@@ -170,6 +177,28 @@ class JobEvent(CreatedModifiedModel):
         logger.info('Event data saved.', extra=dict(python_objects=dict(job_event=job_event)))
         return job_event
 
+    @classmethod
+    def get_stdout_version_key(cls, job_id):
+        return 'job-stdout-version-{}'.format(job_id)
+
+    @classmethod
+    def get_stdout_version(cls, job_id):
+        return cache.get(cls.get_stdout_version_key(job_id), 0)
+
+    @classmethod
+    def notify_stdout(cls, job_id):
+        """
+        Bump the stdout version of a job, letting the clients following its
+        output know there is something new without querying the events.
+        """
+        key = cls.get_stdout_version_key(job_id)
+        cache.add(key, 0, timeout=STDOUT_VERSION_TIMEOUT)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # The key expired between add and incr.
+            cache.set(key, 1, timeout=STDOUT_VERSION_TIMEOUT)
+
     @property
     def job_verbosity(self):
         return self.job.verbosity
@@ -194,3 +223,53 @@ class JobEvent(CreatedModifiedModel):
 
     def __unicode__(self):
         return u'%s @ %s' % (self.get_event_display2(), self.created.isoformat())
+
+
+class JobStdoutBlock(models.Model):
+    """
+    Compressed block of consecutive stdout lines of a finished job, replacing
+    the per-line job events once the job output is compacted.
+    """
+
+    class Meta:
+        app_label = 'main'
+        ordering = ('start_line',)
+        index_together = [
+            ('job', 'start_line'),
+            ('job', 'end_line'),
+        ]
+
+    job = models.ForeignKey(
+        'Job',
+        related_name='stdout_blocks',
+        on_delete=models.CASCADE,
+        editable=False,
+    )
+    start_line = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+    )
+    end_line = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+    )
+    size = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+    )
+    data = models.BinaryField(
+        editable=False,
+    )
+
+    @classmethod
+    def from_lines(cls, job, start_line, lines):
+        content = ''.join(lines)
+        return cls(job=job, start_line=start_line, end_line=start_line + len(lines), size=len(content),
+                   data=zlib.compress(content.encode('utf-8')))
+
+    def get_lines(self):
+        """
+        Return the lines of the block, each one ending with a newline.
+        """
+        # Only split on newlines, like the lines counted by the job events.
+        return [line + '\n' for line in zlib.decompress(self.data).decode('utf-8').split('\n')[:-1]]
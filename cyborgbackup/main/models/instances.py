@@ -0,0 +1,113 @@
+import ipaddress
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models
+from django.utils.timezone import now
+from django.utils.translation import gettext_lazy as _
+
+from cyborgbackup.main.fields import JSONField
+
+__all__ = ['Instance']
+
+
+class InstanceManager(models.Manager):
+
+    def get_grace_period(self):
+        return timedelta(seconds=getattr(settings, 'CYBORGBACKUP_HEARTBEAT_GRACE', 30))
+
+    def alive(self):
+        return self.filter(last_heartbeat__gte=now() - self.get_grace_period())
+
+    def dead(self):
+        return self.filter(last_heartbeat__lt=now() - self.get_grace_period())
+
+
+class Instance(models.Model):
+    """
+    Celery worker able to run backup jobs, as last reported by its heartbeat.
+    """
+    hostname = models.CharField(
+        max_length=250,
+        unique=True,
+    )
+
+    capacity = models.PositiveIntegerField(
+        default=0,
+    )
+
+    running_jobs = JSONField(
+        blank=True,
+        default=list,
+    )
+
+    last_heartbeat = models.DateTimeField(
+        db_index=True,
+    )
+
+    repositories = models.ManyToManyField(
+        'Repository',
+        blank=True,
+        related_name='instances',
+        help_text=_("Repositories this node is dedicated to. Empty to accept every repository."),
+    )
+
+    queues = JSONField(
+        blank=True,
+        default=list,
+        help_text=_("Queues consumed by the worker."),
+    )
+
+    networks = JSONField(
+        blank=True,
+        default=list,
+        help_text=_("Client networks (CIDR) this node can reach. Empty to accept every client."),
+    )
+
+    objects = InstanceManager()
+
+    class Meta:
+        app_label = 'main'
+        ordering = ('hostname',)
+
+    def __str__(self):
+        return self.hostname
+
+    @property
+    def is_alive(self):
+        return self.last_heartbeat >= now() - Instance.objects.get_grace_period()
+
+    @property
+    def remaining_capacity(self):
+        return max(self.capacity - len(self.running_jobs), 0)
+
+    def reaches_address(self, address):
+        try:
+            address = ipaddress.ip_address(address.strip())
+        except ValueError:
+            return False
+        for network in self.networks:
+            try:
+                if address in ipaddress.ip_network(network, strict=False):
+                    return True
+            except ValueError:
+                continue
+        return False
+
+    def get_affinity(self, job):
+        """
+        Locality score of this node for the given job, or None when the
+        repositories or networks the node is dedicated to do not match it.
+        """
+        score = 0
+        repository_ids = set(repository.pk for repository in self.repositories.all())
+        if repository_ids:
+            repository_id = job.policy.repository_id if job.policy_id else job.repository_id
+            if repository_id not in repository_ids:
+                return None
+            score += 1
+        if self.networks and job.client_id:
+            if not self.reaches_address(job.client.ip or ''):
+                return None
+            score += 1
+        return score
@@ -1,17 +1,16 @@
 # Python
 import json
 import logging
-import os
 import re
-import subprocess
-import tempfile
 from collections import OrderedDict
 from io import StringIO
 
+# Celery
+from celery.utils import worker_direct
 from django.apps import apps
 # Django
 from django.conf import settings
-from django.db import models, connection
+from django.db import models, connection, transaction
 from django.utils.encoding import smart_str
 from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
@@ -23,7 +22,8 @@ from cyborgbackup.main.constants import ACTIVE_STATES, CAN_CANCEL
 from cyborgbackup.main.consumers import emit_channel_notification
 from cyborgbackup.main.fields import JSONField
 from cyborgbackup.main.models.base import prevent_search, VarsDictProperty, CommonModelNameNotUnique
-from cyborgbackup.main.models.events import JobEvent
+from cyborgbackup.main.models.events import JobEvent, JobStdoutBlock
+from cyborgbackup.main.models.stats import JobDailyStat
 from cyborgbackup.main.utils.common import (
     copy_model_by_class, copy_m2m_relationships,
     get_type_for_model
@@ -33,6 +33,15 @@ from cyborgbackup.main.utils.string import UriCleaner
 
 __all__ = ['Job', 'StdoutMaxBytesExceeded']
 
+# Largest stdout range, in characters, rendered by the API instead of downloaded.
+STDOUT_MAX_BYTES_DISPLAY = 1048576
+# Number of events fetched at once when reading stdout.
+STDOUT_EVENTS_FETCH = 1000
+# Number of compressed stdout blocks held in memory and inserted at once.
+STDOUT_BLOCKS_BATCH = 100
+# Size, in characters, of the chunks of a streamed stdout download.
+STDOUT_CHUNK_SIZE = 65536
+
 logger = logging.getLogger('cyborgbackup.main.models.jobs')
 
 
@@ -153,6 +162,9 @@ class Job(CommonModelNameNotUnique, JobTypeStringMixin, TaskManagerJobMixin):
 
     PASSWORD_FIELDS = ('start_args',)
 
+    # Restores are started ahead of every policy job, see Policy.priority.
+    RESTORE_PRIORITY = 100
+
     base_manager_name = 'base_objects'
 
     class Meta:
@@ -207,6 +219,10 @@ class Job(CommonModelNameNotUnique, JobTypeStringMixin, TaskManagerJobMixin):
         default=0,
         editable=False,
     )
+    stdout_compacted = models.BooleanField(
+        default=False,
+        editable=False,
+    )
     launch_type = models.CharField(
         max_length=20,
         choices=LAUNCH_TYPE_CHOICES,
@@ -330,6 +346,45 @@ class Job(CommonModelNameNotUnique, JobTypeStringMixin, TaskManagerJobMixin):
         blank=True,
     )
 
+    archive_duration = models.FloatField(
+        default=0,
+        editable=False,
+        help_text=_("Duration in seconds of the archive creation, as reported by borg."),
+    )
+
+    archive_files = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text=_("Number of files in the archive, as reported by borg."),
+    )
+
+    priority = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+    )
+
+    deadline = models.DateTimeField(
+        null=True,
+        default=None,
+        editable=False,
+        help_text=_("Date by which the job should be finished."),
+    )
+
+    start_after = models.DateTimeField(
+        null=True,
+        default=None,
+        editable=False,
+        help_text=_("Date before which the job is not started."),
+    )
+
+    execution_node = models.CharField(
+        max_length=250,
+        blank=True,
+        default='',
+        editable=False,
+        help_text=_("The node the job executed on."),
+    )
+
     extra_vars_dict = VarsDictProperty('extra_vars', True)
 
     def get_absolute_url(self, request=None):
@@ -429,14 +484,33 @@ class Job(CommonModelNameNotUnique, JobTypeStringMixin, TaskManagerJobMixin):
 
         # Sanity check: Has the job just completed? If so, mark down its
         # completion time, and record its output to the database.
+        just_finished = False
         if self.status in ('successful', 'failed', 'error', 'canceled') and not self.finished:
             # Record the `finished` time.
+            just_finished = True
             self.finished = now()
             if 'finished' not in update_fields:
                 update_fields.append('finished')
 
         # If we have a start and finished time, and haven't already calculated
         # out the time that elapsed, do so.
+        self._set_elapsed(update_fields)
+
+        # Okay; we're done. Perform the actual save.
+        result = super(Job, self).save(*args, **kwargs)
+
+        # Add finished backup jobs to the daily statistics.
+        if just_finished and self.job_type == 'job':
+            JobDailyStat.objects.record(self)
+
+        # Wake up the clients following the output of the job.
+        if just_finished:
+            JobEvent.notify_stdout(self.pk)
+
+        # Done.
+        return result
+
+    def _set_elapsed(self, update_fields):
         if self.started and self.finished:
             td = self.finished - self.started
             elapsed = (td.microseconds + (td.seconds + td.days * 24 * 3600) * 10 ** 6) / (10 ** 6 * 1.0)
@@ -447,12 +521,6 @@ class Job(CommonModelNameNotUnique, JobTypeStringMixin, TaskManagerJobMixin):
             if 'elapsed' not in update_fields:
                 update_fields.append('elapsed')
 
-        # Okay; we're done. Perform the actual save.
-        result = super(Job, self).save(*args, **kwargs)
-
-        # Done.
-        return result
-
     def launch_prompts(self):
         """
         Return dictionary of prompts job was launched with
@@ -518,80 +586,14 @@ class Job(CommonModelNameNotUnique, JobTypeStringMixin, TaskManagerJobMixin):
         """
         if self.status in ACTIVE_STATES:
             return False  # tally of events is only available at end of run
+        if self.stdout_compacted:
+            return True
         try:
             event_qs = self.get_event_queryset()
         except NotImplementedError:
             return True  # Model without events, such as WFJT
         return self.emitted_events == event_qs.count()
 
-    def result_stdout_raw_handle(self, enforce_max_bytes=True):
-        """
-        This method returns a file-like object ready to be read which contains
-        all stdout for the Job.
-
-        If the size of the file is greater than 1048576, a StdoutMaxBytesExceeded exception
-        will be raised.
-        """
-        max_supported = 1048576
-
-        if enforce_max_bytes:
-            # If enforce_max_bytes is True, we're not grabbing the whole file,
-            # just the first <settings.STDOUT_MAX_BYTES_DISPLAY> bytes;
-            # in this scenario, it's probably safe to use a StringIO.
-            fd = StringIO()
-        else:
-            # If enforce_max_bytes = False, that means they're downloading
-            # the entire file.  To avoid ballooning memory, let's write the
-            # stdout content to a temporary disk location
-            if not os.path.exists(settings.JOBOUTPUT_ROOT):
-                os.makedirs(settings.JOBOUTPUT_ROOT)
-            fd = tempfile.NamedTemporaryFile(
-                prefix='{}-{}-'.format(self.model_to_str(), self.pk),
-                suffix='.out',
-                dir=settings.JOBOUTPUT_ROOT
-            )
-
-        # Note: the code in this block _intentionally_ does not use the
-        # Django ORM because of the potential size (many MB+) of
-        # `main_jobevent.stdout`; we *do not* want to generate queries
-        # here that construct model objects by fetching large gobs of
-        # data (and potentially ballooning memory usage); instead, we
-        # just want to write concatenated values of a certain column
-        # (`stdout`) directly to a file
-
-        with connection.cursor() as cursor:
-
-            if enforce_max_bytes:
-                # detect the length of all stdout for this Job, and
-                # if it exceeds settings.STDOUT_MAX_BYTES_DISPLAY bytes,
-                # don't bother actually fetching the data
-                total = self.get_event_queryset().aggregate(
-                    total=models.Sum(models.Func(models.F('stdout'), function='LENGTH'))
-                )['total']
-                if total > max_supported:
-                    raise StdoutMaxBytesExceeded(total, max_supported)
-
-            cursor.copy_expert(
-                "copy (select stdout from {} where {}={} order by start_line) to stdout".format(
-                    self._meta.db_table + 'event',
-                    self.event_parent_key,
-                    self.id
-                ),
-                fd
-            )
-
-            if hasattr(fd, 'name'):
-                # If we're dealing with a physical file, use `sed` to clean
-                # up escaped line sequences
-                fd.flush()
-                subprocess.Popen("sed -i 's/\\\\r\\\\n/\\n/g' {}".format(fd.name), shell=True).wait()
-                return open(fd.name, 'r')
-            else:
-                # If we're dealing with an in-memory string buffer, use
-                # string.replace()
-                fd = StringIO(fd.getvalue().replace('\\r\\n', '\n'))
-                return fd
-
     def _escape_ascii(self, content):
         # Remove ANSI escape sequences used to embed event data.
         content = re.sub(r'\x1b\[K(?:[A-Za-z0-9+/=]+\x1b\[\d+D)+\x1b\[K', '', content)
@@ -599,13 +601,111 @@ class Job(CommonModelNameNotUnique, JobTypeStringMixin, TaskManagerJobMixin):
         content = re.sub(r'\x1b[^m]*m', '', content)
         return content
 
+    def get_stdout_line_count(self):
+        """
+        Return the number of stdout lines of the Job, read from the
+        (job, end_line) index. A last line without a newline is only held
+        by events starting and ending on it.
+        """
+        lines = self.get_stdout_queryset().aggregate(start=models.Max('start_line'), end=models.Max('end_line'))
+        if lines['end'] is None:
+            return 0
+        return lines['end'] + 1 if lines['start'] == lines['end'] else lines['end']
+
+    def filter_stdout_range(self, rows, start, end):
+        """
+        Filter the stdout rows overlapping a line range. Events written for
+        a chunk of output without a newline hold no line, they start and end
+        on the line they begin.
+        """
+        return rows.filter(models.Q(end_line__gt=start) | models.Q(start_line=start), start_line__lt=end)
+
+    def get_stdout_queryset(self):
+        """
+        Return the rows holding the stdout of the Job, the compressed blocks
+        once it is compacted and the job events before.
+        """
+        if self.stdout_compacted:
+            return self.stdout_blocks.all()
+        return self.get_event_queryset()
+
+    def get_stdout_size(self, start, end):
+        """
+        Return the number of characters of the rows overlapping a range.
+        """
+        rows = self.filter_stdout_range(self.get_stdout_queryset(), start, end)
+        if self.stdout_compacted:
+            return rows.aggregate(total=models.Sum('size'))['total'] or 0
+        return rows.aggregate(total=models.Sum(models.Func(models.F('stdout'), function='LENGTH')))['total'] or 0
+
+    def get_stdout_range(self, start_line=0, end_line=None):
+        """
+        Normalize a line range of the stdout of the Job, negative values are
+        counted from the end of the output like a Python slice.
+
+        Returns a (start, end, absolute_end) tuple.
+        """
+        absolute_end = self.get_stdout_line_count()
+        start = int(start_line)
+        end = absolute_end if end_line is None else int(end_line)
+        if start < 0:
+            start += absolute_end
+        if end < 0:
+            end += absolute_end
+        start = min(max(start, 0), absolute_end)
+        end = min(max(end, start), absolute_end)
+        return start, end, absolute_end
+
+    def iter_stdout_lines(self, start, end):
+        """
+        Yield the stdout lines of the Job between start and end, reading only
+        the events overlapping the range through the (job, start_line) and
+        (job, end_line) indexes. Once the stdout is compacted, only the blocks
+        overlapping the range are decompressed.
+        """
+        if start >= end:
+            return
+        if self.stdout_compacted:
+            for block in self.stdout_blocks.filter(start_line__lt=end, end_line__gt=start).iterator():
+                yield from block.get_lines()[max(start - block.start_line, 0):end - block.start_line]
+            return
+        events = self.filter_stdout_range(self.get_event_queryset(), start, end).order_by('start_line', 'counter')
+        partial = ''
+        for event_start, event_end, stdout in events.values_list('start_line', 'end_line', 'stdout').iterator(chunk_size=STDOUT_EVENTS_FETCH):
+            if event_start == event_end:
+                # Beginning of the line continued by the next event.
+                partial += stdout
+                continue
+            lines = stdout.replace('\r\n', '\n').split('\n')
+            lines[0] = partial + lines[0]
+            partial = ''
+            for line in lines[max(start - event_start, 0):min(end, event_end) - event_start]:
+                yield line + '\n'
+        if partial:
+            yield partial + '\n'
+
+    def iter_stdout(self, escape_ascii=False):
+        """
+        Yield the whole stdout of the Job in chunks of about
+        STDOUT_CHUNK_SIZE characters, read through a server-side cursor so
+        memory use does not depend on the size of the output.
+        """
+        chunk = []
+        chunk_size = 0
+        for line in self.iter_stdout_lines(0, self.get_stdout_line_count()):
+            if escape_ascii:
+                line = self._escape_ascii(line)
+            chunk.append(line)
+            chunk_size += len(line)
+            if chunk_size >= STDOUT_CHUNK_SIZE:
+                yield ''.join(chunk)
+                chunk = []
+                chunk_size = 0
+        if chunk:
+            yield ''.join(chunk)
+
     def _result_stdout_raw(self, redact_sensitive=False, escape_ascii=False):
-        content = self.result_stdout_raw_handle().read().decode('utf-8')
-        if redact_sensitive:
-            content = UriCleaner.remove_sensitive(content)
-        if escape_ascii:
-            content = self._escape_ascii(content)
-        return content
+        return self._result_stdout_raw_limited(redact_sensitive=redact_sensitive, escape_ascii=escape_ascii)[0]
 
     @property
     def result_stdout_raw(self):
@@ -616,22 +716,12 @@ class Job(CommonModelNameNotUnique, JobTypeStringMixin, TaskManagerJobMixin):
         return self._result_stdout_raw(escape_ascii=True)
 
     def _result_stdout_raw_limited(self, start_line=0, end_line=None, redact_sensitive=True, escape_ascii=False):
+        start_actual, end_actual, absolute_end = self.get_stdout_range(start_line, end_line)
         return_buffer = StringIO()
-        if end_line is not None:
-            end_line = int(end_line)
-        stdout_lines = self.result_stdout_raw_handle().readlines()
-        absolute_end = len(stdout_lines)
-        for line in stdout_lines[int(start_line):end_line]:
+        for line in self.iter_stdout_lines(start_actual, end_actual):
             return_buffer.write(line)
-        if int(start_line) < 0:
-            start_actual = len(stdout_lines) + int(start_line)
-            end_actual = len(stdout_lines)
-        else:
-            start_actual = int(start_line)
-            if end_line is not None:
-                end_actual = min(int(end_line), len(stdout_lines))
-            else:
-                end_actual = len(stdout_lines)
+            if return_buffer.tell() > STDOUT_MAX_BYTES_DISPLAY:
+                raise StdoutMaxBytesExceeded(self.get_stdout_size(start_actual, end_actual), STDOUT_MAX_BYTES_DISPLAY)
 
         return_buffer = return_buffer.getvalue()
         if redact_sensitive:
@@ -641,6 +731,39 @@ class Job(CommonModelNameNotUnique, JobTypeStringMixin, TaskManagerJobMixin):
 
         return return_buffer, start_actual, end_actual, absolute_end
 
+    def compact_stdout(self, force=False):
+        """
+        Move the stdout of a finished Job, once all its events are saved or
+        when force is set, to compressed blocks of
+        CYBORGBACKUP_STDOUT_BLOCK_LINES lines and delete the job events
+        holding only output. The failure events are kept.
+
+        Returns True when the stdout was compacted.
+        """
+        if self.stdout_compacted or not (force or self.event_processing_finished):
+            return False
+        block_lines = getattr(settings, 'CYBORGBACKUP_STDOUT_BLOCK_LINES', 1000)
+        with transaction.atomic():
+            blocks = []
+            lines = []
+            start_line = 0
+            for line in self.iter_stdout_lines(0, self.get_stdout_line_count()):
+                lines.append(line)
+                if len(lines) == block_lines:
+                    blocks.append(JobStdoutBlock.from_lines(self, start_line, lines))
+                    start_line += len(lines)
+                    lines = []
+                if len(blocks) == STDOUT_BLOCKS_BATCH:
+                    JobStdoutBlock.objects.bulk_create(blocks)
+                    blocks = []
+            if lines:
+                blocks.append(JobStdoutBlock.from_lines(self, start_line, lines))
+            JobStdoutBlock.objects.bulk_create(blocks)
+            self.get_event_queryset().exclude(event__in=JobEvent.FAILED_EVENTS).delete()
+            self.stdout_compacted = True
+            Job.objects.filter(pk=self.pk).update(stdout_compacted=True)
+        return True
+
     def result_stdout_raw_limited(self, start_line=0, end_line=None, redact_sensitive=False):
         return self._result_stdout_raw_limited(start_line, end_line, redact_sensitive)
 
@@ -800,6 +923,8 @@ class Job(CommonModelNameNotUnique, JobTypeStringMixin, TaskManagerJobMixin):
             'queue': 'backup_job',
             'task_id': self.celery_task_id,
         }
+        if self.execution_node:
+            kwargs['queue'] = worker_direct(self.execution_node)
         task_class = self._get_task_class()
         args = [self.pk]
         from celery.app import app_or_default
@@ -838,8 +963,8 @@ class Job(CommonModelNameNotUnique, JobTypeStringMixin, TaskManagerJobMixin):
         # Save the pending status, and inform the SocketIO listener.
         self.update_fields(start_args=json.dumps(kwargs), status='pending')
 
-        from cyborgbackup.main.utils.tasks import run_job_launch
-        connection.on_commit(lambda: run_job_launch.delay(self.id))
+        from cyborgbackup.main.utils.tasks import schedule_task_manager
+        schedule_task_manager()
         return True
 
     @property
@@ -904,6 +1029,8 @@ class Job(CommonModelNameNotUnique, JobTypeStringMixin, TaskManagerJobMixin):
                     cancel_fields.append('job_explanation')
                 self.save(update_fields=cancel_fields)
                 self.websocket_emit_status("canceled")
+                from cyborgbackup.main.utils.tasks import schedule_task_manager
+                schedule_task_manager()
             if settings.BROKER_URL.startswith('amqp://'):
                 self._force_cancel()
         return self.cancel_flag
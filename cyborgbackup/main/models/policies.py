@@ -1,10 +1,15 @@
+import hashlib
 import logging
+from datetime import datetime, timedelta
+from functools import lru_cache
 
 import pytz
 import tzcron
 from dateutil.tz import datetime_exists
+from django.core.validators import MaxValueValidator
 from django.db import models
 from django.db.models.query import QuerySet
+from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
 
 from cyborgbackup.api.versioning import reverse
@@ -12,11 +17,37 @@ from cyborgbackup.celery import app
 from cyborgbackup.main.consumers import emit_channel_notification
 from cyborgbackup.main.models.base import PrimordialModel
 from cyborgbackup.main.models.settings import Setting
+from cyborgbackup.main.utils.cache import bump_model_version
 from cyborgbackup.main.utils.common import copy_model_by_class
 
 logger = logging.getLogger('cyborgbackup.models.policy')
 
-__all__ = ['Policy']
+__all__ = ['Policy', 'get_next_run']
+
+
+@lru_cache(maxsize=1024)
+def _get_next_run(crontab, t_zone, start):
+    future_rs = tzcron.Schedule(crontab, t_zone, start_date=start)
+    next_run_actual = next(future_rs)
+
+    if next_run_actual is not None:
+        if not datetime_exists(next_run_actual):
+            # skip imaginary dates, like 2:30 on DST boundaries
+            next_run_actual = next(future_rs)
+        next_run_actual = next_run_actual.astimezone(pytz.utc)
+    return next_run_actual
+
+
+def get_next_run(crontab, start=None, t_zone=pytz.utc):
+    """
+    Next occurrence of the crontab after start (defaults to now). Results are
+    cached per crontab, timezone and minute as every policy sharing a
+    schedule gets the same value.
+    """
+    if start is None:
+        start = now()
+    start = start.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    return _get_next_run(crontab, t_zone, start)
 
 
 class PolicyFilterMethods(object):
@@ -141,6 +172,7 @@ class Policy(PrimordialModel):
         null=True,
         default=None,
         editable=False,
+        db_index=True,
         help_text=_("The next time that the scheduled action will run.")
     )
 
@@ -156,6 +188,24 @@ class Policy(PrimordialModel):
         blank=True
     )
 
+    priority = models.PositiveSmallIntegerField(
+        default=0,
+        validators=[MaxValueValidator(99)],
+        help_text=_("Jobs of policies with a higher priority are started first.")
+    )
+
+    backup_window_end = models.TimeField(
+        null=True,
+        default=None,
+        blank=True,
+        help_text=_("Time of day (UTC) by which the backup jobs of this policy should be finished.")
+    )
+
+    start_window = models.PositiveIntegerField(
+        default=0,
+        help_text=_("Duration in minutes over which the start of the backup jobs is spread.")
+    )
+
     def get_absolute_url(self, request=None):
         return reverse('api:policy_detail', kwargs={'pk': self.pk}, request=request)
 
@@ -163,18 +213,20 @@ class Policy(PrimordialModel):
         return "/#/policies/{}".format(self.pk)
 
     def update_computed_fields(self):
-        future_rs = tzcron.Schedule(self.schedule.crontab, pytz.utc)
-        next_run_actual = next(future_rs)
-
-        if next_run_actual is not None:
-            if not datetime_exists(next_run_actual):
-                # skip imaginary dates, like 2:30 on DST boundaries
-                next_run_actual = next(future_rs)
-            next_run_actual = next_run_actual.astimezone(pytz.utc)
-
-        self.next_run = next_run_actual
+        self.next_run = get_next_run(self.schedule.crontab)
         emit_channel_notification('schedules-changed', dict(id=self.id, group_name='schedules'))
 
+    @classmethod
+    def bulk_update_next_run(cls, policies, start=None):
+        """
+        Recompute and save the next run of the given policies in a single
+        query, without sending any notification.
+        """
+        for policy in policies:
+            policy.next_run = get_next_run(policy.schedule.crontab, start)
+        cls.objects.bulk_update(policies, ['next_run'])
+        bump_model_version(cls)
+
     def save(self, *args, **kwargs):
         self.update_computed_fields()
         # If update_fields has been specified, add our field names to it,
@@ -189,6 +241,39 @@ class Policy(PrimordialModel):
     def get_cache_id_key(cls, key):
         return '{}_ID'.format(key)
 
+    def get_retention_days(self):
+        """
+        Number of days of archives kept by the prune rules, None when the
+        archives are never pruned.
+        """
+        days = max((self.keep_hourly or 0) / 24.0, self.keep_daily or 0, (self.keep_weekly or 0) * 7,
+                   (self.keep_monthly or 0) * 31, (self.keep_yearly or 0) * 365)
+        return days or None
+
+    def get_deadline(self, start=None):
+        """
+        Next end of the backup window following the given start date.
+        """
+        if self.backup_window_end is None:
+            return None
+        if start is None:
+            start = now()
+        start = start.astimezone(pytz.utc)
+        deadline = datetime.combine(start.date(), self.backup_window_end, tzinfo=pytz.utc)
+        if deadline <= start:
+            deadline += timedelta(days=1)
+        return deadline
+
+    def get_start_offset(self, client):
+        """
+        Deterministic delay, within the start window, before the backup of
+        the given client is released.
+        """
+        if not self.start_window:
+            return timedelta(0)
+        digest = hashlib.sha1(client.hostname.encode('utf-8')).hexdigest()
+        return timedelta(seconds=int(digest, 16) % (self.start_window * 60))
+
     @classmethod
     def _get_job_class(cls):
         from cyborgbackup.main.models.jobs import Job
@@ -229,6 +314,9 @@ class Policy(PrimordialModel):
         have_prune_info = (self.keep_hourly or self.keep_daily
                            or self.keep_weekly or self.keep_monthly or self.keep_yearly)
 
+        created = now()
+        deadline = self.get_deadline(created)
+
         jobs = []
         previous_job = None
         catalog_job = None
@@ -238,6 +326,9 @@ class Policy(PrimordialModel):
             job.policy_id = self.pk
             job.repository_id = self.repository.pk
             job.client_id = client.pk
+            job.priority = self.priority
+            job.deadline = deadline
+            job.start_after = created + self.get_start_offset(client)
             job.status = 'pending'
             job.name = "Backup Job {} {}".format(self.name, client.hostname)
             job.description = "Backup Job for Policy {} of client {}".format(self.name, client.hostname)
@@ -247,6 +338,7 @@ class Policy(PrimordialModel):
                 catalog_job.policy_id = self.pk
                 catalog_job.repository_id = self.repository.pk
                 catalog_job.client_id = client.pk
+                catalog_job.priority = self.priority
                 catalog_job.status = 'waiting'
                 catalog_job.job_type = 'catalog'
                 catalog_job.name = "Catalog Job {} {}".format(self.name, client.hostname)
@@ -261,6 +353,7 @@ class Policy(PrimordialModel):
                     prune_job.policy_id = self.pk
                     prune_job.repository_id = self.repository.pk
                     prune_job.client_id = client.pk
+                    prune_job.priority = self.priority
                     prune_job.status = 'waiting'
                     prune_job.job_type = 'prune'
                     prune_job.name = "Prune Job {} {}".format(self.name, client.hostname)
@@ -316,6 +409,7 @@ class Policy(PrimordialModel):
         job.policy_id = self.pk
         job.client_id = source_job.client.pk
         job.archive_name = source_job.archive_name
+        job.priority = job_class.RESTORE_PRIORITY
         job.status = 'new'
         job.name = "Restore Job {} {}".format(self.name, source_job.client.hostname)
         job.description = "Restore Job for Policy {} of client {}".format(self.name, source_job.client.hostname)
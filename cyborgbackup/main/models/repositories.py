@@ -1,6 +1,11 @@
+import datetime
 import logging
 
+from django.conf import settings
 from django.db import models
+from django.db.models import Max, Min
+from django.utils.timezone import now
+from django.utils.translation import gettext_lazy as _
 
 from cyborgbackup.api.versioning import reverse
 from cyborgbackup.main.models.base import PrimordialModel
@@ -8,7 +13,7 @@ from cyborgbackup.main.utils.common import copy_model_by_class, copy_m2m_relatio
 
 logger = logging.getLogger('cyborgbackup.models.Repository')
 
-__all__ = ['Repository']
+__all__ = ['Repository', 'RepositorySize']
 
 
 class Repository(PrimordialModel):
@@ -44,6 +49,11 @@ class Repository(PrimordialModel):
         default=0
     )
 
+    capacity = models.BigIntegerField(
+        default=0,
+        help_text=_("Capacity in bytes of the repository storage, 0 if unknown."),
+    )
+
     latest_prepare = models.DateTimeField(
         null=True,
         default=None,
@@ -56,6 +66,101 @@ class Repository(PrimordialModel):
     def get_ui_url(self):
         return "/#/repositories/{}".format(self.pk)
 
+    def get_retention_days(self):
+        """
+        Number of days of archives kept by the prune rules of the policies
+        using this repository, None when some archives are never pruned.
+        """
+        from cyborgbackup.main.models.settings import Setting
+        try:
+            setting = Setting.objects.get(key='cyborgbackup_auto_prune')
+            if setting.value == 'True':
+                auto_prune_enabled = True
+            else:
+                auto_prune_enabled = False
+        except Exception:
+            auto_prune_enabled = True
+        if not auto_prune_enabled:
+            return None
+        retention = 0
+        for policy in self.policies.filter(enabled=True):
+            days = policy.get_retention_days()
+            if days is None:
+                return None
+            retention = max(retention, days)
+        return retention or None
+
+    def get_forecast(self):
+        """
+        Forecast the growth of the repository from its size history.
+
+        Until the oldest archives are pruned, the repository grows with its
+        own trend. Once the prune rules are saturated it only grows with the
+        backed up data, estimated from the trend of the archive sizes, or with
+        its own trend when the archive sizes are unknown.
+        """
+        today = now().date()
+        since = today - datetime.timedelta(days=getattr(settings, 'CYBORGBACKUP_FORECAST_DAYS', 30))
+        samples = self.size_history.filter(day__gte=since)
+        growth = _get_trend(samples.filter(client__isnull=True).values_list('day', 'deduplicated_size'))
+        data_growth = self.get_data_growth(since)
+        retention_days = self.get_retention_days()
+        saturation_date = None
+        if retention_days is not None:
+            first_day = self.daily_stats.aggregate(first_day=Min('day'))['first_day'] or today
+            saturation_date = max(first_day + datetime.timedelta(days=retention_days), today)
+
+        saturated_growth = growth if data_growth is None else data_growth
+        full_date = None
+        remaining = self.capacity - self.deduplicated_size
+        if self.capacity and remaining <= 0:
+            full_date = today
+        elif self.capacity and growth is not None:
+            days = None
+            until_saturation = (saturation_date - today).days if saturation_date else None
+            if growth > 0 and (until_saturation is None or remaining <= growth * until_saturation):
+                days = remaining / growth
+            elif until_saturation is not None and saturated_growth > 0:
+                days = until_saturation + (remaining - max(growth, 0) * until_saturation) / saturated_growth
+            if days is not None:
+                full_date = today + datetime.timedelta(days=int(days))
+        return {
+            'capacity': self.capacity,
+            'deduplicated_size': self.deduplicated_size,
+            'growth_per_day': growth,
+            'data_growth_per_day': data_growth,
+            'retention_days': retention_days,
+            'saturation_date': saturation_date,
+            'full_date': full_date,
+        }
+
+    def get_data_growth(self, since):
+        """
+        Trend of the deduplicated size of the backed up data, from the size
+        of the archives of each client. Each client counts with its last
+        sample until the next one, as clients are not all backed up on the
+        same days.
+        """
+        client_samples = self.size_history.filter(client__isnull=False)
+        last_days = set(client_samples.filter(day__lt=since).values('client_id').annotate(
+            last_day=Max('day')).values_list('client_id', 'last_day').order_by())
+        sizes = {}
+        for client_id, day, size in client_samples.filter(
+                day__in=set(day for _, day in last_days)).values_list('client_id', 'day', 'original_size'):
+            if (client_id, day) in last_days:
+                sizes[client_id] = size
+        points = []
+        for client_id, day, size in client_samples.filter(day__gte=since).values_list(
+                'client_id', 'day', 'original_size').order_by('day'):
+            sizes[client_id] = size
+            if points and points[-1][0] == day:
+                points.pop()
+            points.append((day, sum(sizes.values())))
+        data_growth = _get_trend(points)
+        if data_growth is not None and self.original_size:
+            data_growth *= self.deduplicated_size / float(self.original_size)
+        return data_growth
+
     @classmethod
     def get_cache_key(cls, key):
         return key
@@ -97,3 +202,86 @@ class Repository(PrimordialModel):
         copy_m2m_relationships(self, job, (), kwargs=kwargs)
 
         return job
+
+
+def _get_trend(points):
+    """
+    Least squares slope, per day, of a list of (day, value) points.
+    """
+    points = [(day.toordinal(), float(value)) for day, value in points]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    if not variance:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+
+
+class RepositorySizeManager(models.Manager):
+
+    def record(self, repository_id, client_id, sizes, day=None):
+        """
+        Record the sizes of a repository, or of the archives of one of its
+        clients, keeping one sample per day.
+        """
+        day = day or now().date()
+        self.update_or_create(repository_id=repository_id, client_id=client_id, day=day, defaults=sizes)
+        self.downsample(repository_id, day)
+
+    def downsample(self, repository_id, day):
+        """
+        Keep only the last sample of each week for the days older than
+        CYBORGBACKUP_SIZE_HISTORY_DAILY_DAYS.
+        """
+        limit = day - datetime.timedelta(days=getattr(settings, 'CYBORGBACKUP_SIZE_HISTORY_DAILY_DAYS', 90))
+        old_samples = self.filter(repository_id=repository_id, day__lt=limit)
+        kept = old_samples.values('client_id', 'day__iso_year', 'day__week').annotate(last_day=Max('day')).order_by()
+        kept = set((sample['client_id'], sample['last_day']) for sample in kept)
+        removed = [pk for pk, client_id, sample_day in old_samples.values_list('pk', 'client_id', 'day')
+                   if (client_id, sample_day) not in kept]
+        if removed:
+            self.filter(pk__in=removed).delete()
+
+
+class RepositorySize(models.Model):
+    """
+    Size history of a repository, or of the archives of a client when a
+    client is set.
+    """
+    repository = models.ForeignKey(
+        'Repository',
+        related_name='size_history',
+        on_delete=models.CASCADE,
+    )
+
+    client = models.ForeignKey(
+        'Client',
+        related_name='size_history',
+        on_delete=models.CASCADE,
+        null=True,
+    )
+
+    day = models.DateField(
+        db_index=True,
+    )
+
+    original_size = models.BigIntegerField(
+        default=0
+    )
+
+    compressed_size = models.BigIntegerField(
+        default=0
+    )
+
+    deduplicated_size = models.BigIntegerField(
+        default=0
+    )
+
+    objects = RepositorySizeManager()
+
+    class Meta:
+        app_label = 'main'
+        ordering = ('day',)
+        unique_together = [('repository', 'client', 'day')]
@@ -3,8 +3,10 @@ import logging
 from django.db import models
 
 from cyborgbackup.api.versioning import reverse
+from cyborgbackup.main.consumers import emit_channel_notification
 from cyborgbackup.main.models.base import PrimordialModel
-from cyborgbackup.main.models.policies import Policy
+from cyborgbackup.main.models.policies import Policy, get_next_run
+from cyborgbackup.main.utils.cache import bump_model_version
 
 analytics_logger = logging.getLogger('cyborgbackup.models.schedule')
 
@@ -43,13 +45,15 @@ class Schedule(PrimordialModel):
         return '{}_ID'.format(key)
 
     def updated_related_policies(self):
-        refPolicies = Policy.objects.filter(schedule__pk=self.pk)
-        if refPolicies.exists():
-            for pol in refPolicies:
-                pol.save()
+        # Every policy of the schedule shares the same next run, computed
+        # once and written with a single query.
+        updated = Policy.objects.filter(schedule__pk=self.pk).update(next_run=get_next_run(self.crontab))
+        if updated:
+            bump_model_version(Policy)
+            emit_channel_notification('schedules-changed', dict(id=self.id, group_name='schedules'))
 
     def save(self, *args, **kwargs):
-        self.updated_related_policies()
         # If update_fields has been specified, add our field names to it,
         # if it hasn't been specified, then we're just doing a normal save.
         super(Schedule, self).save(*args, **kwargs)
+        self.updated_related_policies()
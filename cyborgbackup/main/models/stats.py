@@ -0,0 +1,111 @@
+import logging
+
+from django.db import models
+from django.db.models import F
+from django.db.models.functions import Coalesce
+
+from cyborgbackup.main.utils.cache import bump_model_version
+
+logger = logging.getLogger('cyborgbackup.models.JobDailyStat')
+
+__all__ = ['JobDailyStat']
+
+
+class JobDailyStatManager(models.Manager):
+
+    def record(self, job):
+        """
+        Add a finished backup job to the rollup of its day, policy, client
+        and repository. When two jobs of the same group finish at once, the
+        unique constraint makes the second one update the row created by the
+        first one.
+        """
+        day = (job.started or job.finished).date()
+        repository_id = job.policy.repository_id if job.policy_id else job.repository_id
+        stat, _ = self.get_or_create(day=day, policy_id=job.policy_id, client_id=job.client_id,
+                                     repository_id=repository_id)
+        self.filter(pk=stat.pk).update(
+            jobs=F('jobs') + 1,
+            successful=F('successful') + int(job.status == 'successful'),
+            failed=F('failed') + int(job.status in ('failed', 'error')),
+            original_size=F('original_size') + job.original_size,
+            compressed_size=F('compressed_size') + job.compressed_size,
+            deduplicated_size=F('deduplicated_size') + job.deduplicated_size,
+            elapsed=F('elapsed') + float(job.elapsed or 0),
+        )
+        bump_model_version(self.model)
+
+
+class JobDailyStat(models.Model):
+    """
+    Daily rollup of the finished backup jobs, by policy, client and repository.
+    """
+    day = models.DateField(
+        db_index=True,
+    )
+
+    policy = models.ForeignKey(
+        'Policy',
+        related_name='daily_stats',
+        on_delete=models.CASCADE,
+        null=True,
+    )
+
+    client = models.ForeignKey(
+        'Client',
+        related_name='daily_stats',
+        on_delete=models.CASCADE,
+        null=True,
+    )
+
+    repository = models.ForeignKey(
+        'Repository',
+        related_name='daily_stats',
+        on_delete=models.CASCADE,
+        null=True,
+    )
+
+    jobs = models.PositiveIntegerField(
+        default=0,
+    )
+
+    successful = models.PositiveIntegerField(
+        default=0,
+    )
+
+    failed = models.PositiveIntegerField(
+        default=0,
+    )
+
+    original_size = models.BigIntegerField(
+        default=0,
+    )
+
+    compressed_size = models.BigIntegerField(
+        default=0,
+    )
+
+    deduplicated_size = models.BigIntegerField(
+        default=0,
+    )
+
+    elapsed = models.FloatField(
+        default=0,
+    )
+
+    objects = JobDailyStatManager()
+
+    class Meta:
+        app_label = 'main'
+        ordering = ('day',)
+        constraints = [
+            # The keys are coalesced so rows without policy, client or
+            # repository are unique too, NULL values being distinct otherwise.
+            models.UniqueConstraint(
+                F('day'),
+                Coalesce('policy', 0, output_field=models.IntegerField()),
+                Coalesce('client', 0, output_field=models.IntegerField()),
+                Coalesce('repository', 0, output_field=models.IntegerField()),
+                name='main_jobdailystat_unique_group',
+            ),
+        ]
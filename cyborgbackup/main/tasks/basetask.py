@@ -47,6 +47,7 @@ class BaseTask(LogErrorsTask):
     event_model = None
     event_data_key = None
     abstract = True
+    stdout_filter = OutputEventFilter
     cleanup_paths = []
     proot_show_paths = []
 
@@ -205,7 +206,7 @@ class BaseTask(LogErrorsTask):
                     event_data.update(cache_event)
             dispatcher.dispatch(event_data)
 
-        return OutputEventFilter(event_callback)
+        return self.stdout_filter(event_callback)
 
     def pre_run_hook(self, instance, **kwargs):
         """
@@ -217,6 +218,13 @@ class BaseTask(LogErrorsTask):
         Hook for any steps to run before job/task is marked as complete.
         """
 
+    def get_stdout_update_fields(self, instance, status, stdout_handle):
+        """
+        Return the fields to update on the job/task from its captured output,
+        stdout_handle is None when the job/task failed before running.
+        """
+        return {}
+
     def final_run_hook(self, instance, status, **kwargs):
         """
         Hook for any steps to run after job/task is marked as complete.
@@ -311,6 +319,7 @@ class BaseTask(LogErrorsTask):
         instance = self.update_model(pk)
         if instance.cancel_flag:
             status = 'canceled'
+        extra_update_fields.update(self.get_stdout_update_fields(instance, status, stdout_handle))
 
         instance = self.update_model(pk, status=status, result_traceback=tb,
                                      output_replacements=output_replacements,
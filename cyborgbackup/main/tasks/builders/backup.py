@@ -4,6 +4,7 @@ import os
 import tempfile
 
 from cyborgbackup.main.exceptions import JobCommandBuilderException
+from cyborgbackup.main.models import Job
 from cyborgbackup.main.models.settings import Setting
 from cyborgbackup.main.tasks.builders.helpers import build_env
 from cyborgbackup.main.utils.common import load_module_provider
@@ -170,6 +171,11 @@ def _build_borg_cmd_for_piped(policy_type, job):
 #   push => ssh borg@backupHost "ssh root@client "pg_dumpall|pg_dump" | borg create /backup::archive -"
 ########
 
+def get_archive_name(job):
+    job_date_string = job.created.strftime("%Y-%m-%d_%H-%M")
+    return '{}-{}-{}'.format(job.policy.policy_type, job.client.hostname, job_date_string)
+
+
 def build_borg_cmd(job):
     policy_type = job.policy.policy_type
     job_date = job.created
@@ -192,8 +198,7 @@ def build_borg_cmd(job):
     repository_path = ''
     if not job.policy.mode_pull:
         repository_path = job.policy.repository.path
-    args += ['--debug', '-v', '--stats']
-    archive_client_name = job.client.hostname
+    args += ['--log-json', '--progress', '--json']
     if policy_type == 'rootfs':
         path, excluded_dirs = _build_borg_cmd_for_rootfs()
     if policy_type == 'config':
@@ -214,7 +219,7 @@ def build_borg_cmd(job):
         if not job.policy.mode_pull:
             args = [piped, '|'] + args
 
-    args += ['{}::{}-{}-{}'.format(repository_path, policy_type, archive_client_name, job_date_string)]
+    args += ['{}::{}'.format(repository_path, get_archive_name(job))]
 
     if job.policy.mode_pull and policy_type in ('rootfs', 'config', 'mail'):
         path = '.' + path
@@ -247,9 +252,12 @@ def build_borg_cmd(job):
     return client, client_user, args
 
 
-def _build_args_for_backup(self, job, **kwargs):
+def _build_args_for_backup(job, **kwargs):
     env = build_env(job, **kwargs)
     (client, client_user, args) = build_borg_cmd(job)
+    if not kwargs.get('display', False):
+        job.archive_name = get_archive_name(job)
+        Job.objects.filter(pk=job.pk).update(archive_name=job.archive_name)
 
     handle_env, path_env = tempfile.mkstemp()
     f = os.fdopen(handle_env, 'w')
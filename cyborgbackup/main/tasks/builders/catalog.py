@@ -6,7 +6,7 @@ import tempfile
 from django.conf import settings
 
 from cyborgbackup.main.exceptions import JobCatalogException
-from cyborgbackup.main.models import User, JobEvent
+from cyborgbackup.main.models import User
 from cyborgbackup.main.tasks.builders.helpers import build_env
 
 logger = logging.getLogger('cyborgbackup.main.tasks.builders.catalog')
@@ -29,21 +29,8 @@ def _build_args_for_catalog(job, **kwargs):
         f = os.fdopen(handle, 'w')
         if not job.master_job:
             raise JobCatalogException("Unable to get master job")
-
-        job_events = JobEvent.objects.filter(
-            job=job.master_job.pk,
-            stdout__contains="Archive name: {}".format(
-                job.master_job.policy.policy_type
-            )
-        )
-        archive_name = None
-        if job_events.exists():
-            job_stdout = job_events.first().stdout
-            archive_name = job_stdout.split(':')[1].strip()
-        if not archive_name:
+        if not job.master_job.archive_name:
             raise JobCatalogException("Latest backup haven't archive name in the report")
-        job.master_job.archive_name = archive_name
-        job.master_job.save()
         base_script = os.path.join(settings.SCRIPTS_DIR, 'cyborgbackup', 'fill_catalog')
         with open(base_script) as fs:
             script = fs.read()
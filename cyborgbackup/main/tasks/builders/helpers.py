@@ -8,7 +8,7 @@ from django.conf import settings
 from rest_framework.authtoken.models import Token
 
 from cyborgbackup.main.exceptions import JobCatalogException
-from cyborgbackup.main.models import JobEvent, User
+from cyborgbackup.main.models import User
 from cyborgbackup.main.models.settings import Setting
 from cyborgbackup.main.utils.encryption import decrypt_field
 
@@ -58,18 +58,8 @@ def build_env(job, **kwargs):
             else:
                 env['CYBORG_BORG_REPOSITORY'] = job.policy.repository.path
         if job.job_type == 'catalog':
-            job_events = JobEvent.objects.filter(
-                job=job.master_job.pk,
-                stdout__contains="Archive name: {}".format(
-                    job.master_job.policy.policy_type
-                )
-            )
-            archive_name = None
-            if job_events.exists():
-                job_stdout = job_events.first().stdout
-                archive_name = job_stdout.split(':')[1].strip()
-            if archive_name:
-                env['CYBORG_JOB_ARCHIVE_NAME'] = archive_name
+            if job.master_job.archive_name:
+                env['CYBORG_JOB_ARCHIVE_NAME'] = job.master_job.archive_name
             else:
                 raise JobCatalogException('Unable to get archive from backup. Backup job may failed.')
             env['CYBORG_JOB_ID'] = str(job.master_job.pk)
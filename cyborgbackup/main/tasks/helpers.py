@@ -3,18 +3,13 @@ import logging
 import os
 import shutil
 
+from django.conf import settings
+
 from cyborgbackup.main.models import User, Policy, Job, JobEvent
 from cyborgbackup.main.models.settings import Setting
 
 logger = logging.getLogger('cyborgbackup.main.tasks.helpers')
 
-units = {"B": 1, "kB": 10 ** 3, "MB": 10 ** 6, "GB": 10 ** 9, "TB": 10 ** 12}
-
-
-def parseSize(size):
-    number, unit = [string.strip() for string in size.split()]
-    return int(float(number) * units[unit])
-
 
 def _cyborgbackup_notifier_summary(policy_pk):
     logger.debug('Summary')
@@ -98,11 +93,53 @@ def _cyborgbackup_notifier_after(job_pk):
         users = User.objects.filter(notify_backup_success=True)
     if job.status == 'failed':
         users = User.objects.filter(notify_backup_failed=True)
-    jobevents = JobEvent.objects.filter(job_id=job_pk).order_by('counter')
+    return {'state': job.status, 'title': job.name, 'lines': get_job_output_excerpt(job_pk), 'job': job}, users
+
+
+def get_job_error_ranges(job, absolute_end):
+    """
+    Return the line ranges of the job error events, up to
+    CYBORGBACKUP_NOTIFICATION_ERROR_LINES lines in total. An event continuing
+    on the next one covers no line but still belongs to its start line.
+    """
+    budget = getattr(settings, 'CYBORGBACKUP_NOTIFICATION_ERROR_LINES', 50)
+    errors = job.get_event_queryset().filter(event__in=JobEvent.FAILED_EVENTS).order_by('counter')
+    ranges = []
+    for start_line, end_line in errors.values_list('start_line', 'end_line').iterator():
+        if budget <= 0:
+            break
+        if start_line >= absolute_end:
+            continue
+        end = min(max(end_line, start_line + 1), absolute_end, start_line + budget)
+        ranges.append((start_line, end))
+        budget -= end - start_line
+    return ranges
+
+
+def get_job_output_excerpt(job_pk):
+    """
+    Return the first, last and error lines of a job output, with a marker
+    where lines are left out, reading only these line ranges.
+    """
+    job = Job.objects.get(pk=job_pk)
+    absolute_end = job.get_stdout_line_count()
+    ranges = [
+        (0, getattr(settings, 'CYBORGBACKUP_NOTIFICATION_HEAD_LINES', 50)),
+        (absolute_end - getattr(settings, 'CYBORGBACKUP_NOTIFICATION_TAIL_LINES', 50), absolute_end),
+    ]
+    ranges.extend(get_job_error_ranges(job, absolute_end))
+    excerpt = dict()
+    for start_line, end_line in ranges:
+        start, end = max(start_line, 0), min(end_line, absolute_end)
+        excerpt.update(zip(range(start, end), job.iter_stdout_lines(start, end)))
     lines = []
-    for event in jobevents:
-        lines.append(event.stdout)
-    return {'state': job.status, 'title': job.name, 'lines': lines, 'job': job}, users
+    previous = None
+    for line_number in sorted(excerpt):
+        if previous is not None and line_number != previous + 1:
+            lines.append('...')
+        lines.append(excerpt[line_number].rstrip('\n'))
+        previous = line_number
+    return lines
 
 
 def with_path_cleanup(f):
@@ -1,4 +1,5 @@
 import datetime
+import functools
 import logging
 import os
 import smtplib
@@ -6,15 +7,39 @@ from email.headerregistry import Address
 from email.message import EmailMessage
 
 from django.conf import settings
+from django.db.models import Count, Sum
 from jinja2 import FileSystemLoader, Environment
 
-from cyborgbackup.main.models import Job, Catalog
+from cyborgbackup.main.models import Job
 from cyborgbackup.main.models.settings import Setting
 from cyborgbackup.main.tasks.helpers import humanbytes
 
 logger = logging.getLogger('cyborgbackup.main.tasks.reports')
 
 
+REPORT_LINE_FIELDS = ('client__hostname', 'policy__policy_type', 'status', 'elapsed',
+                      'archive_files', 'original_size', 'deduplicated_size')
+
+
+def build_report_lines(jobs):
+    """
+    Lines of a report, read with a single query and kept for each table rendered.
+    """
+    lines = []
+    for hostname, policy_type, status, elapsed, files, original_size, deduplicated_size in \
+            jobs.order_by('started').values_list(*REPORT_LINE_FIELDS):
+        lines.append({
+            'client': hostname or '',
+            'type': policy_type or '',
+            'status': status,
+            'duration': str(datetime.timedelta(seconds=float(elapsed))),
+            'numberFiles': str(files),
+            'original_size': str(humanbytes(original_size)),
+            'deduplicated_size': str(humanbytes(deduplicated_size))
+        })
+    return lines
+
+
 def build_report(type):
     since = 24 * 60 * 60
     if type == 'daily':
@@ -25,120 +50,90 @@ def build_report(type):
         since *= 31
     started = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=since)
     jobs = Job.objects.filter(started__gte=started, job_type='job')
-    total_times = 0
-    total_backups = 0
-    total_size = 0
-    total_deduplicated = 0
-    lines = []
-    if jobs.exists():
-        for job in jobs:
-            number_of_files = Catalog.objects.filter(job=job.pk).__len__()
-            total_times += job.elapsed
-            total_backups += 1
-            total_size += job.original_size
-            total_deduplicated += job.deduplicated_size
-            line = {
-                'client': job.client.hostname,
-                'type': job.policy.policy_type,
-                'status': job.status,
-                'duration': str(datetime.timedelta(seconds=float(job.elapsed))),
-                'numberFiles': str(number_of_files),
-                'original_size': str(humanbytes(job.original_size)),
-                'deduplicated_size': str(humanbytes(job.deduplicated_size))
-            }
-            lines.append(line)
+    totals = jobs.aggregate(times=Sum('elapsed'),
+                            backups=Count('id'),
+                            size=Sum('original_size'),
+                            deduplicated=Sum('deduplicated_size'))
     report = {
-        'times': total_times,
-        'backups': total_backups,
-        'size': humanbytes(total_size),
-        'deduplicated': humanbytes(total_deduplicated),
-        'lines': lines
+        'times': totals['times'] or 0,
+        'backups': totals['backups'],
+        'size': humanbytes(totals['size'] or 0),
+        'deduplicated': humanbytes(totals['deduplicated'] or 0),
+        'lines': build_report_lines(jobs)
     }
     return report
 
 
 def generate_ascii_table(elements):
+    widths = [col['minsize'] for col in elements['columns']]
     for elt in elements['lines']:
-        for col in elements['columns']:
-            if len(elt[col['key']]) > col['minsize'] - 2:
-                col['minsize'] = len(elt[col['key']]) + 2
-    line = '+'
-    for col in elements['columns']:
-        line += '-' * col['minsize'] + '+'
-    header = line + '\n'
-    for col in elements['columns']:
-        header += '| ' + col['title'].ljust(col['minsize'] - 1)
-    header += '|' + '\n' + line
-    table = header
+        for i, col in enumerate(elements['columns']):
+            widths[i] = max(widths[i], len(elt[col['key']]) + 2)
+    for i, col in enumerate(elements['columns']):
+        col['minsize'] = widths[i]
+    line = '+' + '+'.join('-' * width for width in widths) + '+'
+    table = [line,
+             ''.join('| ' + col['title'].ljust(col['minsize'] - 1) for col in elements['columns']) + '|',
+             line]
     for elt in elements['lines']:
-        table += '\n'
-        for col in elements['columns']:
-            table += '| ' + elt[col['key']].ljust(col['minsize'] - 1)
-        table += '|'
-    table += '\n' + line
-    return table
+        table.append(''.join('| ' + elt[col['key']].ljust(col['minsize'] - 1) for col in elements['columns']) + '|')
+    table.append(line)
+    return '\n'.join(table)
 
 
 def generate_html_table(elements):
-    table = '<table>\n<thead><tr>'
+    table = ['<table>\n<thead><tr>']
     for col in elements['columns']:
-        table += '<th>' + col['title'] + '</th>\n'
-    table += '</tr></thead>\n<tbody>'
+        table.append('<th>' + col['title'] + '</th>\n')
+    table.append('</tr></thead>\n<tbody>')
     for elt in elements['lines']:
-        table += '<tr>'
+        table.append('<tr>')
         for col in elements['columns']:
-            table += '<td>' + elt[col['key']] + '</td>\n'
-        table += '</tr>\n'
-    table += '</tbody></table>\n'
-    return table
+            table.append('<td>' + elt[col['key']] + '</td>\n')
+        table.append('</tr>\n')
+    table.append('</tbody></table>\n')
+    return ''.join(table)
 
 
 def generate_html_joboutput(elements):
-    output = """Job Output : <div class="job-results-standard-out">
+    output = ["""Job Output : <div class="job-results-standard-out">
       <div class="JobResultsStdOut">
-        <div class="JobResultsStdOut-stdoutContainer">"""
-    lineNumber = 1
-    for line in elements['lines']:
-        output += """<div class="JobResultsStdOut-aLineOfStdOut">
+        <div class="JobResultsStdOut-stdoutContainer">"""]
+    for lineNumber, line in enumerate(elements['lines'], 1):
+        output.append("""<div class="JobResultsStdOut-aLineOfStdOut">
               <div class="JobResultsStdOut-lineNumberColumn">
                 <span class="JobResultsStdOut-lineExpander"></span>{}
               </div>
               <div class="JobResultsStdOut-stdoutColumn"><span>{}</span></div>
-          </div>""".format(lineNumber, line)
-        lineNumber += 1
-    output += """</div>
+          </div>""".format(lineNumber, line))
+    output.append("""</div>
       </div>
-    </div>"""
-    return output
+    </div>""")
+    return ''.join(output)
 
 
-def send_email(elements, type, mail_to):
-    try:
-        setting = Setting.objects.get(key='cyborgbackup_mail_from')
-        mail_address = setting.value
-    except Exception:
-        mail_address = 'cyborgbackup@cyborgbackup.local'
-    try:
-        setting = Setting.objects.get(key='cyborgbackup_mail_server')
-        mail_server = setting.value
-    except Exception:
-        mail_server = 'localhost'
-    msg = EmailMessage()
-    msg['Subject'] = 'CyBorgBackup Report'
-    msg['From'] = Address("CyBorgBackup", mail_address.split('@')[0], mail_address.split('@')[1])
-    msg['To'] = mail_to
+@functools.lru_cache(maxsize=None)
+def get_template_environment():
+    return Environment(loader=FileSystemLoader(os.path.join(os.path.dirname(__file__), 'templates')),
+                       autoescape=True)
+
+
+@functools.lru_cache(maxsize=None)
+def get_asset(name):
+    with open(os.path.join(settings.BASE_DIR, 'cyborgbackup', name)) as f:
+        return f.read()
+
+
+def render_email(elements, type):
     if type != 'after':
         ascii_table = generate_ascii_table(elements)
         html_table = generate_html_table(elements)
     else:
         ascii_table = ""
         html_table = generate_html_joboutput(elements)
-    logo = os.path.join(settings.BASE_DIR, 'cyborgbackup', 'logo.txt')
-    with open(logo) as f:
-        logo_text = f.read()
     context = {
         "type": type,
-        "logo_text": logo_text,
+        "logo_text": get_asset('logo.txt'),
         "now": datetime.datetime.now(),
         "ascii_table": ascii_table,
         "html_table": html_table
@@ -146,24 +141,47 @@ def send_email(elements, type, mail_to):
     context.update(elements)
     if type == 'after':
         if elements['state'] == 'successful':
-            logo = os.path.join(settings.BASE_DIR, 'cyborgbackup', 'icon_success.txt')
-            with open(logo) as f:
-                context['state_icon'] = f.read()
+            context['state_icon'] = get_asset('icon_success.txt')
             context['state_class'] = "alert-success"
         else:
-            logo = os.path.join(settings.BASE_DIR, 'cyborgbackup', 'icon_failed.txt')
-            with open(logo) as f:
-                context['state_icon'] = f.read()
+            context['state_icon'] = get_asset('icon_failed.txt')
             context['state_class'] = "alert-failed"
 
-    environment = Environment(loader=FileSystemLoader("templates/"), autoescape=True)
-    tmpl_html = environment.get_template("mail_html.j2")
-    tmpl_text = environment.get_template("mail_text.j2")
+    environment = get_template_environment()
+    html_version = environment.get_template("mail_html.j2").render(context)
+    text_version = environment.get_template("mail_text.j2").render(context)
+    return text_version, html_version
+
 
-    html_version = tmpl_html.render(context)
-    text_version = tmpl_text.render(context)
-    msg.set_content(text_version)
-    msg.add_alternative(html_version, subtype='html')
+def send_email(elements, type, mail_to):
+    """
+    Render the report once and send it to each recipient over a single SMTP session.
+    """
+    if isinstance(mail_to, str):
+        mail_to = [mail_to]
+    if not mail_to:
+        return
+    try:
+        setting = Setting.objects.get(key='cyborgbackup_mail_from')
+        mail_address = setting.value
+    except Exception:
+        mail_address = 'cyborgbackup@cyborgbackup.local'
+    try:
+        setting = Setting.objects.get(key='cyborgbackup_mail_server')
+        mail_server = setting.value
+    except Exception:
+        mail_server = 'localhost'
+    text_version, html_version = render_email(elements, type)
     logger.debug('Send Email')
     with smtplib.SMTP(mail_server) as s:
-        s.send_message(msg)
+        for address in mail_to:
+            msg = EmailMessage()
+            msg['Subject'] = 'CyBorgBackup Report'
+            msg['From'] = Address("CyBorgBackup", mail_address.split('@')[0], mail_address.split('@')[1])
+            msg['To'] = address
+            msg.set_content(text_version)
+            msg.add_alternative(html_version, subtype='html')
+            try:
+                s.send_message(msg)
+            except smtplib.SMTPRecipientsRefused:
+                logger.warning('Unable to send report to %s', address)
@@ -1,7 +1,7 @@
 import logging
 import re
 
-from cyborgbackup.main.models import Job, JobEvent
+from cyborgbackup.main.models import Job, JobEvent, Repository, RepositorySize
 from cyborgbackup.main.tasks.basetask import BaseTask
 from cyborgbackup.main.tasks.builders.backup import _build_args_for_backup
 from cyborgbackup.main.tasks.builders.catalog import _build_args_for_catalog
@@ -9,6 +9,8 @@ from cyborgbackup.main.tasks.builders.check import _build_args_for_check
 from cyborgbackup.main.tasks.builders.prune import _build_args_for_prune
 from cyborgbackup.main.tasks.builders.restore import _build_args_for_restore
 from cyborgbackup.main.tasks.shared import cyborgbackup_notifier
+from cyborgbackup.main.utils.borg import BorgOutputFilter
+from cyborgbackup.main.utils.cache import bump_model_version
 
 logger = logging.getLogger('cyborgbackup.main.tasks.runjob')
 
@@ -22,6 +24,36 @@ class RunJob(BaseTask):
     model = Job
     event_model = JobEvent
     event_data_key = 'job_id'
+    stdout_filter = BorgOutputFilter
+
+    def get_stdout_handle(self, instance):
+        stdout_handle = super().get_stdout_handle(instance)
+        # Only borg create prints a final JSON document.
+        stdout_handle.parse_documents = instance.job_type == 'job'
+        return stdout_handle
+
+    def get_stdout_update_fields(self, instance, status, stdout_handle):
+        """
+        Store the statistics reported by borg create on the job and on its repository.
+        """
+        stats = getattr(stdout_handle, 'stats', {})
+        if instance.job_type != 'job' or status != 'successful' or 'archive' not in stats:
+            return {}
+        if 'repository' in stats and instance.policy_id:
+            Repository.objects.filter(pk=instance.policy.repository_id).update(**stats['repository'])
+            bump_model_version(Repository)
+            RepositorySize.objects.record(instance.policy.repository_id, None, stats['repository'])
+            if instance.client_id:
+                RepositorySize.objects.record(instance.policy.repository_id, instance.client_id, stats['archive'])
+        update_fields = dict(stats['archive'])
+        if stats.get('archive_name') and stats['archive_name'] != instance.archive_name:
+            logger.warning('%s archive name reported by borg %s differs from %s',
+                           instance.log_format, stats['archive_name'], instance.archive_name)
+            update_fields['archive_name'] = stats['archive_name']
+        for key in ('archive_duration', 'archive_files'):
+            if key in stats:
+                update_fields[key] = stats[key]
+        return update_fields
 
     def final_run_hook(self, instance, status, **kwargs):
         """
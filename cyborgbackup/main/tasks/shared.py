@@ -1,7 +1,6 @@
 import datetime
 import logging
 import os
-import re
 from datetime import time
 from random import random
 
@@ -13,60 +12,19 @@ from django.core import management
 from django.core.exceptions import ObjectDoesNotExist
 from django.utils.timezone import now
 
+from cyborgbackup.main.constants import ACTIVE_STATES
 from cyborgbackup.main.consumers import emit_channel_notification
-from cyborgbackup.main.models import Job, Policy, User, JobEvent, Repository
+from cyborgbackup.main.models import Client, Job, Policy, User
 from cyborgbackup.main.models.schedules import CyborgBackupScheduleState
 from cyborgbackup.main.models.settings import Setting
 from cyborgbackup.main.tasks.basetask import LogErrorsTask
-from cyborgbackup.main.tasks.helpers import _cyborgbackup_notifier_summary, parseSize, _cyborgbackup_notifier_after
+from cyborgbackup.main.tasks.helpers import _cyborgbackup_notifier_summary, _cyborgbackup_notifier_after
 from cyborgbackup.main.tasks.reports import send_email, build_report
+from cyborgbackup.main.utils.cache import bump_model_version
 
 logger = logging.getLogger('cyborgbackup.main.tasks.shared')
 
 
-@shared_task(bind=True, base=LogErrorsTask)
-def compute_borg_size(self):
-    logger.debug('Compute Borg Size Report')
-    jobs = Job.objects.filter(original_size=0,
-                              deduplicated_size=0,
-                              compressed_size=0,
-                              status='successful',
-                              job_type='job').order_by('-finished')
-    if jobs.exists():
-        for job in jobs:
-            events = JobEvent.objects.filter(job_id=job.pk, stdout__contains='This archive:').order_by('-counter')
-            for event in events:
-                prg = re.compile(
-                    r"This archive:\s{1,40}([0-9.]{1,10}\s.B)\s{1,40}([0-9.]{1,10}\s.B)\s{1,40}([0-9.]{1,10}\s.B)\s{0,40}")
-                m = prg.match(event.stdout)
-                if m:
-                    job.original_size = parseSize(m.group(1))
-                    job.compressed_size = parseSize(m.group(2))
-                    job.deduplicated_size = parseSize(m.group(3))
-                    job.save()
-                    break
-    repos = Repository.objects.filter(ready=True)
-    if repos.exists():
-        for repo in repos:
-            jobs = Job.objects.filter(policy__repository_id=repo.pk,
-                                      status='successful',
-                                      job_type='job').order_by('-finished')
-            if jobs.exists():
-                last_running_job = jobs.first()
-                events = JobEvent.objects.filter(job_id=last_running_job.pk, stdout__contains='All archives:').order_by(
-                    '-counter')
-                for event in events:
-                    prg = re.compile(
-                        r"All archives:\s{1,40}([0-9.]{1,10}\s.B)\s{1,40}([0-9.]{1,10}\s.B)\s{1,40}([0-9.]{1,10}\s.B)\s{0,40}")
-                    m = prg.match(event.stdout)
-                    if m:
-                        repo.original_size = parseSize(m.group(1))
-                        repo.compressed_size = parseSize(m.group(2))
-                        repo.deduplicated_size = parseSize(m.group(3))
-                        repo.save()
-                        break
-
-
 @shared_task(bind=True, base=LogErrorsTask)
 def check_borg_new_version(self):
     logger.debug('Check New Release of Borg binary')
@@ -78,6 +36,8 @@ def check_borg_new_version(self):
         'version': latest_version,
         'check_date': datetime.datetime.now()
     }, upsert=True)
+    # The cached client lists show whether each client can be updated.
+    bump_model_version(Client)
 
 
 @shared_task(bind=True, base=LogErrorsTask)
@@ -102,7 +62,7 @@ def random_restore_integrity(self):
         autorestore_test = False
 
     if autorestore_test and catalog_enabled:
-        jobs = Job.objects.filter(archive_name__isnull=False)
+        jobs = Job.objects.filter(archive_name__isnull=False, status='successful')
         if jobs.exists():
             selected_job = random.choice(jobs)
             db = pymongo.MongoClient(settings.MONGODB_URL).local
@@ -137,15 +97,13 @@ def cyborgbackup_notifier(self, report_type, *kwargs):
                 {'title': 'Original Size', 'key': 'original_size', 'minsize': 15},
                 {'title': 'Deduplicated Size', 'key': 'deduplicated_size', 'minsize': 19}
             ]
-            for user in users:
-                send_email(report, report_type, user.email)
+            send_email(report, report_type, [user.email for user in users])
     else:
         if report_type == 'summary':
             report, users = _cyborgbackup_notifier_summary(kwargs[0])
         if report_type == 'after':
             report, users = _cyborgbackup_notifier_after(kwargs[0])
-        for user in users:
-            send_email(report, report_type, user.email)
+        send_email(report, report_type, [user.email for user in users])
 
 
 @shared_task(bind=True, base=LogErrorsTask)
@@ -160,6 +118,21 @@ def prune_catalog(self):
             print(e)
 
 
+@shared_task(bind=True, base=LogErrorsTask)
+def compact_jobs_stdout(self):
+    logger.debug('Compact the output of the finished jobs')
+    finished = now() - datetime.timedelta(seconds=getattr(settings, 'CYBORGBACKUP_STDOUT_COMPACT_DELAY', 3600))
+    incomplete = now() - datetime.timedelta(
+        seconds=getattr(settings, 'CYBORGBACKUP_STDOUT_COMPACT_INCOMPLETE_DELAY', 86400))
+    jobs = Job.objects.filter(stdout_compacted=False, finished__lt=finished).exclude(status__in=ACTIVE_STATES)
+    batch = getattr(settings, 'CYBORGBACKUP_STDOUT_COMPACT_BATCH', 100)
+    for job in jobs.order_by('finished')[:batch]:
+        # The events still missing long after the end of a job will never
+        # be saved, its output is compacted as it is.
+        if job.compact_stdout(force=job.finished < incomplete):
+            logger.info('Compacted the output of Job {}'.format(job.pk))
+
+
 @shared_task(bind=True, base=LogErrorsTask)
 def borg_restore_test(self):
     logger.debug('Borg Restore Test')
@@ -202,29 +175,33 @@ def cyborgbackup_periodic_scheduler(self):
     state.schedule_last_run = run_now
     state.save()
 
-    old_policies = Policy.objects.enabled().before(last_run)
-    for policy in old_policies:
-        policy.save()
-    policies = Policy.objects.enabled().between(last_run, run_now)
-    for policy in policies:
-        if policy.repository.enabled and policy.schedule.enabled:
-            policy.save()
-            try:
-                new_job = policy.create_job()
-                new_job.launch_type = 'scheduled'
-                new_job.save(update_fields=['launch_type'])
-                can_start = new_job.signal_start()
-            except Exception:
-                logger.exception('Error spawning scheduled job.')
-                continue
-            if not can_start:
-                new_job.status = 'failed'
-                expl = ("Scheduled job could not start because it was not in the right state or required manual "
-                        "credentials")
-                new_job.job_explanation = expl
-                new_job.save(update_fields=['status', 'job_explanation'])
-                new_job.websocket_emit_status("failed")
-            emit_channel_notification('schedules-changed', dict(id=policy.id, group_name="jobs"))
+    # The next_run index acts as the priority queue of the policies: only
+    # the policies due since the last tick are loaded and updated, the ones
+    # missed before the last tick are only rescheduled.
+    due_policies = list(Policy.objects.enabled().before(run_now).order_by('next_run')
+                        .select_related('schedule', 'repository'))
+    fired_policies = [policy for policy in due_policies
+                      if policy.next_run > last_run and policy.repository.enabled and policy.schedule.enabled]
+    Policy.bulk_update_next_run(due_policies, run_now)
+    for policy in due_policies:
+        emit_channel_notification('schedules-changed', dict(id=policy.id, group_name='schedules'))
+    for policy in fired_policies:
+        try:
+            new_job = policy.create_job()
+            new_job.launch_type = 'scheduled'
+            new_job.save(update_fields=['launch_type'])
+            can_start = new_job.signal_start()
+        except Exception:
+            logger.exception('Error spawning scheduled job.')
+            continue
+        if not can_start:
+            new_job.status = 'failed'
+            expl = ("Scheduled job could not start because it was not in the right state or required manual "
+                    "credentials")
+            new_job.job_explanation = expl
+            new_job.save(update_fields=['status', 'job_explanation'])
+            new_job.websocket_emit_status("failed")
+        emit_channel_notification('schedules-changed', dict(id=policy.id, group_name="jobs"))
     state.save()
 
 
@@ -238,8 +215,8 @@ def handle_work_success(self, result, task_actual):
     if not instance:
         return
 
-    from cyborgbackup.main.utils.tasks import run_job_complete
-    run_job_complete.delay(instance.id)
+    from cyborgbackup.main.utils.tasks import schedule_task_manager
+    schedule_task_manager()
 
 
 @shared_task(base=LogErrorsTask)
@@ -275,5 +252,5 @@ def handle_work_error(self, task_id, *args, **kwargs):
                 instance.websocket_emit_status("failed")
 
     if first_instance:
-        from cyborgbackup.main.utils.tasks import run_job_complete
-        run_job_complete.delay(first_instance.id)
+        from cyborgbackup.main.utils.tasks import schedule_task_manager
+        schedule_task_manager()
@@ -0,0 +1,151 @@
+# Python
+import json
+import logging
+import time
+
+# Django
+from django.conf import settings
+
+# CyBorgBackup
+from cyborgbackup.main.utils.common import OutputEventFilter
+
+logger = logging.getLogger('cyborgbackup.main.utils.borg')
+
+__all__ = ['format_size', 'BorgOutputFilter']
+
+SIZE_UNITS = ('B', 'kB', 'MB', 'GB', 'TB', 'PB')
+
+LOG_LEVEL_EVENTS = {
+    'DEBUG': 'debug',
+    'WARNING': 'warning',
+    'ERROR': 'error',
+    'CRITICAL': 'error',
+}
+
+
+def format_size(size):
+    size = float(size)
+    for unit in SIZE_UNITS[:-1]:
+        if abs(size) < 1000:
+            return '{:.2f} {}'.format(size, unit)
+        size /= 1000
+    return '{:.2f} {}'.format(size, SIZE_UNITS[-1])
+
+
+class BorgOutputFilter(OutputEventFilter):
+    """
+    Output filter for borg commands run with --log-json, --progress and --json.
+
+    Log messages are turned into job events of the matching level, progress
+    messages into rate-limited progress events, and the final JSON document
+    of borg create into a short summary and the statistics of the job. Any
+    other output is kept as is.
+    """
+
+    def __init__(self, event_callback, parse_documents=True):
+        super().__init__(event_callback)
+        self.parse_documents = parse_documents
+        self.progress_interval = getattr(settings, 'CYBORGBACKUP_PROGRESS_INTERVAL', 5)
+        self.stats = {}
+        self._line_buffer = ''
+        self._document = None
+        self._last_progress = None
+
+    def write(self, data):
+        lines = (self._line_buffer + data).split('\n')
+        self._line_buffer = lines.pop()
+        for line in lines:
+            self.parse_line(line + '\n')
+
+    def close(self):
+        if self._line_buffer:
+            self.parse_line(self._line_buffer + '\r\n')
+            self._line_buffer = ''
+        if self._document:
+            self._emit_event(''.join(self._document))
+            self._document = None
+        super().close()
+
+    def emit(self, stdout, event='verbose', **event_data):
+        self._current_event_data = dict(event=event, event_data=event_data)
+        self._emit_event(stdout.rstrip('\r\n') + '\r\n')
+
+    def parse_line(self, line):
+        stripped = line.strip()
+        if self._document is not None:
+            self._document.append(line)
+            if line.startswith('}'):
+                self.parse_document()
+            return
+        if stripped == '{' and self.parse_documents:
+            self._document = [line]
+            return
+        if stripped.startswith('{') and stripped.endswith('}'):
+            try:
+                message = json.loads(stripped)
+            except ValueError:
+                message = None
+            if isinstance(message, dict) and 'type' in message:
+                self.parse_message(message)
+                return
+        self._emit_event(line)
+
+    def parse_message(self, message):
+        if message['type'] == 'log_message':
+            event = LOG_LEVEL_EVENTS.get(message.get('levelname'), 'verbose')
+            self.emit(message.get('message', ''), event=event)
+        elif message['type'] == 'archive_progress' and not message.get('finished'):
+            self.parse_progress(message)
+
+    def parse_progress(self, message):
+        now = message.get('time') or time.time()
+        original_size = message.get('original_size', 0)
+        if self._last_progress is not None and now - self._last_progress[0] < self.progress_interval:
+            return
+        throughput = 0
+        if self._last_progress is not None:
+            throughput = int((original_size - self._last_progress[1]) / (now - self._last_progress[0]))
+        self._last_progress = (now, original_size)
+        self.emit('Progress: {} processed, {} files, {}/s'.format(format_size(original_size),
+                                                                  message.get('nfiles', 0),
+                                                                  format_size(throughput)),
+                  event='progress',
+                  original_size=original_size,
+                  compressed_size=message.get('compressed_size', 0),
+                  deduplicated_size=message.get('deduplicated_size', 0),
+                  nfiles=message.get('nfiles', 0),
+                  throughput=throughput)
+
+    def parse_document(self):
+        lines, self._document = self._document, None
+        try:
+            document = json.loads(''.join(lines))
+        except ValueError:
+            document = None
+        if not isinstance(document, dict) or 'archive' not in document:
+            for line in lines:
+                self._emit_event(line)
+            return
+        archive = document.get('archive', {})
+        archive_stats = archive.get('stats', {})
+        cache_stats = document.get('cache', {}).get('stats', {})
+        if archive.get('name'):
+            self.stats['archive_name'] = archive['name']
+            self.emit('Archive name: {}'.format(archive['name']))
+        if 'duration' in archive:
+            self.stats['archive_duration'] = archive['duration']
+            self.emit('Duration: {:.2f} seconds'.format(archive['duration']))
+        if archive_stats:
+            self.stats['archive'] = dict(original_size=archive_stats.get('original_size', 0),
+                                         compressed_size=archive_stats.get('compressed_size', 0),
+                                         deduplicated_size=archive_stats.get('deduplicated_size', 0))
+            self.stats['archive_files'] = archive_stats.get('nfiles', 0)
+            self.emit('Number of files: {}'.format(self.stats['archive_files']))
+            self.emit('This archive: {}'.format(
+                ' '.join(format_size(size) for size in self.stats['archive'].values())))
+        if cache_stats:
+            self.stats['repository'] = dict(original_size=cache_stats.get('total_size', 0),
+                                            compressed_size=cache_stats.get('total_csize', 0),
+                                            deduplicated_size=cache_stats.get('unique_csize', 0))
+            self.emit('All archives: {}'.format(
+                ' '.join(format_size(size) for size in self.stats['repository'].values())))
@@ -0,0 +1,91 @@
+# Python
+import logging
+import time
+
+# Django
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+logger = logging.getLogger('cyborgbackup.main.utils.cache')
+
+__all__ = ['get_model_versions', 'bump_model_version', 'connect_model_versions']
+
+# Models the cached API responses depend on.
+VERSIONED_MODELS = ('main.Client', 'main.Policy', 'main.Repository', 'main.Schedule', 'main.User',
+                    'main.JobDailyStat')
+
+
+def get_model_version_key(model):
+    return 'cyborgbackup_model_version_{}'.format(model._meta.label_lower)
+
+
+def _new_version():
+    # Versions start from the current time, so a version lost with the cache
+    # is never reused by the next one.
+    return time.time_ns()
+
+
+def get_model_versions(models):
+    """
+    Return the current version of each of the given models, changed every
+    time one of their objects is saved or deleted.
+    """
+    keys = [get_model_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_model_version(model):
+    """
+    Change the version of a model, for the writes that bypass the model
+    signals such as QuerySet.update() and bulk_update().
+    """
+    key = get_model_version_key(model)
+    _incr_version(key)
+    # Within a transaction, content cached by other processes before the
+    # commit would still hold the old data, so change the version again.
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _incr_version(key))
+
+
+def _incr_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _new_version(), None)
+
+
+def bump_instance_model_version(sender, **kwargs):
+    bump_model_version(sender)
+
+
+def bump_related_models_version(sender, instance, action, model, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_model_version(instance.__class__)
+        bump_model_version(model)
+
+
+def connect_model_versions():
+    """
+    Connect the receivers bumping the versions of the models the cached API
+    responses depend on. They are only connected for these models: a
+    post_delete receiver prevents Django from deleting the objects of a
+    model in a single query.
+    """
+    for label in VERSIONED_MODELS:
+        model = apps.get_model(label)
+        post_save.connect(bump_instance_model_version, sender=model,
+                          dispatch_uid='bump_model_version_save_{}'.format(label))
+        post_delete.connect(bump_instance_model_version, sender=model,
+                            dispatch_uid='bump_model_version_delete_{}'.format(label))
+        for field in model._meta.local_many_to_many:
+            if field.related_model._meta.label in VERSIONED_MODELS:
+                through = field.remote_field.through
+                m2m_changed.connect(bump_related_models_version, sender=through,
+                                    dispatch_uid='bump_model_version_m2m_{}'.format(through._meta.label))
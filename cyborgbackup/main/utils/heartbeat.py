@@ -0,0 +1,101 @@
+# Python
+import logging
+
+# Celery
+from celery import bootsteps
+from celery.worker import state as worker_state
+# Django
+from django.conf import settings
+from django.db import close_old_connections, DatabaseError
+from django.utils.timezone import now as tz_now
+
+logger = logging.getLogger('cyborgbackup.main.utils.heartbeat')
+
+RUN_JOB_TASK = 'cyborgbackup.main.tasks.run_job'
+
+
+def get_job_queue():
+    """
+    Name of the queue the backup jobs are routed to.
+    """
+    route = getattr(settings, 'CELERY_ROUTES', {}).get(RUN_JOB_TASK, {})
+    return route.get('queue', getattr(settings, 'CELERY_DEFAULT_QUEUE', 'celery'))
+
+
+class Heartbeat(bootsteps.StartStopStep):
+    """
+    Worker bootstep publishing the worker capacity and the celery task ids
+    of the jobs it is running, so the task manager never has to broadcast
+    inspect requests to the workers. Only the workers consuming the backup
+    jobs queue publish a heartbeat, the others are not execution nodes.
+    """
+    requires = {'celery.worker.components:Timer'}
+
+    def __init__(self, worker, **kwargs):
+        super().__init__(worker, **kwargs)
+        self.tref = None
+        self.running_jobs = None
+        self.registered = False
+        self.interval = getattr(settings, 'CYBORGBACKUP_HEARTBEAT_INTERVAL', 10)
+
+    def include_if(self, worker):
+        return get_job_queue() in worker.app.amqp.queues.consume_from
+
+    def start(self, worker):
+        self.registered = False
+        self.publish(worker)
+        self.tref = worker.timer.call_repeatedly(self.interval, self.publish, (worker,), priority=10)
+
+    def stop(self, worker):
+        if self.tref is not None:
+            self.tref.cancel()
+            self.tref = None
+        self.unregister(worker)
+
+    def get_running_jobs(self):
+        return sorted(req.id for req in worker_state.active_requests if req.name == RUN_JOB_TASK)
+
+    def publish(self, worker):
+        from cyborgbackup.main.models.instances import Instance
+        from cyborgbackup.main.utils.tasks import schedule_task_manager
+        close_old_connections()
+        running_jobs = self.get_running_jobs()
+        try:
+            instance, created = Instance.objects.update_or_create(hostname=worker.hostname, defaults={
+                'capacity': worker.concurrency,
+                'queues': sorted(worker.app.amqp.queues.consume_from),
+                'networks': getattr(settings, 'CYBORGBACKUP_NODE_NETWORKS', []),
+                'running_jobs': running_jobs,
+                'last_heartbeat': tz_now(),
+            })
+        except DatabaseError:
+            logger.exception('Failed to publish heartbeat for %s', worker.hostname)
+            return
+        # The instance is recreated when the task manager cleaned it up as dead.
+        if created or not self.registered:
+            self.register(instance)
+        # Wake up the task manager when capacity is added or freed.
+        if created or (self.running_jobs is not None and len(running_jobs) < len(self.running_jobs)):
+            schedule_task_manager()
+        self.running_jobs = running_jobs
+
+    def register(self, instance):
+        """
+        Record the repositories this node is dedicated to.
+        """
+        from cyborgbackup.main.models.repositories import Repository
+        try:
+            instance.repositories.set(Repository.objects.filter(
+                name__in=getattr(settings, 'CYBORGBACKUP_NODE_REPOSITORIES', [])))
+        except DatabaseError:
+            logger.exception('Failed to register %s', instance.hostname)
+            return
+        self.registered = True
+
+    def unregister(self, worker):
+        from cyborgbackup.main.models.instances import Instance
+        close_old_connections()
+        try:
+            Instance.objects.filter(hostname=worker.hostname).delete()
+        except DatabaseError:
+            logger.exception('Failed to unregister %s', worker.hostname)
@@ -0,0 +1,97 @@
+# Python
+import html
+import logging
+import re
+import time
+
+import ansiconv
+# Django
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete
+
+# CyBorgBackup
+from cyborgbackup.main.constants import ACTIVE_STATES
+from cyborgbackup.main.models.jobs import Job, StdoutMaxBytesExceeded, STDOUT_MAX_BYTES_DISPLAY
+
+logger = logging.getLogger('cyborgbackup.main.utils.stdout')
+
+__all__ = ['connect_stdout_cache', 'get_stdout_cache_version', 'render_stdout']
+
+EVENT_DATA_RE = re.compile(r'\x1b\[K(?:[A-Za-z0-9+/=]+\x1b\[\d+D)+\x1b\[K')
+
+
+def get_stdout_cache_version_key(job_id):
+    return 'cyborgbackup_job_stdout_cache_version_{}'.format(job_id)
+
+
+def get_stdout_cache_timeout():
+    return getattr(settings, 'CYBORGBACKUP_STDOUT_CACHE_TIMEOUT', 3600)
+
+
+def get_stdout_cache_version(job_id):
+    """
+    Return the version of the rendered stdout of a job in the shared cache,
+    dropped when the job is deleted so a reused identifier gets a new one.
+    """
+    key = get_stdout_cache_version_key(job_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), get_stdout_cache_timeout())
+        version = cache.get(key)
+    return version
+
+
+def invalidate_job_stdout(sender, instance, **kwargs):
+    cache.delete(get_stdout_cache_version_key(instance.pk))
+
+
+def connect_stdout_cache():
+    """
+    Connect the receiver dropping the cached stdout of the deleted jobs.
+    """
+    post_delete.connect(invalidate_job_stdout, sender=Job, dispatch_uid='invalidate_job_stdout')
+
+
+def _render_lines(job, start, end, content_format):
+    content = EVENT_DATA_RE.sub('', ''.join(job.iter_stdout_lines(start, end)))
+    if content_format == 'html':
+        return len(content), ansiconv.to_html(html.escape(content, quote=False))
+    return len(content), job._escape_ascii(content)
+
+
+def render_stdout(job, start, end, content_format='html'):
+    """
+    Render the stdout lines of a job between start and end, as HTML or plain
+    text, by blocks of CYBORGBACKUP_STDOUT_RENDER_BLOCK_LINES lines. Blocks of
+    finished jobs whose events are all saved are kept in the shared cache for
+    CYBORGBACKUP_STDOUT_CACHE_TIMEOUT seconds.
+
+    Raise StdoutMaxBytesExceeded when the range is larger than
+    STDOUT_MAX_BYTES_DISPLAY characters.
+    """
+    block_lines = getattr(settings, 'CYBORGBACKUP_STDOUT_RENDER_BLOCK_LINES', 1000)
+    ranges = [(max(start, block_start), min(end, block_start + block_lines))
+              for block_start in range(start - start % block_lines, end, block_lines)]
+    keys = {}
+    cached = {}
+    cacheable = job.status not in ACTIVE_STATES and job.event_processing_finished
+    if cacheable:
+        prefix = 'cyborgbackup_job_stdout_{}_{}_{}'.format(job.pk, get_stdout_cache_version(job.pk), content_format)
+        keys = {block_range: '{}_{}_{}'.format(prefix, *block_range) for block_range in ranges}
+        cached = cache.get_many(keys.values())
+    rendered = {}
+    total = 0
+    chunks = []
+    for block_range in ranges:
+        value = cached.get(keys.get(block_range))
+        if value is None:
+            value = rendered[block_range] = _render_lines(job, *block_range, content_format)
+        total += value[0]
+        if total > STDOUT_MAX_BYTES_DISPLAY:
+            raise StdoutMaxBytesExceeded(job.get_stdout_size(start, end), STDOUT_MAX_BYTES_DISPLAY)
+        chunks.append(value[1])
+    if keys and rendered:
+        cache.set_many({keys[block_range]: value for block_range, value in rendered.items()},
+                       get_stdout_cache_timeout())
+    return ''.join(chunks)
@@ -1,29 +1,27 @@
 # Python
 import logging
 import uuid
+from collections import Counter, defaultdict
 from contextlib import contextmanager
-from datetime import datetime, timedelta
+from datetime import timedelta
 
-import pytz
-# Celery
-from celery import Celery
-from celery.app.control import Inspect
-# Celery
 # Django
 from django.conf import settings
 from django.core.cache import cache
 from django.db import transaction, connection, DatabaseError
-from django.db.models import Q
+from django.db.models import Avg, Q
 from django.utils.timezone import now as tz_now
 from django_pglocks import advisory_lock as django_pglocks_advisory_lock
 
 from cyborgbackup.main.models.clients import Client
 # CyBorgBackup
+from cyborgbackup.main.models.instances import Instance
 from cyborgbackup.main.models.jobs import (
     Job,
 )
 from cyborgbackup.main.models.repositories import Repository
 from cyborgbackup.main.utils.common import get_type_for_model, load_module_provider
+from cyborgbackup.main.utils.heartbeat import get_job_queue
 
 logger = logging.getLogger('cyborgbackup.main.scheduler')
 
@@ -62,7 +60,89 @@ class DependencyGraph(object):
             self.mark_job(job)
 
     def add_jobs(self, jobs):
-        map(lambda j: self.add_job(j), jobs)
+        for j in jobs:
+            self.add_job(j)
+
+
+class JobSnapshot(object):
+    """
+    In-memory view of the unfinished jobs, loaded once per scheduler cycle.
+
+    Blocking checks are answered from the indexes below instead of issuing
+    COUNT queries for every pending task; the indexes are kept up to date
+    as the scheduler starts or creates jobs during the same cycle.
+    """
+    ACTIVE_STATUS = ('starting', 'running')
+    UNFINISHED_STATUS = ('new', 'pending', 'waiting', 'starting', 'running')
+
+    def __init__(self):
+        self.jobs = {}
+        self.active_by_repository = defaultdict(set)
+        self.active_by_client = defaultdict(set)
+        self.unfinished_by_dependent = defaultdict(set)
+        self.checks_by_repository = defaultdict(set)
+        self.checks_by_client = defaultdict(set)
+        self.bandwidth_by_job = {}
+
+    def load(self):
+        jobs = Job.objects.filter(status__in=self.UNFINISHED_STATUS).select_related(
+            'policy', 'policy__repository', 'client', 'repository')
+        for job in jobs:
+            self.add(job)
+        return self
+
+    def add(self, job):
+        self.discard(job)
+        self.jobs[job.id] = job
+        if job.status in self.ACTIVE_STATUS:
+            if job.repository_id:
+                self.active_by_repository[job.repository_id].add(job.id)
+            if job.client_id:
+                self.active_by_client[job.client_id].add(job.id)
+                if job.job_type == 'job' and job.client.bandwidth_limit:
+                    self.bandwidth_by_job[job.id] = job.client.bandwidth_limit
+        if job.status in self.UNFINISHED_STATUS:
+            if job.dependent_jobs_id:
+                self.unfinished_by_dependent[job.dependent_jobs_id].add(job.id)
+            if job.job_type == 'check':
+                if job.repository_id:
+                    self.checks_by_repository[job.repository_id].add(job.id)
+                if job.client_id:
+                    self.checks_by_client[job.client_id].add(job.id)
+
+    def discard(self, job):
+        self.jobs.pop(job.id, None)
+        self.bandwidth_by_job.pop(job.id, None)
+        for index in (self.active_by_repository, self.active_by_client, self.unfinished_by_dependent,
+                      self.checks_by_repository, self.checks_by_client):
+            for job_ids in index.values():
+                job_ids.discard(job.id)
+
+    def get_tasks(self, status_list):
+        return [j for j in self.jobs.values() if j.status in status_list]
+
+    def dependent_jobs_finished(self, job):
+        return not self.unfinished_by_dependent.get(job.id)
+
+    def repository_is_busy(self, repository_id):
+        return bool(self.active_by_repository.get(repository_id))
+
+    def client_is_busy(self, client_id):
+        return bool(self.active_by_client.get(client_id))
+
+    def bandwidth_in_use(self):
+        return sum(self.bandwidth_by_job.values())
+
+    def _latest(self, job_ids):
+        if not job_ids:
+            return None
+        return max((self.jobs[pk] for pk in job_ids), key=lambda j: j.created)
+
+    def latest_repository_check(self, repository_id):
+        return self._latest(self.checks_by_repository.get(repository_id))
+
+    def latest_client_check(self, client_id):
+        return self._latest(self.checks_by_client.get(client_id))
 
 
 class TaskManager:
@@ -70,117 +150,144 @@ class TaskManager:
     def __init__(self):
         self.graph = dict()
         self.graph['cyborgbackup'] = dict(graph=DependencyGraph('cyborgbackup'),
-                                          capacity_total=16,
+                                          capacity_total=0,
                                           consumed_capacity=0)
+        self.snapshot = JobSnapshot()
+        self.instances = []
+        self.node_load = Counter()
 
     def is_job_blocked(self, task):
         for g in self.graph:
             if self.graph[g]['graph'].is_job_blocked(task):
                 return True
 
-        if not task.dependent_jobs_finished():
+        if not self.snapshot.dependent_jobs_finished(task):
             return True
 
-        same_repo_jobs_count = Job.objects.filter(repository=task.policy.repository.pk,
-                                                  status__in=('starting', 'running',)).count()
-        same_client_jobs_count = Job.objects.filter(client=task.client.pk, status__in=('starting', 'running',)).count()
-
-        logger.info('Found %d jobs with same repository that task %s.', same_repo_jobs_count, task.log_format)
-        logger.info('Found %d jobs with same client that task %s.', same_client_jobs_count, task.log_format)
+        if self.snapshot.repository_is_busy(task.policy.repository_id):
+            logger.info('Found jobs with same repository that task %s.', task.log_format)
+            return True
 
-        if same_repo_jobs_count > 0:
+        if task.client_id and self.snapshot.client_is_busy(task.client_id):
+            logger.info('Found jobs with same client that task %s.', task.log_format)
             return True
 
-        if task.client and same_client_jobs_count > 0:
+        if self.is_over_bandwidth_budget(task):
+            logger.info('Bandwidth budget exhausted for task %s.', task.log_format)
             return True
 
         return False
 
+    def is_over_bandwidth_budget(self, task):
+        budget = getattr(settings, 'CYBORGBACKUP_BANDWIDTH_BUDGET', 0)
+        if not budget or task.job_type != 'job' or not task.client_id or not task.client.bandwidth_limit:
+            return False
+        in_use = self.snapshot.bandwidth_in_use()
+        # Always let a job start alone, even above the budget.
+        return in_use > 0 and in_use + task.client.bandwidth_limit > budget
+
+    def is_released(self, task, now):
+        """
+        Jobs of a policy with a start window are released progressively.
+        """
+        return task.start_after is None or task.start_after <= now
+
+    def get_expected_durations(self, tasks):
+        """
+        Average elapsed time of the recent successful runs, per policy,
+        client and job type.
+        """
+        policies = set(task.policy_id for task in tasks if task.policy_id)
+        if not policies:
+            return {}
+        history = Job.objects.filter(
+            policy__in=policies,
+            status='successful',
+            finished__gte=tz_now() - timedelta(days=getattr(settings, 'CYBORGBACKUP_EXPECTED_DURATION_DAYS', 30))
+        ).values('policy_id', 'client_id', 'job_type').annotate(expected=Avg('elapsed'))
+        return {(h['policy_id'], h['client_id'], h['job_type']): float(h['expected'] or 0) for h in history}
+
+    def prioritize(self, tasks):
+        """
+        Order the pending tasks by priority, then round robin across
+        repositories and clients already busy or ahead in the queue (fair
+        share), then by least slack before their backup window deadline,
+        longest expected duration and release date.
+        """
+        now = tz_now()
+        durations = self.get_expected_durations(tasks)
+        repository_share = Counter({k: len(v) for k, v in self.snapshot.active_by_repository.items()})
+        client_share = Counter({k: len(v) for k, v in self.snapshot.active_by_client.items()})
+        keys = {}
+        for task in sorted(tasks, key=lambda t: t.created):
+            repository_id = task.policy.repository_id if task.policy_id else task.repository_id
+            share = max(repository_share[repository_id], client_share[task.client_id] if task.client_id else 0)
+            repository_share[repository_id] += 1
+            if task.client_id:
+                client_share[task.client_id] += 1
+            expected = durations.get((task.policy_id, task.client_id, task.job_type), 0)
+            if task.deadline:
+                slack = (task.deadline - now).total_seconds() - expected
+            else:
+                slack = float('inf')
+            keys[task.id] = (-task.priority, share, slack, -expected, task.start_after or task.created)
+        return sorted(tasks, key=lambda t: keys[t.id])
+
     def get_tasks(self, status_list=('pending', 'waiting', 'running')):
-        jobs = [j for j in Job.objects.filter(status__in=status_list)]
+        self.snapshot = JobSnapshot().load()
+        jobs = self.snapshot.get_tasks(status_list)
         return sorted(jobs, key=lambda task: task.created)
 
-    '''
-    Tasks that are running and SHOULD have a celery task.
-    {
-        'execution_node': [j1, j2,...],
-        'execution_node': [j3],
-        ...
-    }
-    '''
-
     def get_running_tasks(self):
-        execution_nodes = {}
-        waiting_jobs = []
-        now = tz_now()
-        jobs = Job.objects.filter((Q(status='running') |
-                                   Q(status='waiting',
-                                     modified__lte=now - timedelta(seconds=60))))
-        for j in jobs:
-            waiting_jobs.append(j)
-        return execution_nodes, waiting_jobs
-
-    '''
-    Tasks that are currently running in celery
-
-    Transform:
-    {
-        "celery@ec2-54-204-222-62.compute-1.amazonaws.com": [],
-        "celery@ec2-54-163-144-168.compute-1.amazonaws.com": [{
-            ...
-            "id": "5238466a-f8c7-43b3-9180-5b78e9da8304",
-            ...
-        }, {
-            ...,
-        }, ...]
-    }
-
-    to:
-    {
-        "ec2-54-204-222-62.compute-1.amazonaws.com": [
-            "5238466a-f8c7-43b3-9180-5b78e9da8304",
-            "5238466a-f8c7-43b3-9180-5b78e9da8306",
-            ...
-        ]
-    }
-    '''
+        """
+        Tasks that are running and SHOULD have a celery task.
+        """
+        return Job.objects.filter(status='running')
 
     def get_active_tasks(self):
-        max_concurrency_queues = []
-        if not hasattr(settings, 'IGNORE_CELERY_INSPECTOR') or not getattr(settings, 'IGNORE_CELERY_INSPECTOR'):
-            app = Celery('cyborgbackup')
-            app.config_from_object('django.conf:settings')
-            inspector = Inspect(app=app)
-            active_task_queues = inspector.active()
-            max_concurrency_queues = inspector.stats()
-        else:
-            logger.warning("Ignoring celery task inspector")
-            active_task_queues = None
-
-        queues = None
-        concurrencies = None
-        if active_task_queues is not None:
-            queues = []
-            concurrencies = ()
-            for queue in active_task_queues:
-                if 'worker-job' in queue:
-                    active_tasks = set()
-                    map(lambda at: active_tasks.add(at['id']), active_task_queues[queue])
-
-                    max_concurrency = max_concurrency_queues[queue]['pool']['max-concurrency']
-
-                    # celery worker name is of the form celery@myhost.com
-                    queue_name = queue.split('@')
-                    queue_name = queue_name[1 if len(queue_name) > 1 else 0]
-                    queues = active_tasks
-                    concurrencies = (max_concurrency, len(active_tasks))
-        else:
-            if not hasattr(settings, 'CELERY_UNIT_TEST'):
-                return None, None
-
-        return active_task_queues, queues, concurrencies
+        """
+        Live execution nodes and the celery task ids they are currently
+        running, as published by the worker heartbeats.
+        """
+        instances = list(Instance.objects.alive())
+        active_tasks = set()
+        for instance in instances:
+            active_tasks.update(instance.running_jobs)
+        return instances, active_tasks
+
+    def update_capacity(self):
+        # Only the workers consuming the backup jobs queue are execution nodes.
+        job_queue = get_job_queue()
+        self.instances = [instance for instance in Instance.objects.alive().prefetch_related('repositories')
+                          if job_queue in instance.queues]
+        active_tasks = self.snapshot.get_tasks(JobSnapshot.ACTIVE_STATUS)
+        self.node_load = Counter(task.execution_node for task in active_tasks if task.execution_node)
+        self.graph['cyborgbackup']['capacity_total'] = sum(instance.capacity for instance in self.instances)
+        self.graph['cyborgbackup']['consumed_capacity'] = len(active_tasks)
+
+    def has_capacity(self):
+        graph = self.graph['cyborgbackup']
+        return graph['consumed_capacity'] < graph['capacity_total']
+
+    def select_execution_node(self, task):
+        """
+        Live node with free capacity and the best locality for the task,
+        the least loaded first.
+        """
+        selected = None
+        for instance in self.instances:
+            load = self.node_load[instance.hostname]
+            if load >= instance.capacity:
+                continue
+            affinity = instance.get_affinity(task)
+            if affinity is None:
+                continue
+            key = (-affinity, float(load) / instance.capacity)
+            if selected is None or key < selected[0]:
+                selected = (key, instance)
+        return selected[1] if selected else None
 
-    def start_task(self, task, dependent_tasks=None):
+    def start_task(self, task, dependent_tasks=None, execution_node=None):
         if dependent_tasks is None:
             dependent_tasks = []
         from cyborgbackup.main.tasks.shared import handle_work_error, handle_work_success
@@ -204,9 +311,14 @@ class TaskManager:
             task.save()
             # TODO: run error handler to fail sub-tasks and send notifications
         else:
-            logger.info('Submitting %s to instance group cyborgbackup.', task.log_format)
+            logger.info('Submitting %s to execution node %s.', task.log_format, execution_node)
             task.celery_task_id = str(uuid.uuid4())
+            if execution_node is not None:
+                task.execution_node = execution_node.hostname
+                self.node_load[execution_node.hostname] += 1
             task.save()
+            self.graph['cyborgbackup']['consumed_capacity'] += 1
+        self.snapshot.add(task)
 
         def post_commit():
             task.websocket_emit_status(task.status)
@@ -223,9 +335,12 @@ class TaskManager:
             if not self.is_job_blocked(task):
                 task.status = 'pending'
                 task.save()
-        map(lambda task: self.graph['cyborgbackup']['graph'].add_job(task), running_tasks)
+        self.graph['cyborgbackup']['graph'].add_jobs(running_tasks)
 
     def get_latest_repository_creation(self, job):
+        latest_repository_check = self.snapshot.latest_repository_check(job.policy.repository_id)
+        if latest_repository_check is not None:
+            return latest_repository_check
         latest_repository_creation = Job.objects.filter(repository=job.policy.repository_id,
                                                         job_type='check').order_by("-created")
         if not latest_repository_creation.exists():
@@ -242,13 +357,14 @@ class TaskManager:
         repository_task.policy = task.policy
         repository_task.dependent_jobs = task
         repository_task.save()
+        self.snapshot.add(repository_task)
         return repository_task
 
     def should_prepare_repository(self, latest_prepare_repository):
         if latest_prepare_repository is None:
             return True
 
-        if latest_prepare_repository.status in ['waiting', 'pending', 'running']:
+        if latest_prepare_repository.status in ['waiting', 'pending', 'starting', 'running']:
             return False
 
         if not latest_prepare_repository.repository.ready:
@@ -266,6 +382,7 @@ class TaskManager:
         client_task.policy = task.policy
         client_task.dependent_jobs = task
         client_task.save()
+        self.snapshot.add(client_task)
         return client_task
 
     def should_prepare_client(self, latest_prepare_client, client):
@@ -277,7 +394,7 @@ class TaskManager:
         if latest_prepare_client is None:
             return True
 
-        if latest_prepare_client.status in ['waiting', 'pending', 'running']:
+        if latest_prepare_client.status in ['waiting', 'pending', 'starting', 'running']:
             return False
 
         if not latest_prepare_client.client.ready:
@@ -286,6 +403,9 @@ class TaskManager:
         return False
 
     def get_latest_client_preparation(self, job):
+        latest_client_check = self.snapshot.latest_client_check(job.client_id)
+        if latest_client_check is not None:
+            return latest_client_check
         latest_client_preparation = Job.objects.filter(client=job.client_id, job_type='check').order_by("-created")
         if not latest_client_preparation.exists():
             return None
@@ -301,13 +421,14 @@ class TaskManager:
         client_task.policy = task.policy
         client_task.dependent_jobs = task
         client_task.save()
+        self.snapshot.add(client_task)
         return client_task
 
     def should_prepare_hypervisor(self, latest_prepare_hypervisor):
         if latest_prepare_hypervisor is None:
             return True
 
-        if latest_prepare_hypervisor.status in ['waiting', 'pending', 'running']:
+        if latest_prepare_hypervisor.status in ['waiting', 'pending', 'starting', 'running']:
             return False
 
         if not latest_prepare_hypervisor.client.hypervisor_ready:
@@ -335,7 +456,7 @@ class TaskManager:
                 repository_task = self.create_prepare_repository(task)
                 dependencies.append(repository_task)
             else:
-                if latest_repository_creation.status in ['waiting', 'pending', 'running']:
+                if latest_repository_creation.status in ['waiting', 'pending', 'starting', 'running']:
                     dependencies.append(latest_repository_creation)
 
             if task.client:
@@ -345,7 +466,7 @@ class TaskManager:
                         hypervisor_task = self.create_prepare_hypervisor(task)
                         dependencies.append(hypervisor_task)
                     else:
-                        if latest_hypervisor_preparation.status in ['waiting', 'pending', 'running']:
+                        if latest_hypervisor_preparation.status in ['waiting', 'pending', 'starting', 'running']:
                             dependencies.append(latest_hypervisor_preparation)
                 else:
                     latest_client_preparation = self.get_latest_client_preparation(task)
@@ -353,7 +474,7 @@ class TaskManager:
                         client_task = self.create_prepare_client(task)
                         dependencies.append(client_task)
                     else:
-                        if latest_client_preparation.status in ['waiting', 'pending', 'running']:
+                        if latest_client_preparation.status in ['waiting', 'pending', 'starting', 'running']:
                             dependencies.append(latest_client_preparation)
 
         return dependencies
@@ -363,27 +484,35 @@ class TaskManager:
             if self.is_job_blocked(task):
                 logger.debug(str("Dependent {} is blocked from running").format(task.log_format))
                 continue
-            msg = str("Starting dependent {} in group {}")
-            logger.debug(msg.format(task.log_format, 'cyborgbackup'))
+            execution_node = self.select_execution_node(task)
+            if execution_node is None:
+                logger.debug(str("No execution node available to start dependent {}").format(task.log_format))
+                continue
+            msg = str("Starting dependent {} on {}")
+            logger.debug(msg.format(task.log_format, execution_node.hostname))
             self.graph['cyborgbackup']['graph'].add_job(task)
             tasks_to_fail = list(filter(lambda t: t != task, dependency_tasks))
             tasks_to_fail += [dependent_task]
-            self.start_task(task, tasks_to_fail)
+            self.start_task(task, tasks_to_fail, execution_node)
 
     def process_pending_tasks(self, pending_tasks):
-        _, _, concurrencies = self.get_active_tasks()
-        i = 0
+        self.update_capacity()
         for task in pending_tasks:
+            if not self.has_capacity():
+                logger.debug("No capacity left, %(consumed_capacity)d/%(capacity_total)d slots used.",
+                             self.graph['cyborgbackup'])
+                break
             self.process_dependencies(task, self.generate_dependencies(task))
             if self.is_job_blocked(task):
                 logger.debug(str("{} is blocked from running").format(task.log_format))
                 continue
+            execution_node = self.select_execution_node(task)
+            if execution_node is None:
+                logger.debug(str("No execution node available to start {}").format(task.log_format))
+                continue
 
             self.graph['cyborgbackup']['graph'].add_job(task)
-            self.start_task(task, [])
-            i += 1
-            if (concurrencies[1] + i) == concurrencies[0]:
-                break
+            self.start_task(task, [], execution_node)
 
     def fail_jobs_if_not_in_celery(self, node_jobs, active_tasks, celery_task_start_time,
                                    isolated=False):
@@ -419,68 +548,92 @@ class TaskManager:
         """
         Rectify cyborgbackup db <-> celery inconsistent view of jobs state
         """
-        last_cleanup = cache.get('last_celery_task_cleanup') or datetime.min.replace(tzinfo=pytz.UTC)
-        if (tz_now() - last_cleanup).seconds < 60 * 3:
+        if getattr(settings, 'IGNORE_CELERY_INSPECTOR', False):
             return
 
-        logger.debug("Failing inconsistent running jobs.")
-        celery_task_start_time = tz_now()
-        active_task_queues, active_queues, _ = self.get_active_tasks()
-        cache.set('last_celery_task_cleanup', tz_now())
-
-        if active_queues is None:
-            logger.error('Failed to retrieve active tasks from celery')
+        for instance in Instance.objects.dead():
+            logger.error("Execution node {} missed its heartbeats since {}. "
+                         "The node was executing jobs {}".format(instance.hostname,
+                                                                 instance.last_heartbeat,
+                                                                 instance.running_jobs))
+            node_jobs = self.get_running_tasks().filter(
+                Q(celery_task_id__in=instance.running_jobs) | Q(execution_node=instance.hostname))
+            self.fail_jobs_if_not_in_celery(node_jobs, [], tz_now())
+            instance.delete()
+
+        instances, active_tasks = self.get_active_tasks()
+        if not instances:
+            logger.warning('No live execution node found')
             return None
 
-        '''
-        Only consider failing tasks on instances for which we obtained a task
-        list from celery for.
-        '''
-        running_tasks, waiting_tasks = self.get_running_tasks()
-        all_celery_task_ids = []
-        all_celery_task_ids.extend(active_queues)
-
-        # self.fail_jobs_if_not_in_celery(waiting_tasks, all_celery_task_ids, celery_task_start_time)
-
-        for node, node_jobs in running_tasks.items():
-            isolated = False
-            if node in active_queues:
-                active_tasks = active_queues[node]
-            else:
-                if node is None:
-                    logger.error("Execution node Instance {} not found in database. "
-                                 "The node is currently executing jobs {}".format(
-                        node, [j.log_format for j in node_jobs]))
-                    active_tasks = []
-                else:
-                    continue
+        # Only jobs updated before the oldest heartbeat are expected to be
+        # reported by the execution nodes.
+        celery_task_start_time = min(instance.last_heartbeat for instance in instances)
+        logger.debug("Failing inconsistent running jobs.")
+        self.fail_jobs_if_not_in_celery(self.get_running_tasks(), active_tasks, celery_task_start_time)
 
-            self.fail_jobs_if_not_in_celery(
-                node_jobs, active_tasks, celery_task_start_time,
-                isolated=isolated
-            )
+    def get_affected_scope(self, since):
+        """
+        Repositories and clients touched by the jobs created, updated or
+        finished since the previous pass, or None when a job finished and
+        the freed capacity may benefit any pending job.
+        """
+        changed_jobs = Job.objects.filter(
+            Q(modified__gte=since) | Q(finished__gte=since)
+        ).values_list('status', 'repository_id', 'client_id', 'policy__repository_id')
+        repositories = set()
+        clients = set()
+        for status, repository_id, client_id, policy_repository_id in changed_jobs:
+            if status not in JobSnapshot.UNFINISHED_STATUS:
+                return None
+            repositories.update((repository_id, policy_repository_id))
+            clients.add(client_id)
+        repositories.discard(None)
+        clients.discard(None)
+        return repositories, clients
+
+    def is_in_scope(self, task, scope):
+        repositories, clients = scope
+        if task.repository_id in repositories or task.client_id in clients:
+            return True
+        return task.policy_id is not None and task.policy.repository_id in repositories
 
-    def process_tasks(self, all_sorted_tasks):
-        running_tasks = filter(lambda t: t.status in ['waiting', 'running'], all_sorted_tasks)
+    def process_tasks(self, all_sorted_tasks, scope=None):
+        running_tasks = list(filter(lambda t: t.status in ['waiting', 'running'], all_sorted_tasks))
 
         self.process_running_tasks(running_tasks)
 
-        pending_tasks = filter(lambda t: t.status in 'pending', all_sorted_tasks)
-        self.process_pending_tasks(pending_tasks)
-
-    def _schedule(self):
+        now = tz_now()
+        pending_tasks = filter(lambda t: t.status in 'pending' and self.is_released(t, now), all_sorted_tasks)
+        if scope is not None:
+            pending_tasks = filter(lambda t: self.is_in_scope(t, scope), pending_tasks)
+        self.process_pending_tasks(self.prioritize(list(pending_tasks)))
+
+    def _schedule(self, scoped=False):
+        started = tz_now()
+        last_run = cache.get('task_manager_last_run')
+        scope = None
+        if scoped and last_run is not None:
+            scope = self.get_affected_scope(last_run)
         all_sorted_tasks = self.get_tasks()
         if len(all_sorted_tasks) > 0:
-            self.process_tasks(all_sorted_tasks)
+            self.process_tasks(all_sorted_tasks, scope)
+        cache.set('task_manager_last_run', started)
 
-    def schedule(self):
+    def schedule(self, scoped=False):
+        """
+        Run a task manager pass. A scoped pass only re-evaluates the pending
+        jobs of the repositories and clients affected since the previous one.
+        Returns False when another pass already holds the lock.
+        """
         with transaction.atomic():
             # Lock
             with advisory_lock('task_manager_lock', wait=False) as acquired:
                 if acquired is False:
                     logger.debug("Not running scheduler, another task holds lock")
-                    return
+                    return False
                 logger.debug("Starting Scheduler")
 
                 self.cleanup_inconsistent_celery_tasks()
-                self._schedule()
+                self._schedule(scoped)
+        return True
@@ -5,6 +5,8 @@ import pymongo
 # Celery
 from celery import Task, shared_task, current_app
 from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
 
 # CyBorgBackup
 from cyborgbackup.main.utils.task_manager import TaskManager
@@ -33,17 +35,40 @@ def celery_worker_is_running():
         return False
 
 
+TASK_MANAGER_WAKEUP_KEY = 'task_manager_wakeup'
+
+
+def schedule_task_manager():
+    """
+    Wake up the task manager after a job has been created, finished or
+    canceled, or when capacity has been freed. Wake-ups received before the
+    queued pass starts are coalesced into it. Nothing is queued when the
+    transaction is rolled back.
+    """
+    debounce = getattr(settings, 'CYBORGBACKUP_TASK_MANAGER_DEBOUNCE', 2)
+
+    def wakeup():
+        if cache.add(TASK_MANAGER_WAKEUP_KEY, True, timeout=debounce + 60):
+            run_task_manager.apply_async(kwargs={'wakeup': True}, countdown=debounce)
+
+    connection.on_commit(wakeup)
+
+
 @shared_task(base=LogErrorsTask)
 def run_job_launch(job_id):
-    TaskManager().schedule()
+    schedule_task_manager()
 
 
 @shared_task(base=LogErrorsTask)
 def run_job_complete(job_id):
-    TaskManager().schedule()
+    schedule_task_manager()
 
 
 @shared_task(base=LogErrorsTask)
-def run_task_manager():
+def run_task_manager(wakeup=False):
     logger.debug("Running CyBorgBackup task manager.")
-    TaskManager().schedule()
+    if wakeup:
+        cache.delete(TASK_MANAGER_WAKEUP_KEY)
+    if not TaskManager().schedule(scoped=wakeup) and wakeup:
+        # Another pass holds the lock and may have missed this wake-up.
+        schedule_task_manager()
@@ -199,6 +199,11 @@ if os.environ.get('COVERAGE_RUN', None):
             'PATH': '../db.sqlite'
         }
     }
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
 else:
     DATABASES = {
         'default': {
@@ -210,6 +215,15 @@ else:
             'PORT': os.environ.get('POSTGRES_PORT', 5432),
         }
     }
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': "redis://{}:{}/{}".format(
+                os.environ.get("REDIS_HOST", "127.0.0.1"),
+                os.environ.get("REDIS_PORT", "6379"),
+                "2"),
+        }
+    }
 
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'cyborgbackup.api.pagination.Pagination',
@@ -381,6 +395,50 @@ USE_CALLBACK_QUEUE = True
 CALLBACK_QUEUE = "callback_tasks"
 
 IGNORE_CELERY_INSPECTOR = False
+# Interval in seconds between two worker heartbeats and delay after which a
+# worker without heartbeat is considered dead.
+CYBORGBACKUP_HEARTBEAT_INTERVAL = 10
+CYBORGBACKUP_HEARTBEAT_GRACE = 30
+# Repositories (names) and client networks (CIDR) the local worker is
+# dedicated to, comma separated. Empty to run every job.
+CYBORGBACKUP_NODE_REPOSITORIES = [x for x in os.environ.get('CYBORGBACKUP_NODE_REPOSITORIES', '').split(',') if x]
+CYBORGBACKUP_NODE_NETWORKS = [x for x in os.environ.get('CYBORGBACKUP_NODE_NETWORKS', '').split(',') if x]
+# Delay in seconds used to coalesce task manager wake-ups in a single pass.
+CYBORGBACKUP_TASK_MANAGER_DEBOUNCE = 2
+# Number of days of job history used to estimate the expected job durations.
+CYBORGBACKUP_EXPECTED_DURATION_DAYS = 30
+# Maximum sum of the bandwidth limits (kB/s) of the clients being backed up
+# at the same time. Clients without bandwidth limit are not accounted.
+# 0 to disable.
+CYBORGBACKUP_BANDWIDTH_BUDGET = int(os.environ.get('CYBORGBACKUP_BANDWIDTH_BUDGET', 0))
+# Minimum interval in seconds between two progress events of a backup job.
+CYBORGBACKUP_PROGRESS_INTERVAL = 5
+# Number of first, last and error lines of the job output included in the
+# notification sent after a backup.
+CYBORGBACKUP_NOTIFICATION_HEAD_LINES = 50
+CYBORGBACKUP_NOTIFICATION_TAIL_LINES = 50
+CYBORGBACKUP_NOTIFICATION_ERROR_LINES = 50
+# Number of days after which the repository size history is kept weekly
+# instead of daily, and number of days of history used for the forecasts.
+CYBORGBACKUP_SIZE_HISTORY_DAILY_DAYS = 90
+CYBORGBACKUP_FORECAST_DAYS = 30
+# Delay in seconds after the end of a job before its output is compacted in
+# compressed blocks of lines, delay after which it is compacted even if some
+# of its events are missing, and number of jobs compacted at each run.
+CYBORGBACKUP_STDOUT_COMPACT_DELAY = 3600
+CYBORGBACKUP_STDOUT_COMPACT_INCOMPLETE_DELAY = 86400
+CYBORGBACKUP_STDOUT_COMPACT_BATCH = 100
+CYBORGBACKUP_STDOUT_BLOCK_LINES = 1000
+# Interval in seconds between two bumps of the stdout version of a running job
+# by a callback receiver worker.
+CYBORGBACKUP_STDOUT_NOTIFY_INTERVAL = 1
+# Lifetime in seconds of the rendered output of the finished jobs and of its
+# version in the shared cache, and number of lines rendered and cached at once.
+CYBORGBACKUP_STDOUT_CACHE_TIMEOUT = 3600
+CYBORGBACKUP_STDOUT_RENDER_BLOCK_LINES = 1000
+# Lifetime in seconds of the cached responses of the list views, which are
+# also dropped as soon as one of the models they depend on changes.
+CYBORGBACKUP_API_RESPONSE_CACHE_TIMEOUT = 300
 CELERY_RDBSIG = 1
 CELERY_ALWAYS_EAGER = True
 CELERY_BROKER_URL = BROKER_URL
@@ -398,6 +456,9 @@ CELERY_QUEUES = (
     Queue('backup_job', routing_key='backup_job'),
     Broadcast('cyborgbackup_broadcast_all')
 )
+# Each worker also consumes its own queue, used to route a job to the
+# execution node selected by the task manager.
+CELERY_WORKER_DIRECT = True
 CELERY_DEFAULT_QUEUE = 'backup_job'
 CELERY_DEFAULT_ROUTING_KEY = 'backup.job'
 CELERY_ACCEPT_CONTENT = ['application/json']
@@ -411,9 +472,9 @@ main_tasks_route = {
 CELERY_ROUTES = {
     'cyborgbackup.main.tasks.cyborgbackup_notifier': main_tasks_route,
     'cyborgbackup.main.tasks.cyborgbackup_periodic_scheduler': main_tasks_route,
-    'cyborgbackup.main.tasks.compute_borg_size': main_tasks_route,
     'cyborgbackup.main.tasks.prune_catalog': main_tasks_route,
     'cyborgbackup.main.tasks.check_borg_new_version': main_tasks_route,
+    'cyborgbackup.main.tasks.compact_jobs_stdout': main_tasks_route,
     'cyborgbackup.main.utils.tasks.run_task_manager': main_tasks_route,
     'cyborgbackup.main.tasks.run_job': {'queue': 'backup_job'}
 }
@@ -446,16 +507,16 @@ CELERY_BEAT_SCHEDULE = {
         'schedule': timedelta(seconds=30),
         'options': {'expires': 20} | main_tasks_route
     },
-    'cyborgbackup_compute_Size': {
-        'task': 'cyborgbackup.main.tasks.compute_borg_size',
-        'schedule': timedelta(seconds=10),
-        'options': {'expires': 20} | main_tasks_route
-    },
     'cyborgbackup_prune_catalog': {
         'task': 'cyborgbackup.main.tasks.prune_catalog',
         'schedule': crontab(minute='30'),
         'options': {'expires': 20} | main_tasks_route
     },
+    'cyborgbackup_compact_jobs_stdout': {
+        'task': 'cyborgbackup.main.tasks.compact_jobs_stdout',
+        'schedule': crontab(minute='45'),
+        'options': {'expires': 20} | main_tasks_route
+    },
     'cyborgbackup_check_new_version_borg': {
         'task': 'cyborgbackup.main.tasks.check_borg_new_version',
         'schedule': crontab(hour='1', minute='0', day_of_month='1'),
@@ -135,7 +135,7 @@ def _get_metrics():
             repository.original_size
         )
 
-    for job in Job.objects.exclude(archive_name__isnull=True):
+    for job in Job.objects.exclude(archive_name__isnull=True).filter(status='successful'):
         METRICS_CYBORG_BACKUPS_SIZE.labels(instance, job.archive_name, 'compressed').set(job.compressed_size)
         METRICS_CYBORG_BACKUPS_SIZE.labels(instance, job.archive_name, 'deduplicated').set(job.deduplicated_size)
         METRICS_CYBORG_BACKUPS_SIZE.labels(instance, job.archive_name, 'original').set(job.original_size)